@@ -1,13 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from pydantic import BaseModel
 import os
 import json
-import tiktoken
-from datetime import datetime, date
+import gzip
+import hashlib
+import asyncio
+from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
+from src.utils.config import DAILY_TOKEN_LIMIT, NEWS_PAGE_SIZE, NEWS_MAX_PAGE_SIZE
+from src.utils.dates import parse_pub_date
+from src.utils.token_ledger import token_ledger
+from src.utils.token_usage import TokenUsage, count_tokens
+
+try:
+    import brotli
+except ImportError:
+    # Optional: responses fall back to gzip
+    brotli = None
 
 load_dotenv()
 
@@ -15,18 +28,18 @@ app = FastAPI(title="AI News Analyst", version="1.0.0")
 
 def get_workflow():
     try:
-        from src.workflow.news_analysis_workflow import run_news_analysis
-        return run_news_analysis
+        from src.workflow.news_analysis_workflow import aanalyze_news
+        return aanalyze_news
     except ImportError as e:
         print(f"Warning: Could not import workflow: {e}")
         return None
 
-def get_db_manager():
+def get_streaming_workflow():
     try:
-        from src.rag.database_manager import db_manager
-        return db_manager
+        from src.workflow.news_analysis_workflow import astream_news_analysis
+        return astream_news_analysis
     except ImportError as e:
-        print(f"Warning: Could not import database manager: {e}")
+        print(f"Warning: Could not import workflow: {e}")
         return None
 
 # Add CORS middleware
@@ -38,42 +51,19 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Global token tracking
-TOKEN_USAGE_FILE = "storage/daily_token_usage.json"
-DAILY_TOKEN_LIMIT = 5000  # 5000 tokens per day
-
-def load_daily_usage():
-    """Load today's token usage from file"""
+def get_unified_db_manager():
     try:
-        with open(TOKEN_USAGE_FILE, 'r') as f:
-            data = json.load(f)
-            today = date.today().isoformat()
-            return data.get(today, 0)
-    except FileNotFoundError:
-        return 0
+        from src.rag.unified_database_manager import unified_db_manager
+        return unified_db_manager
+    except ImportError as e:
+        print(f"Warning: Could not import unified database manager: {e}")
+        return None
 
-def save_daily_usage(tokens_used):
-    """Save today's token usage to file"""
-    try:
-        with open(TOKEN_USAGE_FILE, 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = {}
-    
-    today = date.today().isoformat()
-    data[today] = data.get(today, 0) + tokens_used
-    
-    with open(TOKEN_USAGE_FILE, 'w') as f:
-        json.dump(data, f)
-
-def count_tokens(text: str) -> int:
-    """Count tokens in text using tiktoken"""
-    try:
-        encoding = tiktoken.encoding_for_model("gpt-4o-mini")
-        return len(encoding.encode(text))
-    except:
-        # Fallback: rough estimate (1 token ≈ 4 characters)
-        return len(text) // 4
+@app.on_event("startup")
+def start_compaction_job():
+    """Apply the retention policy periodically, if RETENTION_INTERVAL_SECONDS enables it"""
+    from src.rag.retention import compactor
+    compactor.start()
 
 class NewsQuery(BaseModel):
     query: str
@@ -128,7 +118,7 @@ def ping():
 @app.get("/api/status")
 def get_status():
     """Get current token usage status"""
-    current_usage = load_daily_usage()
+    current_usage = token_ledger.get_usage()
     remaining = max(0, DAILY_TOKEN_LIMIT - current_usage)
     
     return {
@@ -139,18 +129,23 @@ def get_status():
         "status": "available" if remaining > 0 else "limit_reached"
     }
 
-@app.post("/api/news/rag")
-def rag_news(news_query: NewsQuery):
-    run_news_analysis = get_workflow()
-    if run_news_analysis is None:
-        raise HTTPException(
-            status_code=503, 
-            detail="News analysis service is not available. Please try again later."
-        )
+async def reserve_token_budget(query: str):
+    """Reserve this request's estimated tokens, or reject it with 429.
     
-    # Check if we've hit the daily limit
-    current_usage = load_daily_usage()
+    Returns (reservation_id, query_tokens); the reservation must later be
+    committed with the actual usage.
+    """
+    # Estimate tokens for this request; actual usage is committed afterwards
+    query_tokens = count_tokens(query)
+    estimated_response_tokens = 1500  # Retrieved context, prompt and answer
+    
+    reservation_id, current_usage = await asyncio.to_thread(
+        token_ledger.reserve, query_tokens + estimated_response_tokens
+    )
+    if reservation_id is not None:
+        return reservation_id, query_tokens
     
+    # Check if we've hit the daily limit
     if current_usage >= DAILY_TOKEN_LIMIT:
         raise HTTPException(
             status_code=429, 
@@ -162,85 +157,246 @@ def rag_news(news_query: NewsQuery):
             }
         )
     
-    # Estimate tokens for this request
-    query_tokens = count_tokens(news_query.query)
-    estimated_response_tokens = 500  # Conservative estimate
-    
-    # Check if this request would exceed the limit
-    if current_usage + query_tokens + estimated_response_tokens > DAILY_TOKEN_LIMIT:
+    # Otherwise this request would exceed the limit
+    raise HTTPException(
+        status_code=429,
+        detail={
+            "error": "Request would exceed daily limit",
+            "remaining_tokens": DAILY_TOKEN_LIMIT - current_usage,
+            "estimated_tokens_needed": query_tokens + estimated_response_tokens
+        }
+    )
+
+@app.post("/api/news/rag")
+async def rag_news(news_query: NewsQuery):
+    aanalyze_news = get_workflow()
+    if aanalyze_news is None:
         raise HTTPException(
-            status_code=429,
-            detail={
-                "error": "Request would exceed daily limit",
-                "remaining_tokens": DAILY_TOKEN_LIMIT - current_usage,
-                "estimated_tokens_needed": query_tokens + estimated_response_tokens
-            }
+            status_code=503, 
+            detail="News analysis service is not available. Please try again later."
         )
     
+    reservation_id, query_tokens = await reserve_token_budget(news_query.query)
+    
+    usage = TokenUsage()
     try:
         # Process the request
-        result = run_news_analysis(news_query.query)
-        
-        # Count actual tokens used
-        response_tokens = count_tokens(result)
-        total_tokens = query_tokens + response_tokens
+        analysis = await aanalyze_news(news_query.query, usage)
+        result = analysis['response']
         
-        # Save usage
-        save_daily_usage(total_tokens)
+        # Tokens the model calls actually spent; cached answers cost no generation
+        total_tokens = analysis['token_usage']['total_tokens']
         
-        # Get updated status
-        new_usage = load_daily_usage()
+        # Replace the reservation with the actual usage
+        new_usage = await asyncio.to_thread(token_ledger.commit, reservation_id, total_tokens)
         remaining = max(0, DAILY_TOKEN_LIMIT - new_usage)
         
         return {
             "response": result,
             "tokens_used": total_tokens,
+            "token_usage": analysis['token_usage'],
+            "cached": analysis['cached'],
             "remaining_today": remaining,
             "status": "available" if remaining > 0 else "limit_reached"
         }
         
     except Exception as e:
-        save_daily_usage(query_tokens)
+        # Charge whatever was spent before the failure
+        await asyncio.to_thread(
+            token_ledger.commit, reservation_id, max(usage.total_tokens, query_tokens)
+        )
         raise HTTPException(status_code=500, detail=str(e))
 
+def format_sse(event: dict) -> str:
+    """Serialize a workflow event as a Server-Sent Events message"""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+@app.post("/api/news/rag/stream")
+async def rag_news_stream(news_query: NewsQuery):
+    """Stream the route decision, citations and answer tokens as Server-Sent Events"""
+    astream_news_analysis = get_streaming_workflow()
+    if astream_news_analysis is None:
+        raise HTTPException(
+            status_code=503, 
+            detail="News analysis service is not available. Please try again later."
+        )
+    
+    reservation_id, query_tokens = await reserve_token_budget(news_query.query)
+    
+    async def event_stream():
+        usage = TokenUsage()
+        response_parts = []
+        accounted = False
+        try:
+            async for event in astream_news_analysis(news_query.query, usage):
+                if event["event"] == "token":
+                    response_parts.append(event["data"]["text"])
+                elif event["event"] == "done":
+                    analysis = event["data"]
+                    total_tokens = analysis['token_usage']['total_tokens']
+                    # Shielded so a disconnect mid-commit neither skips nor repeats it
+                    accounted = True
+                    new_usage = await asyncio.shield(asyncio.to_thread(
+                        token_ledger.commit, reservation_id, total_tokens
+                    ))
+                    
+                    remaining = max(0, DAILY_TOKEN_LIMIT - new_usage)
+                    event = {"event": "done", "data": {
+                        **analysis,
+                        "tokens_used": total_tokens,
+                        "remaining_today": remaining,
+                        "status": "available" if remaining > 0 else "limit_reached"
+                    }}
+                yield format_sse(event)
+        except Exception as e:
+            yield format_sse({"event": "error", "data": {"detail": str(e)}})
+        finally:
+            # Charge for whatever was generated if the stream ended early
+            if not accounted:
+                spent = usage.total_tokens
+                if not usage.completion_tokens:
+                    # The usage report arrives with the last chunk; count what was streamed
+                    spent += count_tokens("".join(response_parts))
+                # Off the event loop, and shielded so a client disconnect still settles the reservation
+                await asyncio.shield(asyncio.to_thread(
+                    token_ledger.commit, reservation_id, max(spent, query_tokens)
+                ))
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def accepted_encodings(accept_encoding: str) -> dict:
+    """Content codings from an Accept-Encoding header mapped to their q-values"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported coding the client accepts (q > 0), brotli winning ties"""
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    supported = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compressed_json_response(request: Request, payload, headers: dict,
+                             minimum_size: int = 1024) -> Response:
+    """JSON response compressed with brotli or gzip when the client accepts it"""
+    body = json.dumps(payload).encode("utf-8")
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    
+    if len(body) >= minimum_size:
+        if encoding == "br":
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against the current ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
 @app.get('/api/news/all')
-def get_news():
+def get_news(request: Request,
+             cursor: Optional[str] = None,
+             limit: int = Query(NEWS_PAGE_SIZE, ge=1, le=NEWS_MAX_PAGE_SIZE),
+             source: Optional[str] = None,
+             since: Optional[str] = None,
+             until: Optional[str] = None):
+    """List articles newest first, one entry per article, in cursor-paginated pages"""
+    since_ts = parse_pub_date(since) if since else None
+    until_ts = parse_pub_date(until) if until else None
+    if (since and since_ts is None) or (until and until_ts is None):
+        raise HTTPException(status_code=400, detail="since/until must be ISO-8601 or RFC-822 dates")
+    
     try:
-        # Get database manager
-        db_manager = get_db_manager()
-        if db_manager is None:
+        # Resyncs read from whichever backend ingestion writes to
+        unified_db_manager = get_unified_db_manager()
+        if unified_db_manager is None:
             return {"error": "Database service is not available"}
         
-        # Get all documents using the database manager
-        all_docs = db_manager.get_all_documents()
+        from src.rag.article_listing import article_listing
+        revision = article_listing.get_revision(unified_db_manager)
         
-        # Convert to simple format
-        news_data = []
-        for i, doc in enumerate(all_docs['documents']):
-            metadata = all_docs['metadatas'][i] if all_docs['metadatas'] else {}
-            
-            # Create a user-friendly link text
-            link_text = ""
-            if metadata.get('link'):
-                source = metadata.get('source', 'Unknown Source')
-                link_text = f"Read more at {source}"
-            
-            news_item = {
-                "title": metadata.get('title', ''),
-                "link": metadata.get('link', ''),
-                "link_text": link_text,
-                "has_link": bool(metadata.get('link')),
-                "content": doc,
-                "pub_date": metadata.get('pub_date', ''),
-                "source": metadata.get('source', '')
-            }
-            news_data.append(news_item)
+        # Weak ETag: identical content may be served with different encodings
+        params = f"{cursor}|{limit}|{source}|{since_ts}|{until_ts}"
+        etag = 'W/"' + hashlib.sha1(f"{revision}|{params}".encode("utf-8")).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        
+        try:
+            page = article_listing.get_page(cursor, limit, source, since_ts, until_ts)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        return news_data
+        page["limit"] = limit
+        return compressed_json_response(request, page, headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/admin/metrics")
+def get_metrics():
+    """Report connection and cache counters for the active backend"""
+    unified_db_manager = get_unified_db_manager()
+    if unified_db_manager is None:
+        return {"error": "Database service is not available"}
+    
+    from src.rag.embedding_cache import embedding_cache, query_embedding_cache
+    from src.workflow.answer_cache import answer_cache
+    from src.rag.article_listing import article_listing
+    from src.rag.link_index import link_index
+    from src.rag.batch_writer import embedding_writer
+    from src.rag.chunk_index import chunk_index
+    from src.rag.story_index import story_index
+    from src.rag.retention import compactor
+    
+    return {
+        "backend": unified_db_manager.get_backend_info(),
+        "embedding_cache": embedding_cache.get_stats(),
+        "query_embedding_cache": query_embedding_cache.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "article_index": article_listing.get_stats(),
+        "link_index": link_index.get_stats(),
+        "embedding_writer": embedding_writer.get_stats(),
+        "chunk_index": chunk_index.get_stats(),
+        "story_index": story_index.get_stats(),
+        "retention": compactor.get_stats(),
+        "search": unified_db_manager.get_search_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.post("/api/admin/update-news")
 def update_news():
     """Manually trigger news extraction (admin endpoint)"""
@@ -273,4 +429,26 @@ def update_news():
         return {
             "status": "error",
             "message": f"Failed to update news: {str(e)}"
-        }
\ No newline at end of file
+        }
+
+@app.post("/api/admin/compact")
+def compact_storage(dry_run: bool = Query(False, description="Only report what would be deleted")):
+    """Delete articles past the retention policy and compact the vector store (admin endpoint)"""
+    try:
+        from src.rag.retention import compactor
+        
+        result = compactor.run(dry_run=dry_run)
+        
+        if result.get('status') in ('success', 'busy'):
+            return result
+        return {
+            **result,
+            "status": "error",
+            "message": result.get('error', 'Unknown error')
+        }
+            
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to compact storage: {str(e)}"
+        }
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Backfill Publication Timestamps
+===============================
+Adds the numeric pub_ts (Unix seconds) parsed from pub_date to chunks that
+were stored before ingestion recorded it, so time-windowed searches can
+find them. Safe to run more than once. For Supabase, create_vector_table
+must have added the pub_ts column first.
+
+    python scripts/backfill_pub_ts.py
+"""
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from src.rag.unified_database_manager import unified_db_manager
+
+load_dotenv()
+
+def main():
+    backend = unified_db_manager.get_backend_info()["backend"]
+    print(f"🕒 Backfilling publication timestamps for {backend}...")
+
+    start = time.perf_counter()
+    try:
+        count = unified_db_manager.backfill_pub_ts()
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        return 1
+
+    print(f"✅ Updated {count} chunks in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Feed Parsing Benchmark
+======================
+Compares the previous whole-document parsers (ET.fromstring + find per
+field) with the streaming iterparse parser on synthetic RSS 2.0 and Atom
+feeds, reporting items/s and the peak RSS growth of one parse (measured in
+a forked child, so lxml's C allocations are included).
+
+    python scripts/benchmark_feed_parsing.py --items 1000,20000,200000
+
+Pass --file to benchmark a saved real feed instead of synthetic ones.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_sources.feed_parser import iter_feed_items, HAS_LXML
+
+def make_rss(items: int) -> bytes:
+    """Synthetic RSS 2.0 feed shaped like Techmeme's"""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench</title>']
+    for i in range(items):
+        parts.append(
+            f"<item><title>Headline number {i} about chips and models</title>"
+            f"<link>https://example.com/articles/{i}</link>"
+            f"<description>&lt;p&gt;&lt;b&gt;Reporter / Outlet:&lt;/b&gt; Story {i} "
+            f"{'lorem ipsum dolor sit amet ' * 12}&lt;/p&gt;</description>"
+            f"<pubDate>Fri, 10 Oct 2025 10:{i % 60:02d}:00 +0000</pubDate></item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+def make_atom(items: int) -> bytes:
+    """Synthetic Atom feed"""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Bench</title>']
+    for i in range(items):
+        parts.append(
+            f"<entry><title>Headline number {i}</title>"
+            f'<link rel="alternate" href="https://example.com/articles/{i}"/>'
+            f"<summary>Story {i} {'lorem ipsum dolor sit amet ' * 12}</summary>"
+            f"<published>2025-10-10T10:{i % 60:02d}:00Z</published></entry>"
+        )
+    parts.append("</feed>")
+    return "".join(parts).encode("utf-8")
+
+def legacy_parse(content: bytes):
+    """The previous Techmeme parser: whole tree in memory, find() twice per field"""
+    root = ET.fromstring(content)
+    articles = []
+    for item in root.findall('.//item'):
+        title = item.find('title').text if item.find('title') is not None else "No title"
+        link = item.find('link').text if item.find('link') is not None else "No link"
+        description = item.find('description').text if item.find('description') is not None else "No description"
+        pub_date = item.find('pubDate').text if item.find('pubDate') is not None else "No date"
+        articles.append({'title': title, 'link': link, 'description': description,
+                         'pub_date': pub_date, 'source': 'techmeme'})
+    return articles
+
+def streaming_count(content: bytes) -> int:
+    """Consume the generator without keeping the items, as a pipeline stage would"""
+    return sum(1 for _ in iter_feed_items(io.BytesIO(content), 'techmeme'))
+
+def _peak_rss_growth(func, content: bytes, queue):
+    """Run func once in this (forked) process and report how much its peak RSS grew"""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func(content)
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+
+def measure(name: str, func, content: bytes, repeat: int):
+    """Best-of-N wall time plus peak memory growth of one run"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        best = min(best, time.perf_counter() - start)
+    count = result if isinstance(result, int) else len(result)
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_peak_rss_growth, args=(func, content, queue))
+    process.start()
+    growth_kib = queue.get()
+    process.join()
+
+    print(f"  {name:<22} {count:>8} items  {count / best:>12,.0f} items/s  "
+          f"peak +{growth_kib / 1024:>8.1f} MiB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feed parsers")
+    parser.add_argument("--items", default="1000,20000,100000", help="Comma-separated feed sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", help="Benchmark a saved RSS/Atom file instead")
+    args = parser.parse_args()
+
+    print(f"Streaming parser backend: {'lxml' if HAS_LXML else 'xml.etree (stdlib)'}")
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            content = f.read()
+        print(f"\n{args.file} ({len(content) / 1024:.0f} KiB):")
+        measure("legacy fromstring", legacy_parse, content, args.repeat)
+        measure("streaming iterparse", streaming_count, content, args.repeat)
+        return 0
+
+    for size in (int(n) for n in args.items.split(",")):
+        rss = make_rss(size)
+        print(f"\nRSS, {size} items ({len(rss) / 1024 / 1024:.1f} MiB):")
+        measure("legacy fromstring", legacy_parse, rss, args.repeat)
+        measure("streaming iterparse", streaming_count, rss, args.repeat)
+
+        atom = make_atom(size)
+        print(f"Atom, {size} items ({len(atom) / 1024 / 1024:.1f} MiB):")
+        measure("streaming iterparse", streaming_count, atom, args.repeat)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
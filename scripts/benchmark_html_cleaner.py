@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+HTML Cleaner Parity Check and Benchmark
+=======================================
+Checks that the fast description cleaner produces the same text as the
+previous BeautifulSoup(..., "html.parser").get_text() path (compared after
+collapsing whitespace), then benchmarks both on a batch of descriptions.
+
+    python scripts/benchmark_html_cleaner.py
+    python scripts/benchmark_html_cleaner.py --feed saved_feed.xml --count 20000
+
+Exits non-zero if any parity case differs, so it can gate CI.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from src.data_sources.feed_parser import iter_feed_items
+from src.data_sources.html_cleaner import clean_html, clean_texts
+
+# Shapes seen in Techmeme / MIT Technology Review descriptions plus edge cases
+PARITY_CASES = [
+    "",
+    "Plain text without markup",
+    "<p><b>Ashley Capoot / CNBC:</b> Nvidia reports record revenue</p>",
+    '<p><a href="https://example.com/?a=1&amp;b=2">Link</a> &mdash; more</p>',
+    '<img src="x.png" alt="a > b"/>Caption with <em>emphasis</em>',
+    "<div>\n  <p>Multi\n line</p>\n\t<p>paragraphs</p>\n</div>",
+    "Entities: &amp; &lt;tag&gt; &quot;q&quot; &#39;s &#8217; &#x2014; &nbsp;x &copy;",
+    "Double escaped &amp;lt;b&amp;gt;",
+    "<!-- comment --> visible <!-- another\nmultiline comment -->text",
+    "<script>var x = '<p>';</script>after script<style>p { color: red; }</style>",
+    "<![CDATA[raw cdata]]> then text",
+    "<!DOCTYPE html><?xml version='1.0'?>declarations",
+    "Math: a < b and c > d, 5 <3 you",
+    "Unclosed <b bold",
+    "<p title='single > quoted'>attr</p>",
+    "<ul><li>One</li><li>Two</li></ul>",
+    "<br>line<br/>break<br />s",
+    "Unicode: café — “quotes” ✓",
+    "<P CLASS=Upper>Uppercase tags</P>",
+    "<table><tr><td>cell 1</td><td>cell 2</td></tr></table>",
+]
+
+def reference_clean(text: str) -> str:
+    """The previous cleaning path, with whitespace collapsed for comparison"""
+    return " ".join(BeautifulSoup(text, "html.parser").get_text().split())
+
+def check_parity(samples) -> int:
+    """Compare both cleaners on every sample; returns the number of mismatches"""
+    mismatches = 0
+    for sample in samples:
+        expected, actual = reference_clean(sample), clean_html(sample)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"  ✗ {sample[:80]!r}\n      bs4:  {expected[:100]!r}\n      fast: {actual[:100]!r}")
+    return mismatches
+
+def synthetic_descriptions(count: int):
+    """Techmeme-like descriptions of varying length"""
+    rng = random.Random(42)
+    words = "the chip model startup funding launch regulators users cloud AI data".split()
+    out = []
+    for i in range(count):
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(20, 120)))
+        out.append(
+            f'<p><a href="https://example.com/{i}"><img src="https://img/{i}.jpg" alt="x"/></a></p>'
+            f"<p><b>Reporter {i} / Outlet:</b> {body} &mdash; &ldquo;quoted&rdquo; &amp; more.</p>"
+            f'<p>More: <a href="https://example.com/{i}?a=1&amp;b=2">Link</a></p>'
+        )
+    return out
+
+def benchmark(descriptions, repeat: int):
+    """Best-of-N time for cleaning the whole batch with each cleaner"""
+    def best_time(func):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    bs4_time = best_time(lambda: [BeautifulSoup(d, "html.parser").get_text() for d in descriptions])
+    fast_time = best_time(lambda: clean_texts(descriptions))
+    n = len(descriptions)
+    print(f"  BeautifulSoup html.parser  {n / bs4_time:>12,.0f} items/s")
+    print(f"  fast cleaner               {n / fast_time:>12,.0f} items/s  ({bs4_time / fast_time:.1f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity check and benchmark for the HTML cleaner")
+    parser.add_argument("--feed", help="Saved RSS/Atom file whose descriptions are also checked and benchmarked")
+    parser.add_argument("--count", type=int, default=5000, help="Synthetic descriptions to benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    samples = list(PARITY_CASES)
+    descriptions = synthetic_descriptions(args.count)
+    if args.feed:
+        with open(args.feed, "rb") as f:
+            feed_descriptions = [item["description"] for item in iter_feed_items(f, "feed")]
+        samples.extend(feed_descriptions)
+        descriptions = feed_descriptions or descriptions
+    samples.extend(descriptions[:500])
+
+    print(f"Parity on {len(samples)} samples:")
+    mismatches = check_parity(samples)
+    print(f"  {'✓ all match' if not mismatches else f'✗ {mismatches} mismatches'}")
+
+    print(f"\nBenchmark on {len(descriptions)} descriptions:")
+    benchmark(descriptions, args.repeat)
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
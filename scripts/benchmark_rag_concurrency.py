@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+RAG Endpoint Concurrency Benchmark
+==================================
+Fires batches of concurrent requests at /api/news/rag and reports throughput
+and latency percentiles for each concurrency level.
+
+Against a running server (uses real OpenAI/vector DB calls and counts against
+DAILY_TOKEN_LIMIT, so raise the limit before large runs):
+
+    python scripts/benchmark_rag_concurrency.py --url http://localhost:8000
+
+Without API keys, --simulate starts a local app with a sync (threadpool) and
+an async handler that both wait the given number of seconds, which shows the
+structural difference between the old and new request path:
+
+    python scripts/benchmark_rag_concurrency.py --simulate 5 --levels 200 --requests 200
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+DEFAULT_QUERY = "What are the latest developments in AI chips?"
+
+async def run_level(client: httpx.AsyncClient, url: str, concurrency: int,
+                    total_requests: int, query: str) -> dict:
+    """Send total_requests with at most `concurrency` in flight at once"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one_request():
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json={"query": query})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total_requests / elapsed, 2),
+        "p50_s": round(statistics.median(latencies), 3),
+        "p95_s": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+        "statuses": statuses
+    }
+
+async def run_benchmark(url: str, levels, requests_per_level: int, query: str, timeout: float):
+    """Run every concurrency level against one endpoint and print the results"""
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        for level in levels:
+            total = max(requests_per_level, level)
+            result = await run_level(client, url, level, total, query)
+            print(f"  concurrency={result['concurrency']:>4}  requests={result['requests']:>4}  "
+                  f"throughput={result['throughput_rps']:>8} req/s  p50={result['p50_s']}s  "
+                  f"p95={result['p95_s']}s  statuses={result['statuses']}")
+
+def serve_simulated(port: int, delay: float):
+    """Serve a sync and an async handler that each wait `delay` seconds"""
+    import uvicorn
+    from fastapi import FastAPI
+
+    sim_app = FastAPI()
+
+    @sim_app.post("/sync")
+    def sync_handler(payload: dict):
+        # Blocks a threadpool worker like the old rag_news did
+        time.sleep(delay)
+        return {"response": "ok"}
+
+    @sim_app.post("/async")
+    async def async_handler(payload: dict):
+        # Awaits I/O like the new rag_news does
+        await asyncio.sleep(delay)
+        return {"response": "ok"}
+
+    uvicorn.run(sim_app, host="127.0.0.1", port=port, log_level="warning")
+
+def start_simulated_server(delay: float) -> str:
+    """Start the simulated server in its own process so it does not share the client's GIL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = multiprocessing.Process(target=serve_simulated, args=(port, delay), daemon=True)
+    process.start()
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                break
+        except OSError:
+            time.sleep(0.1)
+    return f"http://127.0.0.1:{port}"
+
+def main():
+    """Parse arguments and run the benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark /api/news/rag concurrency")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running server")
+    parser.add_argument("--levels", default="1,10,50,100,200", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=50, help="Minimum requests per level")
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--simulate", type=float, metavar="SECONDS",
+                        help="Compare simulated sync vs async handlers with this latency")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+
+    if args.simulate is not None:
+        base_url = start_simulated_server(args.simulate)
+        for path in ("/sync", "/async"):
+            print(f"\nSimulated {path[1:]} handler ({args.simulate}s per request):")
+            asyncio.run(run_benchmark(base_url + path, levels, args.requests, args.query, args.timeout))
+    else:
+        print(f"\nBenchmarking {args.url}/api/news/rag:")
+        asyncio.run(run_benchmark(args.url.rstrip("/") + "/api/news/rag", levels,
+                                  args.requests, args.query, args.timeout))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+=================
+Measures how long it takes to import the web app and the modules cron jobs
+touch (each in a fresh interpreter, so nothing is already cached), and the
+time from spawning uvicorn to the first healthy /health response.
+
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --repeat 5 --port 8765
+
+Imports must not touch the network or require OPENAI_API_KEY; the script
+runs them with the key unset to prove it.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "backend.main",
+    "src.data_sources.mit",
+    "src.data_sources.techmeme_rss_parser",
+    "src.workflow.news_analysis_workflow",
+    "src.data_ingestion.extract_and_store",
+]
+
+def _env() -> dict:
+    """Environment for the child processes: no API key, project on the path"""
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    env["PYTHONPATH"] = PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+def time_import(module: str) -> float:
+    """Seconds to import a module in a fresh interpreter; raises if the import fails"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, env=_env(),
+                            capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_healthy(port: int, timeout: float) -> float:
+    """Seconds from spawning uvicorn until /health answers 200"""
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited: {process.stderr.read().decode()[-300:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"/health not healthy after {timeout:.0f}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def summarize(samples) -> str:
+    return f"median {statistics.median(samples):6.2f}s  min {min(samples):6.2f}s  max {max(samples):6.2f}s"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import and server startup time")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=0, help="Port for uvicorn (default: a free one)")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"Import time (fresh interpreter, OPENAI_API_KEY unset, {args.repeat} runs):")
+    for module in MODULES:
+        try:
+            samples = [time_import(module) for _ in range(args.repeat)]
+            print(f"  {module:<40} {summarize(samples)}")
+        except Exception as e:
+            failures += 1
+            print(f"  {module:<40} ✗ {e}")
+
+    print("\nTime to first healthy /health (uvicorn spawn → 200):")
+    try:
+        samples = [time_to_healthy(args.port or _free_port(), args.timeout) for _ in range(args.repeat)]
+        print(f"  {'backend.main:app':<40} {summarize(samples)}")
+    except Exception as e:
+        failures += 1
+        print(f"  {'backend.main:app':<40} ✗ {e}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
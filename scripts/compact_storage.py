@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Compact Storage
+===============
+Deletes articles past the retention policy (RETENTION_MAX_AGE_DAYS,
+RETENTION_SOURCE_MAX_AGE_DAYS, RETENTION_SOURCE_MAX_ARTICLES) from the
+active vector backend and compacts it. Nothing expires until one of those
+limits is set (all default to off). The web server runs the same job every
+RETENTION_INTERVAL_SECONDS when that is set; use this script from cron
+otherwise.
+
+    python scripts/compact_storage.py [--dry-run]
+"""
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from src.rag.retention import compactor
+
+load_dotenv()
+
+def main():
+    dry_run = "--dry-run" in sys.argv[1:]
+    print(f"🧹 Applying retention policy{' (dry run)' if dry_run else ''}...")
+
+    result = compactor.run(dry_run=dry_run)
+    if result["status"] != "success":
+        print(f"❌ Compaction failed: {result.get('error') or result.get('message')}")
+        return 1
+
+    for source, count in result["expired_by_source"].items():
+        print(f"   {source}: {count} expired articles")
+    if not dry_run:
+        reclaimed = result["bytes_reclaimed"]
+        print(f"✅ Deleted {result['articles_deleted']} articles ({result['vectors_deleted']} vectors), "
+              f"reclaimed {'unknown' if reclaimed is None else f'{reclaimed / 1024:.1f} KiB'} "
+              f"in {result['duration_s']}s")
+        before, after = result.get("storage_before"), result.get("storage_after")
+        if before and after:
+            for part in before:
+                print(f"   {part}: {before[part] / 1024:.1f} KiB -> {after[part] / 1024:.1f} KiB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
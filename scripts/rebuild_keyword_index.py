@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Rebuild Keyword Index
+=====================
+Rebuilds the local BM25 keyword index used by hybrid search for the active
+vector backend from a full read of the store. Ingestion keeps the index
+current on the machine that runs it, and hybrid search resyncs it on other
+machines every KEYWORD_INDEX_TTL_SECONDS; run this to rebuild it at once,
+e.g. after changing KEYWORD_INDEX_PATH.
+
+    python scripts/rebuild_keyword_index.py
+"""
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from src.rag.unified_database_manager import unified_db_manager
+
+load_dotenv()
+
+def main():
+    backend = unified_db_manager.get_backend_info()["backend"]
+    print(f"🔄 Rebuilding keyword index for {backend}...")
+
+    start = time.perf_counter()
+    try:
+        count = unified_db_manager.rebuild_keyword_index()
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        return 1
+
+    print(f"✅ Indexed {count} chunks in {time.perf_counter() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Rebuild Link Filter
+===================
+Rebuilds the ingestion link filter (Bloom filter) and link index for the
+active vector backend from a full scan of the store. Run it after deleting
+articles, after changing LINK_FILTER_ERROR_RATE / LINK_FILTER_CAPACITY /
+LINK_FILTER_MAX_MB, or when setting up a new ingestion machine.
+
+    python scripts/rebuild_link_filter.py
+"""
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from src.rag.unified_database_manager import unified_db_manager
+from src.rag.link_index import link_index
+
+load_dotenv()
+
+def main():
+    backend = unified_db_manager.get_backend_info()["backend"]
+    print(f"🔄 Rebuilding link filter for {backend}...")
+
+    start = time.perf_counter()
+    try:
+        count = unified_db_manager.rebuild_link_filter()
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Indexed {count} links in {elapsed:.2f}s")
+    for scope, stats in link_index.get_stats()["filters"].items():
+        print(f"   {scope}: {stats['items']} items, {stats['slices']} slice(s), "
+              f"{stats['memory_bytes'] / 1024:.1f} KiB, target error rate {stats['error_rate']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,14 +4,35 @@ Background Extraction Job
 Fetch news from multiple sources and store in vector DB.
 This runs independently from user queries.
 
+Ingestion runs as a staged pipeline (fetch → parse → dedup → chunk → store)
+connected by bounded queues, so feeds are still downloading and parsing
+while earlier batches are being embedded, and memory is bounded by the
+queue sizes rather than by the size of the run.
+
 Run this script periodically (cron, scheduler, etc.) to keep the DB updated.
 """
-from src.data_sources.techmeme_rss_parser import get_text as get_techmeme_text
-from src.data_sources.mit import get_text as get_mit_text
-from src.rag.database_manager import db_manager
+from src.data_sources.techmeme_rss_parser import techmeme_rss
+from src.data_sources.mit import mit_rss
+from src.data_sources.http_client import fetch_url
+from src.data_sources.feed_parser import iter_feed_items
+from src.data_sources.html_cleaner import clean_descriptions
+from src.data_sources.feed_state import feed_state
+from src.data_ingestion.pipeline import Pipeline, Stage
+from src.rag.unified_database_manager import unified_db_manager
+from src.rag.embedding_cache import embedding_cache
+from src.rag.article_index import article_index
+from src.rag.article_listing import article_listing
+from src.rag.link_index import link_index
+from src.rag.batch_writer import embedding_writer
+from src.rag.chunk_index import chunk_hash, chunk_id
+from src.rag.story_index import story_index
+from src.utils.ingestion_version import bump_ingestion_version
+from src.utils.links import normalize_link
+from src.utils.dates import parse_pub_date
+from src.utils.config import INGEST_ARTICLE_BATCH_SIZE, INGEST_STORE_WORKERS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.schema import Document
 import os
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 import warnings
@@ -27,147 +48,378 @@ except AttributeError:
 
 load_dotenv()
 
+# Source name -> (display name, feed URL); items are tagged with the source name
+FEED_SOURCES = {
+    "techmeme": ("Techmeme", techmeme_rss),
+    "mit": ("MIT", mit_rss)
+}
+
+class IngestionRun:
+    """Stage functions and shared counters for one extraction run"""
+
+    def __init__(self, article_batch_size: int = INGEST_ARTICLE_BATCH_SIZE):
+        self.article_batch_size = max(1, article_batch_size)
+        self.splitter = RecursiveCharacterTextSplitter(
+            separators=["\n\n", "\n", " ", ""],
+            chunk_size=500,
+            chunk_overlap=10
+        )
+        self._lock = threading.Lock()
+        self.fetch_stats = {}
+        self.feed_updates = []
+        self.seen_links = set()
+        self.seen_hashes = set()
+        # Links as the feed gave them, for normalized links that differ
+        self.raw_links = {}
+        # Stories accepted earlier in this run, and signatures to record once stored
+        self.pending_stories = story_index.new_index()
+        self.signatures = {}
+        self.near_duplicates = []
+        self.stored_links = set()
+        self.sources_count = {}
+        self.fetched_articles = 0
+        self.existing_articles = 0
+        self.new_articles = 0
+        self.new_chunks = 0
+        self.stored_articles = 0
+        self.duplicate_chunks = 0
+        self.referenced_articles = 0
+
+    def fetch(self, name: str):
+        """Fetch one feed with its conditional request headers"""
+        label, url = FEED_SOURCES[name]
+        try:
+            result = fetch_url(url, headers=feed_state.conditional_headers(url))
+        except Exception as e:
+            # Recorded so the run is not mistaken for one where every feed was skipped
+            with self._lock:
+                self.fetch_stats[name] = {"articles": 0, "error": f"{type(e).__name__}: {e}"}
+            raise
+        stats = {
+            "latency_s": result["latency_s"],
+            "bytes": result["bytes"],
+            "attempts": result["attempts"],
+            "status": result["status"],
+            "articles": 0
+        }
+        with self._lock:
+            self.fetch_stats[name] = stats
+
+        if result["not_modified"]:
+            stats["skipped"] = "not_modified"
+            print(f"  = {label}: not modified since last poll")
+            return
+        if result["body"] is None:
+            stats["error"] = result["error"]
+            print(f"  ✗ {label} failed after {result['attempts']} attempt(s): {result['error']}")
+            return
+        yield name, result
+
+    def parse(self, fetched):
+        """Stream cleaned article batches out of a fetched feed body"""
+        name, result = fetched
+        label, url = FEED_SOURCES[name]
+        stats = self.fetch_stats[name]
+        with result["body"] as body:
+            update = (url, result["etag"], result["last_modified"], result["content_hash"])
+            if result["content_hash"] == feed_state.get(url)["body_hash"]:
+                # Server ignored the conditional request but the body is unchanged
+                stats["skipped"] = "unchanged"
+                with self._lock:
+                    self.feed_updates.append(update)
+                print(f"  = {label}: unchanged since last poll")
+                return
+
+            batch = []
+            try:
+                for article in iter_feed_items(body, name):
+                    batch.append(article)
+                    if len(batch) >= self.article_batch_size:
+                        yield self._parsed(stats, batch)
+                        batch = []
+                if batch:
+                    yield self._parsed(stats, batch)
+            except Exception as e:
+                stats["error"] = str(e)
+                print(f"  ✗ {label} failed: {e}")
+                return
+
+        if stats["articles"]:
+            with self._lock:
+                self.feed_updates.append(update)
+        print(f"  ✓ {label}: {stats['articles']} articles "
+              f"({result['bytes'] / 1024:.1f} KiB in {result['latency_s']}s)")
+
+    def _parsed(self, stats, batch):
+        """Count a parsed batch, normalize its links and clean its descriptions"""
+        stats["articles"] += len(batch)
+        with self._lock:
+            self.fetched_articles += len(batch)
+            for article in batch:
+                link = normalize_link(article['link'])
+                if link != article['link']:
+                    self.raw_links[link] = article['link']
+                    article['link'] = link
+        return clean_descriptions(batch)
+
+    def dedup(self, articles):
+        """Drop articles already stored or repeated earlier in this run, and
+        set aside near-duplicates of stored or accepted stories for merging"""
+        links = [article['link'] for article in articles]
+        # Links stored before normalization was introduced may be in their raw form
+        raw_links = {self.raw_links[link]: link for link in links if link in self.raw_links}
+        existing = unified_db_manager.filter_existing_links(links + list(raw_links))
+        existing_links = {raw_links.get(link, link) for link in existing}
+
+        new_articles = []
+        with self._lock:
+            self.existing_articles += len(existing_links)
+            self.seen_links.update(existing_links)
+            candidates = []
+            for article in articles:
+                if article['link'] not in self.seen_links:
+                    self.seen_links.add(article['link'])
+                    candidates.append(article)
+
+        for article in candidates:
+            signature = story_index.signature(article)
+            if signature is not None:
+                match = unified_db_manager.find_duplicate_story(signature) or self.pending_stories.query(signature)
+                if match:
+                    self.near_duplicates.append((match[0], article))
+                    continue
+                self.pending_stories.add(article['link'], signature)
+                self.signatures[article['link']] = signature
+            new_articles.append(article)
+
+        with self._lock:
+            for article in new_articles:
+                source = article.get('source', 'unknown')
+                self.sources_count[source] = self.sources_count.get(source, 0) + 1
+            self.new_articles += len(new_articles)
+        if new_articles:
+            yield new_articles
+
+    def chunk(self, articles):
+        """Split new articles into chunks, keeping only text not already stored.
+
+        Chunks whose normalized text is stored (or queued earlier in this
+        run) become references to the existing vector instead.
+        """
+        chunks = []
+        for article in articles:
+            news_content = f"Title: {article['title']}, Content: {article['description']}"
+            metadata = {
+                "title": article["title"],
+                "link": article["link"],
+                "pub_date": article["pub_date"],
+                "source": article["source"],
+                "ingested_at": datetime.now().isoformat()
+            }
+            # Numeric publication time for time-windowed search; omitted when unparseable
+            pub_ts = parse_pub_date(article["pub_date"])
+            if pub_ts is not None:
+                metadata["pub_ts"] = pub_ts
+            for position, chunk in enumerate(self.splitter.split_text(news_content)):
+                if position == 0:
+                    # Listing snippet, taken from the same text a resync reads back
+                    article["content"] = chunk
+                content_hash = chunk_hash(chunk)
+                chunks.append((chunk, {
+                    **metadata,
+                    "content_hash": content_hash,
+                    "chunk_index": position,
+                    "chunk_id": chunk_id(article["link"], position, content_hash)
+                }))
+
+        stored = unified_db_manager.filter_existing_chunks(metadata["content_hash"] for _, metadata in chunks)
+        documents, metadatas, references = [], [], []
+        for chunk, metadata in chunks:
+            content_hash = metadata["content_hash"]
+            if content_hash in stored or content_hash in self.seen_hashes:
+                references.append((content_hash, metadata))
+            else:
+                self.seen_hashes.add(content_hash)
+                documents.append(chunk)
+                metadatas.append(metadata)
+        yield articles, documents, metadatas, references
+
+    def store(self, batch):
+        """Embed and store one chunk batch, record its references, then index its articles"""
+        articles, documents, metadatas, references = batch
+        if documents and not unified_db_manager.add_documents(documents, metadatas):
+            raise Exception("Failed to add documents to database")
+        # Articles with no chunk of their own point at vectors stored for other articles
+        stored_links = {metadata["link"] for metadata in metadatas}
+        referencing_links = {metadata["link"] for _, metadata in references} - stored_links
+        if references:
+            unified_db_manager.add_chunk_references(references)
+        unified_db_manager.add_stories(
+            (link, self.signatures[link]) for link in stored_links if link in self.signatures
+        )
+        with self._lock:
+            self.stored_links.update(stored_links)
+            self.new_chunks += len(documents)
+            self.stored_articles += len(stored_links)
+            self.duplicate_chunks += len(references)
+            self.referenced_articles += len(referencing_links)
+        # Keep the news listing current without rescanning the vector store
+        try:
+            article_index.upsert_articles([article for article in articles if article["link"] in stored_links])
+        except Exception as e:
+            print(f"  ⚠️  Article index update failed: {e}")
+        print(f"  ✓ Stored {len(documents)} chunks from {len(stored_links)} articles"
+              + (f" ({len(references)} duplicate chunks referenced)" if references else ""))
+
+    def pipeline(self) -> Pipeline:
+        return Pipeline([
+            Stage("fetch", self.fetch, workers=len(FEED_SOURCES)),
+            Stage("parse", self.parse, workers=len(FEED_SOURCES)),
+            Stage("dedup", self.dedup),
+            Stage("chunk", self.chunk),
+            Stage("store", self.store, workers=INGEST_STORE_WORKERS)
+        ])
+
+def _save_feed_state(feed_updates):
+    """Remember validators and body hashes of feeds whose articles are now stored"""
+    for url, etag, last_modified, content_hash in feed_updates:
+        try:
+            feed_state.save(url, etag, last_modified, content_hash)
+        except Exception as e:
+            print(f"  ⚠️  Could not save feed state for {url}: {e}")
+
+def _embedding_cache_delta(before: dict) -> dict:
+    """Embedding cache hits and misses since the given stats snapshot"""
+    after = embedding_cache.get_stats()
+    return {
+        "hits": after["hits"] - before["hits"],
+        "misses": after["misses"] - before["misses"]
+    }
+
+def _write_delta(before: dict, store_metrics: dict) -> dict:
+    """Embedding writer throughput since the given stats snapshot"""
+    after = embedding_writer.get_stats()
+    delta = {key: after[key] - before[key] for key in ("chunks", "batches", "rate_limited", "retries")}
+    wall = store_metrics["wall_s"]
+    delta["chunks_per_s"] = round(delta["chunks"] / wall, 1) if wall > 0 else 0.0
+    delta["batch_size"] = after["batch_size"]
+    return delta
+
 def extract_and_store(persist_directory="./data/vector_db"):
     """
     Extract news from all sources and store in vector DB.
     This is a standalone job - no user query involved.
-    
+
     Returns:
         dict: Statistics about the extraction job
     """
     print(f"\n{'='*60}")
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting Extraction Job")
     print(f"{'='*60}\n")
-    
+
     # Database manager handles embedding model initialization
-    
-    # 1. Fetch from all sources
-    print("📡 Fetching articles from sources...")
-    try:
-        techmeme_articles = get_techmeme_text()
-        print(f"  ✓ Techmeme: {len(techmeme_articles)} articles")
-    except Exception as e:
-        print(f"  ✗ Techmeme failed: {e}")
-        techmeme_articles = []
-    
-    try:
-        mit_articles = get_mit_text()
-        print(f"  ✓ MIT: {len(mit_articles)} articles")
-    except Exception as e:
-        print(f"  ✗ MIT failed: {e}")
-        mit_articles = []
-    
-    all_articles = techmeme_articles + mit_articles
-    print(f"\n📊 Total fetched: {len(all_articles)} articles")
-    
-    if not all_articles:
+    cache_stats_before = embedding_cache.get_stats()
+    writer_stats_before = embedding_writer.get_stats()
+
+    # Fetch, parse, dedup, chunk and store concurrently
+    print("📡 Fetching, embedding and storing articles...")
+    run = IngestionRun()
+    pipeline_stats = run.pipeline().run(FEED_SOURCES)
+    # Near-duplicates become aliases of their canonical story once it is stored;
+    # those whose canonical failed to store are retried on the next run
+    merged = [(canonical, article) for canonical, article in run.near_duplicates
+              if canonical in run.stored_links or canonical not in run.signatures]
+    merged_references = unified_db_manager.merge_near_duplicates(merged)
+    if merged:
+        print(f"  ✓ Merged {len(merged)} near-duplicate articles into their canonical stories")
+    # Links confirmed by the index or backend were added to the filter
+    link_index.save_filters()
+    if run.new_chunks or run.duplicate_chunks or merged:
+        # Invalidates cached answers built from the previous corpus
+        bump_ingestion_version()
+
+    print(f"\n📊 Total fetched: {run.fetched_articles} articles "
+          f"({run.existing_articles} already in DB, {run.new_articles} new)")
+    base = {
+        "new_articles": run.new_articles,
+        # Counted from the article index, resynced with the store only once it is stale
+        "total_articles": article_listing.count(unified_db_manager),
+        "fetch": run.fetch_stats,
+        "chunk_dedup": {
+            "chunks_saved": run.duplicate_chunks,
+            "articles_referenced": run.referenced_articles
+        },
+        "near_duplicates": {
+            "merged": len(merged),
+            "canonical_stories": len({canonical for canonical, _ in merged}),
+            "chunk_references": merged_references
+        },
+        "pipeline": pipeline_stats
+    }
+
+    # Fetch and parse failures raised inside the pipeline, not feeds that reported an error
+    feed_error = pipeline_stats["fetch"]["error"] or pipeline_stats["parse"]["error"]
+    if not run.fetched_articles:
+        if (not feed_error and len(run.fetch_stats) == len(FEED_SOURCES)
+                and all(stats.get("skipped") for stats in run.fetch_stats.values())):
+            _save_feed_state(run.feed_updates)
+            print("\n✨ No feed changed since the last poll. Database is up to date.")
+            return {**base, "new_chunks": 0, "status": "up_to_date"}
         print("⚠️  No articles fetched. Exiting.")
-        return {"new_articles": 0, "new_chunks": 0, "total_articles": 0}
-    
-    # 2. Get existing article links to avoid duplicates
-    print("\n💾 Checking existing articles...")
-    existing_links = db_manager.get_existing_links()
-    print(f"  ✓ Found {len(existing_links)} existing articles in DB")
-    
-    # 3. Filter new articles
-    new_articles = [article for article in all_articles if article['link'] not in existing_links]
-    
-    if not new_articles:
-        print("\n✨ No new articles to add. Database is up to date.")
-        return {
-            "new_articles": 0,
-            "new_chunks": 0,
-            "total_articles": len(existing_links),
-            "status": "up_to_date"
-        }
-    
-    print(f"\n🆕 Found {len(new_articles)} new articles to process")
-    
-    # Show breakdown by source
-    sources_count = {}
-    for article in new_articles:
-        source = article.get('source', 'unknown')
-        sources_count[source] = sources_count.get(source, 0) + 1
-    print(f"   By source: {sources_count}")
-    
-    # 4. Chunk and create documents
-    print("\n✂️  Chunking articles...")
-    splitter = RecursiveCharacterTextSplitter(
-        separators=["\n\n", "\n", " ", ""],
-        chunk_size=500,
-        chunk_overlap=10
-    )
-    
-    all_docs = []
-    for article in new_articles:
-        news_content = f"Title: {article['title']}, Content: {article['description']}"
-        chunks = splitter.split_text(news_content)
-        
-        doc_objs = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "title": article["title"],
-                    "link": article["link"],
-                    "pub_date": article["pub_date"],
-                    "source": article["source"],
-                    "ingested_at": datetime.now().isoformat()
-                }
-            )
-            for chunk in chunks
-        ]
-        all_docs.extend(doc_objs)
-    
-    print(f"  ✓ Created {len(all_docs)} chunks from {len(new_articles)} articles")
-    
-    # 5. Embed and store in vector DB
-    print("\n🔮 Embedding and storing in vector DB...")
-    try:
-        # Extract documents and metadatas for database manager
-        documents = [doc.page_content for doc in all_docs]
-        metadatas = [doc.metadata for doc in all_docs]
-        
-        # Use database manager to add documents
-        success = db_manager.add_documents(documents, metadatas)
-        
-        if success:
-            print(f"  ✓ Successfully stored {len(all_docs)} chunks")
-        else:
-            raise Exception("Failed to add documents to database")
-            
-    except Exception as e:
-        print(f"  ✗ Storage failed: {e}")
+        return {**base, "new_chunks": 0, "status": "failed", "error": feed_error or "No articles fetched"}
+
+    store_error = pipeline_stats["store"]["error"] or pipeline_stats["chunk"]["error"] or pipeline_stats["dedup"]["error"]
+    if store_error or feed_error:
+        print(f"  ✗ {'Storage' if store_error else 'Feed processing'} failed: {store_error or feed_error}")
         return {
-            "new_articles": len(new_articles),
-            "new_chunks": 0,
-            "total_articles": len(existing_links),
+            **base,
+            "new_chunks": run.new_chunks,
             "status": "failed",
-            "error": str(e)
+            "error": store_error or feed_error,
+            "write": _write_delta(writer_stats_before, pipeline_stats["store"]),
+            "embedding_cache": _embedding_cache_delta(cache_stats_before)
         }
-    
-    # 6. Summary
-    total_articles = len(existing_links) + len(new_articles)
+
+    # Only now may the next poll skip these feed bodies
+    _save_feed_state(run.feed_updates)
+
+    if not run.new_articles:
+        print("\n✨ No new articles to add. Database is up to date.")
+        return {**base, "new_chunks": 0, "status": "up_to_date"}
+
+    # Summary
+    write_stats = _write_delta(writer_stats_before, pipeline_stats["store"])
     result = {
-        "new_articles": len(new_articles),
-        "new_chunks": len(all_docs),
-        "total_articles": total_articles,
-        "sources": sources_count,
+        **base,
+        "new_chunks": run.new_chunks,
+        "sources": run.sources_count,
+        "write": write_stats,
+        "embedding_cache": _embedding_cache_delta(cache_stats_before),
         "status": "success",
         "timestamp": datetime.now().isoformat()
     }
-    
+
     print(f"\n{'='*60}")
     print(f"✅ Extraction Complete!")
     print(f"{'='*60}")
     print(f"   New articles added: {result['new_articles']}")
     print(f"   New chunks created: {result['new_chunks']}")
     print(f"   Total articles in DB: {result['total_articles']}")
+    print(f"   Duplicate chunks skipped: {run.duplicate_chunks} "
+          f"({run.referenced_articles} articles fully covered by stored text)")
+    print(f"   Near-duplicate articles merged: {len(merged)}")
+    print(f"   Write throughput: {write_stats['chunks_per_s']} chunks/s "
+          f"in {write_stats['batches']} batches")
+    print(f"   Embedding cache: {result['embedding_cache']['hits']} hits, "
+          f"{result['embedding_cache']['misses']} misses")
+    for name, stage in pipeline_stats.items():
+        print(f"   {name:<6} {stage['in']:>4} in → {stage['out']:>4} out  "
+              f"{stage['items_per_s']:>8} items/s  max queue {stage['max_queue_depth']}")
     print(f"{'='*60}\n")
-    
+
     return result
 
 
 if __name__ == "__main__":
     result = extract_and_store()
     print(f"\nFinal result: {result}")
-
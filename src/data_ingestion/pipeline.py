@@ -0,0 +1,129 @@
+"""
+Staged ingestion pipeline with bounded queues.
+
+Each stage runs in its own worker threads and is connected to the next by
+a bounded queue, so a slow stage blocks the ones feeding it (backpressure)
+instead of letting work pile up in memory, and network-bound stages keep
+running while CPU-bound ones work. A stage function takes one item and
+returns an iterable of outputs (or None); generators are consumed lazily,
+so a stage can stream from its input while downstream queues are full.
+
+Per stage the pipeline records items in and out, errors, busy and wall
+time, throughput and the deepest its input queue got.
+"""
+import contextvars
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from src.utils.config import INGEST_QUEUE_SIZE
+
+_STOP = object()
+
+class Stage:
+    """A named pipeline step run by one or more worker threads"""
+
+    def __init__(self, name: str, func: Callable[[Any], Optional[Iterable[Any]]], workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+class Pipeline:
+    """Runs stages concurrently, connected by bounded queues"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = INGEST_QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self._lock = threading.Lock()
+
+    def run(self, items: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        """Push items through every stage and wait for the pipeline to drain.
+
+        Items that make a stage raise are counted as errors and dropped; the
+        first error message per stage is kept. Outputs of the last stage
+        are discarded. Returns per-stage metrics keyed by stage name.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        metrics = {
+            stage.name: {"workers": stage.workers, "in": 0, "out": 0, "errors": 0, "error": None,
+                         "busy_s": 0.0, "max_queue_depth": 0, "_first": None, "_last": None}
+            for stage in self.stages
+        }
+        remaining = [stage.workers for stage in self.stages]
+
+        def put(index: int, item: Any):
+            """Blocking put into a stage's input queue, recording its depth"""
+            queues[index].put(item)
+            depth = queues[index].qsize()
+            stage_metrics = metrics[self.stages[index].name]
+            with self._lock:
+                if depth > stage_metrics["max_queue_depth"]:
+                    stage_metrics["max_queue_depth"] = depth
+
+        def worker(index: int):
+            stage = self.stages[index]
+            stage_metrics = metrics[stage.name]
+            downstream = index + 1 < len(self.stages)
+            while True:
+                item = queues[index].get()
+                if item is _STOP:
+                    # Let sibling workers see the stop too; the last one forwards it
+                    queues[index].put(_STOP)
+                    with self._lock:
+                        remaining[index] -= 1
+                        last = remaining[index] == 0
+                    if last and downstream:
+                        put(index + 1, _STOP)
+                    return
+
+                started = time.perf_counter()
+                busy = 0.0
+                produced = 0
+                try:
+                    for output in stage.func(item) or ():
+                        busy += time.perf_counter() - started
+                        produced += 1
+                        if downstream:
+                            # Blocks while the next stage is behind (time spent waiting is not busy time)
+                            put(index + 1, output)
+                        started = time.perf_counter()
+                    busy += time.perf_counter() - started
+                except Exception as e:
+                    busy += time.perf_counter() - started
+                    with self._lock:
+                        stage_metrics["errors"] += 1
+                        stage_metrics["error"] = stage_metrics["error"] or f"{type(e).__name__}: {e}"
+                    print(f"  ✗ {stage.name} stage failed: {e}")
+                finished = time.perf_counter()
+                with self._lock:
+                    stage_metrics["in"] += 1
+                    stage_metrics["out"] += produced
+                    stage_metrics["busy_s"] += busy
+                    if stage_metrics["_first"] is None:
+                        stage_metrics["_first"] = finished - busy
+                    stage_metrics["_last"] = finished
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                # Workers carry the caller's context (e.g. token usage tracking)
+                thread = threading.Thread(
+                    target=contextvars.copy_context().run, args=(worker, index),
+                    name=f"ingest-{stage.name}-{number}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            put(0, item)
+        put(0, _STOP)
+        for thread in threads:
+            thread.join()
+
+        for stage_metrics in metrics.values():
+            first, last = stage_metrics.pop("_first"), stage_metrics.pop("_last")
+            wall = (last - first) if first is not None else 0.0
+            stage_metrics["busy_s"] = round(stage_metrics["busy_s"], 3)
+            stage_metrics["wall_s"] = round(wall, 3)
+            stage_metrics["items_per_s"] = round(stage_metrics["in"] / wall, 1) if wall > 0 else 0.0
+        return metrics
@@ -0,0 +1,106 @@
+"""
+Streaming RSS 2.0 / Atom parser shared by the feed sources.
+
+Items are parsed incrementally with iterparse and yielded one at a time;
+each processed element (and the siblings before it) is cleared, so memory
+stays flat however large the feed or archive is. Uses lxml when available
+and falls back to the standard library parser.
+"""
+import io
+from typing import BinaryIO, Dict, Iterator, Union
+
+try:
+    from lxml import etree as _etree
+    HAS_LXML = True
+except ImportError:
+    import xml.etree.ElementTree as _etree
+    HAS_LXML = False
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+RSS_ITEM_TAGS = {"item"}
+ATOM_ENTRY_TAGS = {f"{ATOM_NS}entry"}
+
+def _local_name(tag) -> str:
+    """Tag name without its namespace"""
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+def _text(element) -> str:
+    """Text of an element including nested markup text (e.g. XHTML Atom content)"""
+    if element is None:
+        return ""
+    return "".join(element.itertext()).strip()
+
+def _rss_item(element, source: str) -> Dict[str, str]:
+    """Article dict from an RSS <item>; one pass over the children"""
+    fields = {}
+    for child in element:
+        name = _local_name(child.tag)
+        if name in ("title", "link", "description", "pubDate") and name not in fields:
+            fields[name] = (child.text or "").strip()
+    return {
+        'title': fields.get("title") or "No title",
+        'link': fields.get("link") or "No link",
+        'description': fields.get("description") or "No description",
+        'pub_date': fields.get("pubDate") or "No date",
+        'source': source
+    }
+
+def _atom_entry(element, source: str) -> Dict[str, str]:
+    """Article dict from an Atom <entry>"""
+    fields = {}
+    link = ""
+    for child in element:
+        name = _local_name(child.tag)
+        if name == "link":
+            # Prefer rel="alternate" (the default when rel is missing)
+            if not link or child.get("rel", "alternate") == "alternate":
+                link = child.get("href") or link
+        elif name in ("title", "summary", "content", "published", "updated") and name not in fields:
+            fields[name] = _text(child)
+    return {
+        'title': fields.get("title") or "No title",
+        'link': link or "No link",
+        'description': fields.get("content") or fields.get("summary") or "No description",
+        'pub_date': fields.get("published") or fields.get("updated") or "No date",
+        'source': source
+    }
+
+def iter_feed_items(feed: Union[bytes, BinaryIO], source: str) -> Iterator[Dict[str, str]]:
+    """Yield article dicts from an RSS 2.0 or Atom feed given as bytes or a binary stream"""
+    stream = io.BytesIO(feed) if isinstance(feed, (bytes, bytearray)) else feed
+    tags = RSS_ITEM_TAGS | ATOM_ENTRY_TAGS
+
+    if HAS_LXML:
+        context = _etree.iterparse(stream, events=("end",), tag=tags,
+                                   resolve_entities=False, no_network=True, huge_tree=True)
+        for _, element in context:
+            if element.tag == "item":
+                yield _rss_item(element, source)
+            else:
+                yield _atom_entry(element, source)
+            # Free the item and everything parsed before it
+            element.clear(keep_tail=False)
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        del context
+        return
+
+    root = None
+    for event, element in _etree.iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = element
+        if event != "end" or element.tag not in tags:
+            continue
+        if element.tag == "item":
+            yield _rss_item(element, source)
+        else:
+            yield _atom_entry(element, source)
+        element.clear()
+        # The stdlib parser has no getparent(); items sit directly under the
+        # root (Atom) or one level down (RSS <channel>)
+        for parent in (root, *list(root)):
+            if element in list(parent):
+                parent.remove(element)
+                break
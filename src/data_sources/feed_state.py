@@ -0,0 +1,87 @@
+"""
+Per-feed HTTP cache state for conditional polling.
+
+Stores the ETag, Last-Modified and a hash of the last body for every feed
+URL. The extractor sends them back as If-None-Match / If-Modified-Since so
+unchanged feeds answer 304, and compares SHA-256 body hashes to skip feeds whose
+servers ignore conditional requests. State is only saved once the articles
+from that body are safely stored, so a failed run is retried in full.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from src.utils.config import FEED_STATE_PATH
+
+class FeedStateStore:
+    """SQLite-backed ETag / Last-Modified / body hash per feed URL"""
+
+    def __init__(self, path: str = FEED_STATE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the state database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS feed_state (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body_hash TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, url: str) -> Dict[str, Optional[str]]:
+        """Saved state for a feed (empty values if it was never polled)"""
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT etag, last_modified, body_hash FROM feed_state WHERE url = ?", (url,)
+            ).fetchone()
+        etag, last_modified, saved_hash = row if row else (None, None, None)
+        return {"etag": etag, "last_modified": last_modified, "body_hash": saved_hash}
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for the next poll"""
+        state = self.get(url)
+        headers = {}
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state["last_modified"]:
+            headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def save(self, url: str, etag: Optional[str], last_modified: Optional[str],
+             content_hash: Optional[str]):
+        """Record the validators and body hash of a successfully processed response"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO feed_state (url, etag, last_modified, body_hash, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_hash, time.time())
+            )
+            conn.commit()
+
+    def clear(self, url: Optional[str] = None):
+        """Forget state so the next poll downloads and processes the full feed"""
+        with self._lock:
+            conn = self._get_conn()
+            if url is None:
+                conn.execute("DELETE FROM feed_state")
+            else:
+                conn.execute("DELETE FROM feed_state WHERE url = ?", (url,))
+            conn.commit()
+
+# Global instance
+feed_state = FeedStateStore()
@@ -0,0 +1,160 @@
+"""
+Pooled HTTP fetch layer for news feeds.
+
+All feed requests go through one shared requests.Session whose connection
+pools are capped per host, so sources fetched concurrently reuse keep-alive
+connections without opening unbounded sockets to any one site. Every fetch
+has an overall deadline; transient failures (connection errors, timeouts,
+429 and 5xx responses) are retried with exponential backoff and full jitter
+for as long as the deadline allows. Callers may pass conditional request
+headers; a 304 comes back as a successful result with not_modified set.
+
+Bodies are streamed into a SpooledTemporaryFile (in memory up to
+FETCH_SPOOL_MAX_BYTES, on disk beyond) and hashed on the way, so large
+feeds never need to be held in memory as one bytes object.
+"""
+import hashlib
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from src.utils.config import (
+    FETCH_MAX_CONNECTIONS_PER_HOST,
+    FETCH_CONNECT_TIMEOUT_SECONDS,
+    FETCH_READ_TIMEOUT_SECONDS,
+    FETCH_DEADLINE_SECONDS,
+    FETCH_MAX_RETRIES,
+    FETCH_BACKOFF_SECONDS,
+    FETCH_SPOOL_MAX_BYTES
+)
+
+USER_AGENT = "AI-News-Analyst/1.0 (+feed fetcher)"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Shared session with per-host connection pools"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # pool_block makes extra concurrent requests to a host wait for a free connection
+            adapter = HTTPAdapter(
+                pool_connections=16,
+                pool_maxsize=FETCH_MAX_CONNECTIONS_PER_HOST,
+                pool_block=True,
+                max_retries=0
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, honouring a numeric Retry-After header"""
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return random.uniform(0, FETCH_BACKOFF_SECONDS * (2 ** attempt))
+
+def _read_body(response: requests.Response, deadline: float):
+    """Stream a body into a spooled temp file, giving up once the deadline passes.
+
+    The read timeout only bounds each read, so the deadline is checked per
+    chunk. Returns (file positioned at 0, size, sha256 hex digest).
+    """
+    raw = response.raw
+    if not hasattr(raw, "read1"):
+        # urllib3 < 2 fills each chunk before returning, so the deadline is checked less often
+        chunks = response.iter_content(chunk_size=64 * 1024)
+    else:
+        chunks = iter(lambda: raw.read1(64 * 1024, decode_content=True), b"")
+
+    body = tempfile.SpooledTemporaryFile(max_size=FETCH_SPOOL_MAX_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        for part in chunks:
+            body.write(part)
+            digest.update(part)
+            size += len(part)
+            if time.monotonic() > deadline:
+                raise requests.Timeout("deadline exceeded while reading the response body")
+    except BaseException:
+        body.close()
+        raise
+    body.seek(0)
+    return body, size, digest.hexdigest()
+
+def fetch_url(url: str, deadline_seconds: float = FETCH_DEADLINE_SECONDS,
+              max_retries: int = FETCH_MAX_RETRIES,
+              headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Fetch a URL within a deadline, retrying transient failures.
+
+    Never raises; returns a dict with body (a readable binary file, None on
+    failure or 304; the caller closes it), content_hash, status,
+    not_modified, etag, last_modified, bytes, attempts, latency_s and error.
+    """
+    session = get_session()
+    start = time.monotonic()
+    deadline = start + deadline_seconds
+    result: Dict[str, Any] = {"url": url, "body": None, "content_hash": None,
+                              "status": None, "not_modified": False,
+                              "etag": None, "last_modified": None, "bytes": 0,
+                              "attempts": 0, "error": None}
+
+    for attempt in range(max_retries + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            result["error"] = result["error"] or "deadline exceeded"
+            break
+
+        result["attempts"] = attempt + 1
+        retry_after = None
+        try:
+            with session.get(
+                url,
+                headers=headers,
+                stream=True,
+                timeout=(min(FETCH_CONNECT_TIMEOUT_SECONDS, remaining),
+                         min(FETCH_READ_TIMEOUT_SECONDS, remaining))
+            ) as response:
+                result["status"] = response.status_code
+                if response.status_code == 304:
+                    result["not_modified"] = True
+                    result["error"] = None
+                    break
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    result["etag"] = response.headers.get("ETag")
+                    result["last_modified"] = response.headers.get("Last-Modified")
+                    result["body"], result["bytes"], result["content_hash"] = _read_body(response, deadline)
+                    result["error"] = None
+                    break
+                result["error"] = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+        except (requests.ConnectionError, requests.Timeout, urllib3.exceptions.HTTPError) as e:
+            # Reading the raw body raises urllib3's own errors (ReadTimeoutError, ProtocolError)
+            result["error"] = f"{type(e).__name__}: {e}"
+        except requests.RequestException as e:
+            # Non-retryable (e.g. 404)
+            result["error"] = f"{type(e).__name__}: {e}"
+            break
+        except OSError as e:
+            # Socket errors mid-body, or the spool file failing to write
+            result["error"] = f"{type(e).__name__}: {e}"
+
+        if attempt < max_retries:
+            delay = _backoff(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+
+    result["latency_s"] = round(time.monotonic() - start, 3)
+    return result
@@ -1,13 +1,10 @@
-import requests
-import xml.etree.ElementTree as ET
 from datetime import datetime
-from bs4 import BeautifulSoup
 import warnings
 import urllib3
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain.schema import Document
+from src.rag.embedding_cache import build_embedding_model
+from src.data_sources.http_client import fetch_url
+from src.data_sources.feed_parser import iter_feed_items
+from src.data_sources.html_cleaner import clean_descriptions
 import os
 from dotenv import load_dotenv
 
@@ -22,65 +19,42 @@ except AttributeError:
 
 mit_rss = "https://www.technologyreview.com/feed/"
 
-def parse_mit_rss():
+def parse_mit_rss(content=None):
+    """Parse the MIT Technology Review feed (bytes or a binary stream); fetches it unless given"""
     try:
-        response = requests.get(mit_rss)
-        root = ET.fromstring(response.content)
-        
-        articles = []
-        for item in root.findall('.//item'):
-            title_elem = item.find('title')
-            title = title_elem.text if title_elem is not None and title_elem.text else "No title"
-            
-            link_elem = item.find('link')
-            link = link_elem.text if link_elem is not None and link_elem.text else "No link"
-            
-            description_elem = item.find('description')
-            description = description_elem.text if description_elem is not None and description_elem.text else "No description"
-            
-            pub_date_elem = item.find('pubDate')
-            pub_date = pub_date_elem.text if pub_date_elem is not None and pub_date_elem.text else "No date"
-            
-            articles.append({
-                'title': title,
-                'link': link,
-                'description': description,
-                'pub_date': pub_date,
-                'source': 'mit'
-            })
-        
-        return articles
+        if content is None:
+            fetched = fetch_url(mit_rss)
+            if fetched["body"] is None:
+                raise Exception(fetched["error"])
+            with fetched["body"] as body:
+                return list(iter_feed_items(body, 'mit'))
+        return list(iter_feed_items(content, 'mit'))
     
     except Exception as e:
         print(f"Error parsing RSS: {e}")
         return []
 
-def get_text():
-    articles = parse_mit_rss()
-    for i in range(len(articles)):
-        # Only parse with BeautifulSoup if description exists and is not a placeholder
-        description = articles[i]['description']
-        if description and description != "No description":
-            soup = BeautifulSoup(description, "html.parser")
-            text = soup.get_text()
-            articles[i]['description'] = text
-    return articles
+def get_text(content=None):
+    # Placeholder descriptions are left untouched
+    return clean_descriptions(parse_mit_rss(content))
 
 
-response = get_text()
-
 # ========================
 # Embedding
 # ========================
 
 load_dotenv()
-openai_api_key = os.environ["OPENAI_API_KEY"]
-embedding_model = OpenAIEmbeddings(api_key=openai_api_key, model="text-embedding-3-small")
+# Cheap: the OpenAI client is only built when the first embedding is requested
+embedding_model = build_embedding_model()
 
 def Embedding_news(persist_directory="./data/vector_db"):
     """
     Create or update vector store with new articles, avoiding duplicates.
     """
+    # Imported here so importing this module stays cheap
+    from langchain_chroma import Chroma
+    from langchain.schema import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
 
     print("=== Searching Related news ===")
     articles = get_text()
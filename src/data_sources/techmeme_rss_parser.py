@@ -1,13 +1,10 @@
-import requests
-import xml.etree.ElementTree as ET
 from datetime import datetime
-from bs4 import BeautifulSoup
 import warnings
 import urllib3
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
-from langchain.schema import Document
+from src.rag.embedding_cache import build_embedding_model
+from src.data_sources.http_client import fetch_url
+from src.data_sources.feed_parser import iter_feed_items
+from src.data_sources.html_cleaner import clean_descriptions
 import os
 from dotenv import load_dotenv
 
@@ -21,52 +18,40 @@ except AttributeError:
 
 techmeme_rss = "https://www.techmeme.com/feed.xml"
 
-def parse_techmeme_rss():
+def parse_techmeme_rss(content=None):
+    """Parse the Techmeme feed (bytes or a binary stream); fetches it unless given"""
     try:
-        response = requests.get(techmeme_rss)
-        root = ET.fromstring(response.content)
-        
-        articles = []
-        for item in root.findall('.//item'):
-            title = item.find('title').text if item.find('title') is not None else "No title"
-            link = item.find('link').text if item.find('link') is not None else "No link"
-            description = item.find('description').text if item.find('description') is not None else "No description"
-            pub_date = item.find('pubDate').text if item.find('pubDate') is not None else "No date"
-            
-            articles.append({
-                'title': title,
-                'link': link,
-                'description': description,
-                'pub_date': pub_date,
-                'source' : 'techmeme'
-            })
-        
-        return articles
+        if content is None:
+            fetched = fetch_url(techmeme_rss)
+            if fetched["body"] is None:
+                raise Exception(fetched["error"])
+            with fetched["body"] as body:
+                return list(iter_feed_items(body, 'techmeme'))
+        return list(iter_feed_items(content, 'techmeme'))
     
     except Exception as e:
         print(f"Error parsing RSS: {e}")
         return []
 
-def get_text():
-    articles = parse_techmeme_rss()
-    for i in range(len(articles)):
-        soup = BeautifulSoup(articles[i]['description'], "html.parser")
-        text = soup.get_text()
-        articles[i]['description'] = text
-    return articles
+def get_text(content=None):
+    return clean_descriptions(parse_techmeme_rss(content))
 
 # ========================
 # Embedding
 # ========================
 
 load_dotenv()
-openai_api_key = os.environ["OPENAI_API_KEY"]
-embedding_model = OpenAIEmbeddings(api_key=openai_api_key, model="text-embedding-3-small")
+# Cheap: the OpenAI client is only built when the first embedding is requested
+embedding_model = build_embedding_model()
 
 def Embedding_news(persist_directory="./data/vector_db"):
     """
     Create or update vector store with new articles, avoiding duplicates.
     """
+    # Imported here so importing this module stays cheap
+    from langchain_chroma import Chroma
+    from langchain.schema import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
 
     print("=== Searching Related news ===")
     articles = get_text()
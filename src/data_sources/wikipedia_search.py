@@ -1,8 +1,8 @@
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
-
 def wiki_search(topic):
+    # Imported on first search so importing the workflow stays cheap
+    from langchain_community.tools import WikipediaQueryRun
+    from langchain_community.utilities import WikipediaAPIWrapper
+
     wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
     wiki_doc = wikipedia.run(topic)
     return wiki_doc
-
@@ -0,0 +1,270 @@
+"""
+Precomputed article index for the news listing.
+
+Ingestion writes one compact row per article (title, link, source, pub_date
+and a short snippet) into a local SQLite database, pre-sorted by an index on
+publication time. The listing endpoint pages through it with keyset queries,
+so its latency does not depend on vector DB round trips or corpus size.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from src.rag.link_index import batched
+from src.utils.config import ARTICLE_INDEX_PATH, ARTICLE_SNIPPET_CHARS, LINK_QUERY_BATCH_SIZE
+from src.utils.dates import parse_pub_date
+
+# Chunks are stored as "Title: ..., Content: ..."; the snippet only keeps the content
+_CHUNK_PREFIX = re.compile(r"^Title:.*?, Content:\s*", re.DOTALL)
+
+def chunk_content(text: str) -> str:
+    """Stored chunk text without its title prefix"""
+    return _CHUNK_PREFIX.sub("", text or "", count=1)
+
+def make_snippet(text: str, max_chars: int = ARTICLE_SNIPPET_CHARS) -> str:
+    """Trim article text to a short snippet, breaking on a word boundary"""
+    text = " ".join(chunk_content(text).split())
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars].rstrip() + "..."
+
+def article_row(article: Dict[str, Any]) -> Tuple:
+    """Index row for an article dict as produced by the data sources"""
+    link = article.get('link', '') or ''
+    pub_date = article.get('pub_date', '') or ''
+    return (
+        link or article.get('title', ''),
+        article.get('title', ''),
+        link,
+        article.get('source', ''),
+        pub_date,
+        parse_pub_date(pub_date) or 0,
+        # The first chunk at ingestion and on resync alike, so a resync leaves snippets unchanged
+        make_snippet(article.get('content') or article.get('description') or '')
+    )
+
+class ArticleIndex:
+    """SQLite-backed, pre-sorted listing of stored articles"""
+
+    def __init__(self, path: str = ARTICLE_INDEX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the index database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    key TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    pub_date TEXT NOT NULL,
+                    pub_ts REAL NOT NULL,
+                    snippet TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_recency ON articles (pub_ts DESC, key)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS index_meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _write(self, operation):
+        """Run a write in one IMMEDIATE transaction"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, name: str, value: str):
+        conn.execute(
+            "INSERT INTO index_meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value)
+        )
+
+    def _get_meta(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT value FROM index_meta WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def upsert_articles(self, articles: List[Dict[str, Any]]) -> int:
+        """Add or update articles, e.g. right after ingestion stored them"""
+        rows = [article_row(article) for article in articles]
+        if not rows:
+            return 0
+
+        def operation(conn):
+            conn.executemany(
+                "INSERT OR REPLACE INTO articles (key, title, link, source, pub_date, pub_ts, snippet) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._set_meta(conn, "revision", uuid.uuid4().hex)
+            return len(rows)
+
+        return self._write(operation)
+
+    def replace_all(self, articles: List[Dict[str, Any]]) -> bool:
+        """Resynchronize the whole index; returns True if its contents changed"""
+        rows = sorted({row[0]: row for row in map(article_row, articles)}.values())
+
+        def operation(conn):
+            current = conn.execute(
+                "SELECT key, title, link, source, pub_date, pub_ts, snippet FROM articles ORDER BY key"
+            ).fetchall()
+            changed = current != rows
+            if changed:
+                conn.execute("DELETE FROM articles")
+                conn.executemany(
+                    "INSERT INTO articles (key, title, link, source, pub_date, pub_ts, snippet) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._set_meta(conn, "revision", uuid.uuid4().hex)
+            self._set_meta(conn, "synced_at", str(time.time()))
+            return changed
+
+        return self._write(operation)
+
+    def delete_links(self, links: List[str]) -> int:
+        """Remove articles by link, e.g. after retention deleted them from the vector store"""
+        links = list(set(link for link in links if link))
+        if not links:
+            return 0
+
+        def operation(conn):
+            deleted = 0
+            for batch in batched(links, LINK_QUERY_BATCH_SIZE):
+                placeholders = ",".join("?" * len(batch))
+                deleted += conn.execute(f"DELETE FROM articles WHERE link IN ({placeholders})", batch).rowcount
+            if deleted:
+                self._set_meta(conn, "revision", uuid.uuid4().hex)
+            return deleted
+
+        return self._write(operation)
+
+    def get_revision(self) -> str:
+        """Token that changes whenever the index contents change"""
+        return self._get_meta("revision") or ""
+
+    def get_synced_at(self) -> Optional[float]:
+        """Wall-clock time of the last full resync with the vector store"""
+        value = self._get_meta("synced_at")
+        return float(value) if value else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._get_conn().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def sources(self) -> List[str]:
+        """Distinct sources of indexed articles"""
+        with self._lock:
+            rows = self._get_conn().execute("SELECT DISTINCT source FROM articles").fetchall()
+        return [row[0] for row in rows]
+
+    def expired_links(self, source: str, cutoff_ts: Optional[float] = None,
+                      keep: Optional[int] = None) -> List[str]:
+        """Links of a source's articles published before cutoff_ts or beyond its `keep` newest.
+
+        Articles without a parseable publication date never expire by age.
+        """
+        links = set()
+        with self._lock:
+            conn = self._get_conn()
+            if cutoff_ts is not None:
+                rows = conn.execute(
+                    "SELECT link FROM articles WHERE source = ? AND pub_ts > 0 AND pub_ts < ?",
+                    (source, cutoff_ts)
+                ).fetchall()
+                links.update(row[0] for row in rows)
+            if keep is not None:
+                rows = conn.execute(
+                    "SELECT link FROM articles WHERE source = ? ORDER BY pub_ts DESC, key LIMIT -1 OFFSET ?",
+                    (source, keep)
+                ).fetchall()
+                links.update(row[0] for row in rows)
+        links.discard("")
+        return sorted(links)
+
+    def page(self, after: Optional[Tuple[float, str]] = None, limit: int = 50,
+             source: Optional[str] = None, since_ts: Optional[float] = None,
+             until_ts: Optional[float] = None) -> Dict[str, Any]:
+        """One page of articles newest first, starting after the (pub_ts, key) position"""
+        filters, params = [], []
+        if source:
+            filters.append("source = ?")
+            params.append(source)
+        if since_ts is not None:
+            filters.append("pub_ts >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            filters.append("pub_ts < ?")
+            params.append(until_ts)
+        where = " AND ".join(filters) or "1"
+
+        keyset, keyset_params = "", []
+        if after is not None:
+            keyset = " AND (pub_ts < ? OR (pub_ts = ? AND key > ?))"
+            keyset_params = [after[0], after[0], after[1]]
+
+        with self._lock:
+            conn = self._get_conn()
+            total = conn.execute(f"SELECT COUNT(*) FROM articles WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT key, title, link, source, pub_date, pub_ts, snippet FROM articles "
+                f"WHERE {where}{keyset} ORDER BY pub_ts DESC, key LIMIT ?",
+                params + keyset_params + [limit + 1]
+            ).fetchall()
+
+        items = []
+        for key, title, link, source_name, pub_date, pub_ts, snippet in rows[:limit]:
+            items.append({
+                "title": title,
+                "link": link,
+                "link_text": f"Read more at {source_name or 'Unknown Source'}" if link else "",
+                "has_link": bool(link),
+                "snippet": snippet,
+                "pub_date": pub_date,
+                "pub_ts": pub_ts or None,
+                "source": source_name,
+                "_key": key
+            })
+        return {"items": items, "has_more": len(rows) > limit, "total": total}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Size and freshness of the index"""
+        return {
+            "articles": self.count(),
+            "revision": self.get_revision(),
+            "synced_at": self.get_synced_at()
+        }
+
+# Global instance
+article_index = ArticleIndex()
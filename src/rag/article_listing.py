@@ -0,0 +1,138 @@
+"""
+Article listing for the news feed: serves cursor-paginated pages, newest
+first, from the precomputed article index.
+
+Ingestion keeps the index current. The vector store remains the source of
+truth, so the index is also resynchronized from it in the background once it
+is older than the listing TTL (stale-while-revalidate); this covers ingestion
+that ran on another machine. Requests never wait on that resync except on
+the very first one, when the index is still empty.
+"""
+import base64
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from src.rag.article_index import ArticleIndex, article_index
+from src.utils.config import NEWS_LISTING_TTL_SECONDS
+
+def collapse_articles(all_docs: Dict[str, Any]) -> List[Dict]:
+    """Reduce stored chunks to one article dict per link; its first chunk covers the snippet"""
+    articles: Dict[str, Dict] = {}
+    positions: Dict[str, int] = {}
+    documents = all_docs.get('documents') or []
+    metadatas = all_docs.get('metadatas') or []
+
+    for i, doc in enumerate(documents):
+        metadata = (metadatas[i] if i < len(metadatas) else None) or {}
+        key = metadata.get('link', '') or metadata.get('title', '')
+        # Stores return chunks in no particular order
+        position = metadata.get('chunk_index') or 0
+
+        if key not in articles or position < positions[key]:
+            positions[key] = position
+            articles[key] = {
+                "title": metadata.get('title', ''),
+                "link": metadata.get('link', ''),
+                "content": doc,
+                "pub_date": metadata.get('pub_date', ''),
+                "source": metadata.get('source', '')
+            }
+
+    return list(articles.values())
+
+def encode_cursor(pub_ts: Optional[float], key: str) -> str:
+    """Opaque cursor pointing just after the given article"""
+    raw = json.dumps([pub_ts or 0, key])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Decode a cursor into a (pub_ts, key) position; raises ValueError if it is malformed"""
+    try:
+        pub_ts, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (float(pub_ts), str(key))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class ArticleListing:
+    """Serves listing pages from the article index and keeps it in sync with the vector store"""
+
+    def __init__(self, index: ArticleIndex = article_index,
+                 ttl_seconds: float = NEWS_LISTING_TTL_SECONDS):
+        self.index = index
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._last_error: Optional[str] = None
+
+    def sync(self, db_manager) -> bool:
+        """Rebuild the index from the vector store; returns True if it changed"""
+        return self.index.replace_all(collapse_articles(db_manager.get_all_documents()))
+
+    def _refresh_in_background(self, db_manager):
+        def run():
+            try:
+                self.sync(db_manager)
+                self._last_error = None
+            except Exception as e:
+                self._last_error = str(e)
+                print(f"Warning: Article index refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="article-index-refresh", daemon=True).start()
+
+    def revalidate(self, db_manager):
+        """Resync a stale index in the background; block only while it has never been built"""
+        synced_at = self.index.get_synced_at()
+        if synced_at is None and self.index.count() == 0:
+            with self._lock:
+                self.sync(db_manager)
+            return
+
+        if synced_at is not None and time.time() - synced_at < self.ttl_seconds:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        self._refresh_in_background(db_manager)
+
+    def count(self, db_manager) -> int:
+        """Number of stored articles, resyncing first if the index is past its TTL"""
+        synced_at = self.index.get_synced_at()
+        if synced_at is None or time.time() - synced_at >= self.ttl_seconds:
+            with self._lock:
+                self.sync(db_manager)
+        return self.index.count()
+
+    def get_revision(self, db_manager) -> str:
+        """Revalidate if needed and return the index revision used for ETags"""
+        self.revalidate(db_manager)
+        return self.index.get_revision()
+
+    def get_page(self, cursor: Optional[str] = None, limit: int = 50,
+                 source: Optional[str] = None, since_ts: Optional[float] = None,
+                 until_ts: Optional[float] = None) -> Dict[str, Any]:
+        """One page of articles plus the cursor for the next one"""
+        after = decode_cursor(cursor) if cursor else None
+        page = self.index.page(after, limit, source, since_ts, until_ts)
+
+        items = page["items"]
+        next_cursor = None
+        if items and page["has_more"]:
+            next_cursor = encode_cursor(items[-1]["pub_ts"], items[-1]["_key"])
+        for item in items:
+            del item["_key"]
+        return {"items": items, "next_cursor": next_cursor, "total": page["total"]}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Index size and freshness for the metrics endpoint"""
+        stats = self.index.get_stats()
+        stats["refreshing"] = self._refreshing
+        stats["last_error"] = self._last_error
+        return stats
+
+# Global instance
+article_listing = ArticleListing()
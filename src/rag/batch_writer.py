@@ -0,0 +1,181 @@
+"""
+Batched, adaptive embedding and upsert writer shared by every vector backend.
+
+Chunks are cut into batches bounded by both item count and token count
+and written by a small pool of workers, each batch embedding its texts and
+storing them through a backend callback. The batch size adapts AIMD-style:
+it grows additively while batches succeed under the target latency and is
+halved when a batch is slow or the provider answers 429; other failures
+leave it unchanged. Transient failures (429, 5xx, timeouts and dropped
+connections) are retried after a full-jitter backoff, while any other
+error fails the write at once. The size is kept between runs, so the next
+ingestion starts where the last one settled.
+"""
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from src.utils.config import (
+    EMBED_BATCH_SIZE,
+    EMBED_BATCH_MIN_SIZE,
+    EMBED_BATCH_MAX_SIZE,
+    EMBED_BATCH_MAX_TOKENS,
+    EMBED_CONCURRENCY,
+    EMBED_TARGET_LATENCY_SECONDS,
+    EMBED_MAX_RETRIES,
+    EMBED_BACKOFF_SECONDS
+)
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate (about 3 characters per token) for bounding batch size"""
+    return len(text) // 3 + 1
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of a provider or backend error, if it carries one"""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether an embedding or storage error is a 429 / rate limit response"""
+    if _status_code(error) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return "ratelimit" in text or "rate limit" in text or "429" in text
+
+def is_transient(error: Exception) -> bool:
+    """Whether retrying could succeed: rate limits, 5xx responses, timeouts and dropped connections"""
+    if is_rate_limited(error) or isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return 500 <= status < 600
+    # Client libraries wrap these in their own types (e.g. APITimeoutError, ConnectError)
+    name = type(error).__name__.lower()
+    return "timeout" in name or "connect" in name
+
+class BatchWriter:
+    """Writes chunks in size- and token-bounded batches with adaptive batch sizing"""
+
+    def __init__(self, batch_size: int = EMBED_BATCH_SIZE, min_batch_size: int = EMBED_BATCH_MIN_SIZE,
+                 max_batch_size: int = EMBED_BATCH_MAX_SIZE, max_batch_tokens: int = EMBED_BATCH_MAX_TOKENS,
+                 concurrency: int = EMBED_CONCURRENCY,
+                 target_latency_seconds: float = EMBED_TARGET_LATENCY_SECONDS,
+                 max_retries: int = EMBED_MAX_RETRIES, backoff_seconds: float = EMBED_BACKOFF_SECONDS):
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.concurrency = max(1, concurrency)
+        self.target_latency_seconds = target_latency_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "chunks": 0, "batches": 0, "rate_limited": 0, "retries": 0}
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    def _adjust(self, latency: float, succeeded: bool = True, rate_limited: bool = False):
+        """AIMD step: halve on 429 or a slow batch, grow by a tenth of the ceiling
+        after a fast success, and hold after any other failure"""
+        with self._lock:
+            if rate_limited or latency > self.target_latency_seconds:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            elif succeeded:
+                step = max(1, self.max_batch_size // 10)
+                self.batch_size = min(self.max_batch_size, self.batch_size + step)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, self.backoff_seconds * (2 ** attempt))
+
+    def write(self, texts: List[str], metadatas: List[Dict],
+              write_batch: Callable[[List[str], List[Dict]], Any]) -> Dict[str, Any]:
+        """Embed and store every chunk through write_batch(texts, metadatas).
+
+        Raises the first error of a batch that fails permanently or still fails
+        after retries; batches already written stay written. Returns the run's
+        throughput stats.
+        """
+        tokens = [estimate_tokens(text) for text in texts]
+        position = 0
+        position_lock = threading.Lock()
+        failure: List[Exception] = []
+        run = {"chunks": 0, "batches": 0, "rate_limited": 0, "retries": 0}
+
+        def next_batch():
+            """Cut the next batch at the current adaptive size, within the token budget"""
+            nonlocal position
+            with position_lock:
+                if failure or position >= len(texts):
+                    return None
+                start = position
+                limit = min(len(texts), start + self.batch_size)
+                end, budget = start, 0
+                while end < limit and (end == start or budget + tokens[end] <= self.max_batch_tokens):
+                    budget += tokens[end]
+                    end += 1
+                position = end
+                return start, end
+
+        def worker():
+            while True:
+                batch = next_batch()
+                if batch is None:
+                    return
+                start, end = batch
+                for attempt in range(self.max_retries + 1):
+                    started = time.perf_counter()
+                    try:
+                        write_batch(texts[start:end], metadatas[start:end])
+                    except Exception as e:
+                        limited = is_rate_limited(e)
+                        self._adjust(time.perf_counter() - started, succeeded=False, rate_limited=limited)
+                        with position_lock:
+                            run["rate_limited"] += int(limited)
+                            if attempt == self.max_retries or not is_transient(e):
+                                failure.append(e)
+                                return
+                            run["retries"] += 1
+                        time.sleep(self._backoff(attempt))
+                        continue
+                    self._adjust(time.perf_counter() - started)
+                    with position_lock:
+                        run["chunks"] += end - start
+                        run["batches"] += 1
+                    break
+
+        started = time.perf_counter()
+        workers = min(self.concurrency, max(1, len(texts)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Each worker carries the caller's context so token usage is still recorded
+            futures = [executor.submit(contextvars.copy_context().run, worker) for _ in range(workers)]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        run.update({
+            "seconds": round(elapsed, 3),
+            "chunks_per_s": round(run["chunks"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "batch_size": self.batch_size,
+            "concurrency": workers
+        })
+        with self._lock:
+            self._stats["runs"] += 1
+            for key in ("chunks", "batches", "rate_limited", "retries"):
+                self._stats[key] += run[key]
+            self._last_run = run
+        if failure:
+            raise failure[0]
+        return run
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cumulative counters, the current batch size and the last run's throughput"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["batch_size"] = self.batch_size
+            stats["last_run"] = dict(self._last_run) if self._last_run else None
+        return stats
+
+# Global instance
+embedding_writer = BatchWriter()
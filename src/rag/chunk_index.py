@@ -0,0 +1,328 @@
+"""
+Content-hash index of chunks already stored in each vector backend.
+
+Chunk text is normalized (case, whitespace) and hashed before embedding.
+Chunks whose hash is already stored in the scope are neither embedded nor
+written again; instead the new article is recorded as an extra reference
+to the stored chunk, so search results can still credit every source that
+carried the text. Entries are scoped by backend and collection like the
+link index. The index only learns about chunks written since it was
+introduced, so a lost index means some text is stored once more, never
+that a new chunk is skipped.
+
+References are also written into the referenced chunk's metadata in the
+vector store (REFERENCES_KEY, the ALSO_REPORTED_BY_LIMIT most recent as a
+JSON list), so a search served by another host still credits them. The
+local index is a cache of the store: a scope it has never loaded is filled
+from the stored chunks' hashes and references on first use, so a fresh
+ingestion container does not embed text that is already stored.
+
+Every stored chunk also gets a deterministic ID derived from its article
+link, its position in the article and its content hash. Backends write
+with upsert semantics on that ID, so re-running an interrupted or
+overlapping ingestion overwrites chunks instead of duplicating them.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from src.rag.link_index import batched
+from src.utils.config import ALSO_REPORTED_BY_LIMIT, CHUNK_INDEX_PATH, LINK_QUERY_BATCH_SIZE
+
+def normalize_chunk(text: str) -> str:
+    """Case- and whitespace-insensitive form of a chunk used for hashing"""
+    return " ".join(text.lower().split())
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk's normalized text"""
+    return hashlib.sha256(normalize_chunk(text).encode("utf-8")).hexdigest()
+
+def chunk_id(link: Optional[str], position: Optional[int], content_hash: str) -> str:
+    """Stable ID of a chunk: the same article, position and text always map to the same ID"""
+    key = f"{link or ''}\x1f{'' if position is None else position}\x1f{content_hash}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+def with_chunk_ids(documents: List[str], metadatas: List[Dict]) -> Tuple[List[str], List[Dict], List[str]]:
+    """Documents, metadatas and IDs ready for an upsert.
+
+    Chunks without a chunk_id (callers other than the ingestion pipeline) get
+    one from their link and content hash. Repeated IDs are written once, since
+    an upsert batch may not touch the same row twice.
+    """
+    unique: Dict[str, Tuple[str, Dict]] = {}
+    for document, metadata in zip(documents, metadatas):
+        metadata = dict(metadata or {})
+        if not metadata.get("chunk_id"):
+            content_hash = metadata.get("content_hash") or chunk_hash(document)
+            metadata["chunk_id"] = chunk_id(metadata.get("link"), metadata.get("chunk_index"), content_hash)
+        unique[metadata["chunk_id"]] = (document, metadata)
+    ids = list(unique)
+    return [unique[id_][0] for id_ in ids], [unique[id_][1] for id_ in ids], ids
+
+# Metadata key holding a chunk's extra source references in the vector store
+REFERENCES_KEY = "also_reported_by"
+
+def stored_references(metadata: Dict) -> List[Dict[str, str]]:
+    """References persisted in a stored chunk's metadata, newest first"""
+    value = (metadata or {}).get(REFERENCES_KEY)
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return value if isinstance(value, list) else []
+
+def merge_references(metadata: Dict, references: List[Dict[str, str]],
+                     limit: int = ALSO_REPORTED_BY_LIMIT) -> str:
+    """JSON value of REFERENCES_KEY with new references (newest last in the input) prepended"""
+    merged: List[Dict[str, str]] = []
+    seen = {(metadata or {}).get("link")}
+    for reference in [*reversed(references), *stored_references(metadata)]:
+        if reference.get("link") not in seen:
+            seen.add(reference.get("link"))
+            merged.append(reference)
+    return json.dumps(merged[:limit])
+
+class ChunkIndex:
+    """SQLite set of stored chunk hashes per scope, plus extra source references"""
+
+    def __init__(self, path: str = CHUNK_INDEX_PATH, batch_size: int = LINK_QUERY_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats = {"checked": 0, "duplicates": 0, "references": 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the index database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    scope TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    link TEXT,
+                    PRIMARY KEY (scope, hash)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_link_idx ON chunks (scope, link)")
+            conn.execute("CREATE TABLE IF NOT EXISTS loaded (scope TEXT PRIMARY KEY, loaded_at REAL NOT NULL)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunk_refs (
+                    scope TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    title TEXT,
+                    source TEXT,
+                    pub_date TEXT,
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (scope, hash, link)
+                ) WITHOUT ROWID
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def is_loaded(self, scope: str) -> bool:
+        """Whether the scope was ever filled from its store"""
+        with self._lock:
+            row = self._get_conn().execute("SELECT 1 FROM loaded WHERE scope = ?", (scope,)).fetchone()
+        return row is not None
+
+    def load_scope(self, scope: str, metadatas: List[Dict]) -> int:
+        """Add the hashes and persisted references of every chunk in a scope's store; returns chunks seen"""
+        chunks, references = [], []
+        for metadata in metadatas:
+            metadata = metadata or {}
+            content_hash = metadata.get("content_hash")
+            if not content_hash:
+                continue
+            chunks.append((scope, content_hash, metadata.get("link")))
+            # Stored newest first; added_at keeps that order for get_references
+            refs = stored_references(metadata)
+            for position, reference in enumerate(refs):
+                if reference.get("link"):
+                    references.append((scope, content_hash, reference.get("link"), reference.get("title"),
+                                       reference.get("source"), reference.get("pub_date"), len(refs) - position))
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("INSERT OR IGNORE INTO chunks (scope, hash, link) VALUES (?, ?, ?)", chunks)
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunk_refs (scope, hash, link, title, source, pub_date, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                references
+            )
+            conn.execute("INSERT OR REPLACE INTO loaded (scope, loaded_at) VALUES (?, ?)", (scope, time.time()))
+            conn.commit()
+        return len(chunks)
+
+    def contains_many(self, scope: str, hashes: Iterable[str]) -> Set[str]:
+        """The subset of chunk hashes already stored in a scope"""
+        hashes = list(set(hashes))
+        found: Set[str] = set()
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(hashes, self.batch_size):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT hash FROM chunks WHERE scope = ? AND hash IN ({placeholders})",
+                    [scope, *batch]
+                ).fetchall()
+                found.update(row[0] for row in rows)
+            self._stats["checked"] += len(hashes)
+            self._stats["duplicates"] += len(found)
+        return found
+
+    def add_many(self, scope: str, chunks: Iterable[Tuple[str, Optional[str]]]):
+        """Record (hash, link) pairs of chunks that were written to a scope"""
+        rows = [(scope, content_hash, link) for content_hash, link in chunks if content_hash]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("INSERT OR IGNORE INTO chunks (scope, hash, link) VALUES (?, ?, ?)", rows)
+            conn.commit()
+
+    def hashes_for_links(self, scope: str, links: Iterable[str]) -> Dict[str, List[str]]:
+        """Hashes of the chunks stored for each of the given article links"""
+        links = list(set(link for link in links if link))
+        hashes: Dict[str, List[str]] = {}
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(links, self.batch_size):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT link, hash FROM chunks WHERE scope = ? AND link IN ({placeholders})",
+                    [scope, *batch]
+                ).fetchall()
+                for link, content_hash in rows:
+                    hashes.setdefault(link, []).append(content_hash)
+        return hashes
+
+    def add_references(self, scope: str, references: Iterable[Tuple[str, Dict]]):
+        """Record that articles (given by their chunk metadata) also carry stored chunks"""
+        now = time.time()
+        rows = [
+            (scope, content_hash, metadata.get("link"), metadata.get("title"),
+             metadata.get("source"), metadata.get("pub_date"), now)
+            for content_hash, metadata in references if metadata.get("link")
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunk_refs (scope, hash, link, title, source, pub_date, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+            self._stats["references"] += len(rows)
+
+    def get_references(self, scope: str, hashes: Iterable[str],
+                       limit: int = ALSO_REPORTED_BY_LIMIT) -> Dict[str, List[Dict[str, str]]]:
+        """The limit most recent extra sources per chunk hash, newest first"""
+        hashes = list(set(hash_ for hash_ in hashes if hash_))
+        references: Dict[str, List[Dict[str, str]]] = {}
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(hashes, self.batch_size):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT hash, link, title, source, pub_date FROM ("
+                    f"SELECT *, ROW_NUMBER() OVER (PARTITION BY hash ORDER BY added_at DESC, link) AS rank "
+                    f"FROM chunk_refs WHERE scope = ? AND hash IN ({placeholders})"
+                    f") WHERE rank <= ? ORDER BY hash, rank",
+                    [scope, *batch, limit]
+                ).fetchall()
+                for content_hash, link, title, source, pub_date in rows:
+                    references.setdefault(content_hash, []).append(
+                        {"link": link, "title": title, "source": source, "pub_date": pub_date}
+                    )
+        return references
+
+    def attach_references(self, scope: str, results: List[Dict],
+                          limit: int = ALSO_REPORTED_BY_LIMIT) -> List[Dict]:
+        """Add an also_reported_by list (at most limit entries) to search results whose chunk has extra sources"""
+        try:
+            # One spare, as a result's own article may be among its chunk's references
+            references = self.get_references(
+                scope, ((result.get('metadata') or {}).get('content_hash') for result in results), limit + 1
+            )
+        except Exception as e:
+            print(f"Warning: Could not load chunk references: {e}")
+            return results
+        for result in results:
+            metadata = result.get('metadata') or {}
+            # References written by other hosts come with the chunk's metadata
+            extra, seen = [], {metadata.get('link')}
+            for ref in [*references.get(metadata.get('content_hash'), []), *stored_references(metadata)]:
+                if ref.get('link') not in seen:
+                    seen.add(ref.get('link'))
+                    extra.append(ref)
+            metadata.pop(REFERENCES_KEY, None)
+            if extra:
+                result['also_reported_by'] = extra[:limit]
+        return results
+
+    def discard_links(self, scope: str, links: Iterable[str]) -> int:
+        """Forget the chunks stored for deleted articles, and every reference to them or by them"""
+        links = list(set(link for link in links if link))
+        removed = 0
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(links, self.batch_size):
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(
+                    f"DELETE FROM chunk_refs WHERE scope = ? AND (link IN ({placeholders}) OR hash IN "
+                    f"(SELECT hash FROM chunks WHERE scope = ? AND link IN ({placeholders})))",
+                    [scope, *batch, scope, *batch]
+                )
+                removed += conn.execute(
+                    f"DELETE FROM chunks WHERE scope = ? AND link IN ({placeholders})",
+                    [scope, *batch]
+                ).rowcount
+            conn.commit()
+        return removed
+
+    def clear(self, scope: Optional[str] = None):
+        """Forget stored chunks and references, for one scope or all of them"""
+        with self._lock:
+            conn = self._get_conn()
+            if scope is None:
+                conn.execute("DELETE FROM chunks")
+                conn.execute("DELETE FROM chunk_refs")
+                conn.execute("DELETE FROM loaded")
+            else:
+                conn.execute("DELETE FROM chunks WHERE scope = ?", (scope,))
+                conn.execute("DELETE FROM chunk_refs WHERE scope = ?", (scope,))
+                conn.execute("DELETE FROM loaded WHERE scope = ?", (scope,))
+            conn.commit()
+
+    def count(self, scope: Optional[str] = None) -> int:
+        """Number of distinct stored chunks (optionally for one scope)"""
+        with self._lock:
+            conn = self._get_conn()
+            if scope is None:
+                return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM chunks WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Duplicate and reference counters plus index sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["chunks"] = self.count()
+        with self._lock:
+            stats["reference_rows"] = self._get_conn().execute("SELECT COUNT(*) FROM chunk_refs").fetchone()[0]
+        return stats
+
+# Global instance
+chunk_index = ChunkIndex()
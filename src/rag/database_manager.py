@@ -2,129 +2,408 @@
 Database manager for handling both local and cloud ChromaDB instances
 """
 import os
-from typing import Optional, Dict, Any, List
+import math
+import asyncio
+import shutil
+import subprocess
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Callable
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from src.rag.embedding_cache import build_embedding_model
+from src.rag.link_index import batched, link_index
+from src.rag.chunk_index import REFERENCES_KEY, chunk_index, merge_references, with_chunk_ids
+from src.rag.keyword_index import keyword_index
+from src.rag.batch_writer import embedding_writer
+from src.utils.dates import parse_pub_date
+from src.rag.recency import candidate_count, chroma_time_filter, rerank_by_recency
 from src.utils.config import (
     USE_CHROMA_CLOUD, 
     CHROMA_API_KEY, 
     CHROMA_TENANT, 
     CHROMA_DATABASE,
-    VECTOR_DB_PATH
+    VECTOR_DB_PATH,
+    LINK_QUERY_BATCH_SIZE
 )
 
+def similarity_from_distance(distance: float, space: str) -> float:
+    """Relevance score for a Chroma distance in the given space, as LangChain computes it"""
+    if space == "cosine":
+        return 1.0 - distance
+    if space == "ip":
+        return 1.0 - distance if distance > 0 else -distance
+    return 1.0 - distance / math.sqrt(2)
+
 class DatabaseManager:
     """Manages ChromaDB connections for both local and cloud instances"""
     
     def __init__(self):
-        self.embedding_model = OpenAIEmbeddings(
-            api_key=os.environ["OPENAI_API_KEY"], 
-            model="text-embedding-3-small"
-        )
+        self.embedding_model = build_embedding_model()
         self._client = None
         self._collection = None
+        # Long-lived vector store handles keyed by (backend, collection)
+        self._vector_stores: Dict[Tuple[str, str], Chroma] = {}
+        # Distance space of each collection, read from its configuration once
+        self._distance_spaces: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.RLock()
+        self._handle_stats = {"opens": 0, "reuses": 0, "invalidations": 0, "reconnects": 0}
+    
+    def _backend_key(self) -> str:
+        """Name of the Chroma backend handles are opened against"""
+        return "chroma_cloud" if USE_CHROMA_CLOUD else "chroma_local"
     
     def get_client(self):
         """Get ChromaDB client (cloud or local)"""
-        if USE_CHROMA_CLOUD:
+        with self._lock:
             if not self._client:
                 import chromadb
-                self._client = chromadb.CloudClient(
-                    api_key=CHROMA_API_KEY,
-                    tenant=CHROMA_TENANT,
-                    database=CHROMA_DATABASE
-                )
+                if USE_CHROMA_CLOUD:
+                    self._client = chromadb.CloudClient(
+                        api_key=CHROMA_API_KEY,
+                        tenant=CHROMA_TENANT,
+                        database=CHROMA_DATABASE
+                    )
+                else:
+                    # Owned here so compaction can close it before vacuuming
+                    self._client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
             return self._client
-        else:
-            # For local development, we'll use the LangChain Chroma wrapper
-            return None
+    
+    def _open_vector_store(self, collection_name: str) -> Chroma:
+        """Open a new vector store handle on the shared client (cloud or local)"""
+        return Chroma(
+            client=self.get_client(),
+            collection_name=collection_name,
+            embedding_function=self.embedding_model
+        )
     
     def get_vector_store(self, collection_name: str = "news_articles") -> Chroma:
-        """Get vector store instance"""
-        if USE_CHROMA_CLOUD:
-            # Use cloud ChromaDB
-            client = self.get_client()
-            return Chroma(
-                client=client,
-                collection_name=collection_name,
-                embedding_function=self.embedding_model
-            )
-        else:
-            # Use local ChromaDB
-            return Chroma(
-                persist_directory=VECTOR_DB_PATH,
-                collection_name=collection_name,
-                embedding_function=self.embedding_model
-            )
+        """Get a cached vector store handle, opening it on first use"""
+        key = (self._backend_key(), collection_name)
+        with self._lock:
+            vector_store = self._vector_stores.get(key)
+            if vector_store is not None:
+                self._handle_stats["reuses"] += 1
+                return vector_store
+            vector_store = self._open_vector_store(collection_name)
+            self._vector_stores[key] = vector_store
+            self._handle_stats["opens"] += 1
+            return vector_store
+    
+    def invalidate_vector_store(self, collection_name: Optional[str] = None):
+        """Drop cached handles so the next call reopens them.
+        
+        Invalidates every collection when collection_name is None.
+        """
+        with self._lock:
+            if collection_name is None:
+                dropped = len(self._vector_stores)
+                self._vector_stores.clear()
+                self._distance_spaces.clear()
+                # The client may hold a broken connection as well; closing a local
+                # one releases the store's files once no other client shares them
+                if self._client is not None:
+                    try:
+                        self._client.close()
+                    except Exception as e:
+                        print(f"Warning: Could not close Chroma client: {e}")
+                self._client = None
+            else:
+                key = (self._backend_key(), collection_name)
+                dropped = 1 if self._vector_stores.pop(key, None) is not None else 0
+                self._distance_spaces.pop(key, None)
+            self._handle_stats["invalidations"] += dropped
+    
+    def _with_vector_store(self, collection_name: str, operation: Callable[[Chroma], Any]) -> Any:
+        """Run an operation on the cached handle, reconnecting once on error"""
+        try:
+            return operation(self.get_vector_store(collection_name))
+        except Exception as e:
+            print(f"Warning: Vector store operation failed, reconnecting: {e}")
+            self.invalidate_vector_store(collection_name)
+            with self._lock:
+                self._handle_stats["reconnects"] += 1
+            return operation(self.get_vector_store(collection_name))
+    
+    def get_handle_stats(self) -> Dict[str, int]:
+        """Get vector store handle open/reuse counters"""
+        with self._lock:
+            stats = dict(self._handle_stats)
+            stats["open_handles"] = len(self._vector_stores)
+        return stats
     
     def get_collection(self, collection_name: str = "news_articles"):
         """Get direct collection access for advanced operations"""
-        if USE_CHROMA_CLOUD:
-            client = self.get_client()
-            return client.get_collection(collection_name)
-        else:
-            # For local, we don't need direct collection access
-            return None
+        return self.get_client().get_or_create_collection(collection_name)
+    
+    def _distance_space(self, collection_name: str) -> str:
+        """Distance function the collection's index uses ("l2", "cosine" or "ip")"""
+        key = (self._backend_key(), collection_name)
+        with self._lock:
+            space = self._distance_spaces.get(key)
+            if space is None:
+                configuration = self.get_collection(collection_name).configuration or {}
+                index = configuration.get("hnsw") or configuration.get("spann") or {}
+                space = index.get("space") or "l2"
+                self._distance_spaces[key] = space
+            return space
+    
+    def _scan_links(self, collection_name: str) -> set:
+        """Every stored article link, by reading all metadata"""
+        all_docs = self._with_vector_store(collection_name, lambda vs: vs.get(include=['metadatas']))
+        return {
+            metadata['link'] for metadata in (all_docs.get('metadatas') or [])
+            if metadata and metadata.get('link')
+        }
     
     def get_existing_links(self, collection_name: str = "news_articles") -> set:
-        """Get existing article links to avoid duplicates"""
+        """Get every stored article link (full scan; prefer filter_existing_links)"""
         try:
-            vector_store = self.get_vector_store(collection_name)
-            all_docs = vector_store.get()
-            
-            if all_docs and 'metadatas' in all_docs:
-                existing_links = set()
-                for metadata in all_docs['metadatas']:
-                    if metadata and 'link' in metadata:
-                        existing_links.add(metadata['link'])
-                return existing_links
-            return set()
+            return self._scan_links(collection_name)
         except Exception as e:
             print(f"Warning: Could not retrieve existing links: {e}")
             return set()
     
+    def _link_scope(self, collection_name: str) -> str:
+        """Link index scope for this backend and collection"""
+        return f"{self._backend_key()}:{collection_name}"
+    
+    def _query_links(self, links: List[str], collection_name: str) -> set:
+        """Which of the given links have at least one stored chunk"""
+        result = self._with_vector_store(
+            collection_name,
+            lambda vs: vs.get(where={"link": {"$in": links}}, include=['metadatas'])
+        )
+        return {
+            metadata['link'] for metadata in (result.get('metadatas') or [])
+            if metadata and metadata.get('link')
+        }
+    
+    def filter_existing_links(self, links, collection_name: str = "news_articles") -> set:
+        """Return the subset of the given links that is already stored"""
+        try:
+            return link_index.filter_existing(
+                self._link_scope(collection_name),
+                links,
+                lambda batch: self._query_links(batch, collection_name)
+            )
+        except Exception as e:
+            print(f"Warning: Could not check existing links: {e}")
+            return set()
+    
+    def rebuild_link_filter(self, collection_name: str = "news_articles") -> int:
+        """Rebuild the link filter and index from a full scan of the store; returns the link count"""
+        links = self._scan_links(collection_name)
+        return link_index.rebuild_filter(self._link_scope(collection_name), links)
+    
     def add_documents(self, documents: List[str], metadatas: List[Dict], 
                      collection_name: str = "news_articles") -> bool:
-        """Add documents to the vector store"""
+        """Upsert documents into the vector store in adaptive, concurrently written batches.
+        
+        Chunks are keyed by their deterministic chunk_id, so writing the same
+        chunk again replaces it instead of adding a duplicate.
+        """
+        documents, metadatas, _ = with_chunk_ids(documents, metadatas)
         try:
-            vector_store = self.get_vector_store(collection_name)
-            vector_store.add_texts(texts=documents, metadatas=metadatas)
-            return True
+            embedding_writer.write(
+                documents,
+                metadatas,
+                lambda texts, batch_metadatas: self._with_vector_store(
+                    collection_name,
+                    # add_texts upserts when IDs are given
+                    lambda vs: vs.add_texts(
+                        texts=texts,
+                        metadatas=batch_metadatas,
+                        ids=[metadata["chunk_id"] for metadata in batch_metadatas]
+                    )
+                )
+            )
         except Exception as e:
             print(f"Error adding documents: {e}")
             return False
+        
+        try:
+            link_index.add_many(
+                self._link_scope(collection_name),
+                (metadata.get('link') for metadata in metadatas if metadata)
+            )
+            chunk_index.add_many(
+                self._link_scope(collection_name),
+                ((metadata.get('content_hash'), metadata.get('link')) for metadata in metadatas if metadata)
+            )
+            keyword_index.add_many(self._link_scope(collection_name), documents, metadatas)
+        except Exception as e:
+            # The indexes are derived from the store, which stays authoritative
+            print(f"Warning: Could not update local indexes: {e}")
+        return True
     
     def search_documents(self, query: str, k: int = 3, 
-                        collection_name: str = "news_articles") -> List[Dict]:
-        """Search for similar documents"""
+                        collection_name: str = "news_articles",
+                        since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                        recency_decay: bool = False) -> List[Dict]:
+        """Search for similar documents, optionally published in [since_ts, until_ts)"""
         try:
-            vector_store = self.get_vector_store(collection_name)
-            retriever = vector_store.as_retriever(
-                search_type='similarity', 
-                search_kwargs={"k": k}
+            embedding = self.embedding_model.embed_query(query)
+            return self._search_by_vector(embedding, k, collection_name, since_ts, until_ts, recency_decay)
+        except Exception as e:
+            print(f"Error searching documents: {e}")
+            return []
+    
+    async def asearch_documents(self, query: str, k: int = 3, 
+                               collection_name: str = "news_articles",
+                               since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                               recency_decay: bool = False) -> List[Dict]:
+        """Search for similar documents without blocking the event loop.
+        
+        The query is embedded asynchronously; the Chroma client itself is
+        synchronous, so the lookup runs in a worker thread.
+        """
+        try:
+            embedding = await self.embedding_model.aembed_query(query)
+            return await asyncio.to_thread(
+                self._search_by_vector, embedding, k, collection_name, since_ts, until_ts, recency_decay
             )
-            docs = retriever.get_relevant_documents(query)
-            
-            # Format results
-            results = []
-            for doc in docs:
-                results.append({
-                    'content': doc.page_content,
-                    'metadata': doc.metadata
-                })
-            return results
         except Exception as e:
             print(f"Error searching documents: {e}")
             return []
     
+    def _search_by_vector(self, embedding: List[float], k: int, collection_name: str = "news_articles",
+                          since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                          recency_decay: bool = False) -> List[Dict]:
+        """Nearest chunks to an embedded query; the time window is applied inside Chroma"""
+        def run_search(vector_store: Chroma):
+            docs_and_distances = vector_store.similarity_search_by_vector_with_relevance_scores(
+                embedding,
+                k=candidate_count(k, recency_decay),
+                filter=chroma_time_filter(since_ts, until_ts)
+            )
+            space = self._distance_space(collection_name)
+            return [(doc, similarity_from_distance(distance, space)) for doc, distance in docs_and_distances]
+        
+        docs = self._with_vector_store(collection_name, run_search)
+        results = self._format_results(docs, collection_name)
+        return rerank_by_recency(results, k) if recency_decay else results
+    
+    def _format_results(self, docs, collection_name: str = "news_articles") -> List[Dict]:
+        """Format (document, similarity) pairs as plain result dicts, crediting deduplicated sources"""
+        results = []
+        for doc, similarity in docs:
+            results.append({
+                'content': doc.page_content,
+                'metadata': doc.metadata,
+                'similarity': similarity
+            })
+        return chunk_index.attach_references(self._link_scope(collection_name), results)
+    
+    def store_references(self, references: Dict[str, List[Dict[str, str]]],
+                         collection_name: str = "news_articles") -> int:
+        """Persist extra sources per content hash in the stored chunks' metadata; returns chunks updated"""
+        collection = self.get_collection(collection_name)
+        updated = 0
+        for batch in batched(list(references), LINK_QUERY_BATCH_SIZE):
+            page = collection.get(where={"content_hash": {"$in": batch}}, include=["metadatas"])
+            metadatas = [
+                {**metadata, REFERENCES_KEY: merge_references(metadata, references[metadata["content_hash"]])}
+                for metadata in page["metadatas"]
+            ]
+            if page["ids"]:
+                collection.update(ids=page["ids"], metadatas=metadatas)
+                updated += len(page["ids"])
+        return updated
+    
     def get_all_documents(self, collection_name: str = "news_articles") -> Dict[str, Any]:
         """Get all documents from the collection"""
         try:
-            vector_store = self.get_vector_store(collection_name)
-            return vector_store.get(include=['documents', 'metadatas'])
+            return self._with_vector_store(
+                collection_name,
+                lambda vs: vs.get(include=['documents', 'metadatas'])
+            )
         except Exception as e:
             print(f"Error getting all documents: {e}")
             return {'documents': [], 'metadatas': []}
 
+    def backfill_pub_ts(self, collection_name: str = "news_articles", batch_size: int = 500) -> int:
+        """Add a numeric pub_ts to chunks stored before it was recorded; returns chunks updated"""
+        collection = self.get_collection(collection_name)
+        updated, offset = 0, 0
+        while True:
+            page = collection.get(include=['metadatas'], limit=batch_size, offset=offset)
+            if not page['ids']:
+                return updated
+            offset += len(page['ids'])
+            ids, metadatas = [], []
+            for id_, metadata in zip(page['ids'], page['metadatas']):
+                metadata = metadata or {}
+                pub_ts = parse_pub_date(metadata.get('pub_date'))
+                if metadata.get('pub_ts') is None and pub_ts is not None:
+                    ids.append(id_)
+                    metadatas.append({**metadata, 'pub_ts': pub_ts})
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+                updated += len(ids)
+    
+    def delete_articles(self, links: List[str], collection_name: str = "news_articles") -> int:
+        """Delete every chunk of the given article links; returns the number of vectors removed.
+        
+        Raises on failure so the caller can stop or retry the batch.
+        """
+        def delete(vector_store: Chroma) -> int:
+            ids = vector_store.get(where={"link": {"$in": links}}, include=[])["ids"]
+            if ids:
+                vector_store.delete(ids=ids)
+            return len(ids)
+        
+        deleted = self._with_vector_store(collection_name, delete)
+        chunk_index.discard_links(self._link_scope(collection_name), links)
+        keyword_index.discard_links(self._link_scope(collection_name), links)
+        return deleted
+    
+    def get_storage_breakdown(self) -> Optional[Dict[str, int]]:
+        """On-disk size of the local store's SQLite database and HNSW segments (None for Chroma Cloud)"""
+        if USE_CHROMA_CLOUD or not os.path.isdir(VECTOR_DB_PATH):
+            return None
+        breakdown = {"sqlite": 0, "hnsw": 0}
+        for root, _, names in os.walk(VECTOR_DB_PATH):
+            # chroma.sqlite3 (and its WAL) sits at the top; each vector segment has its own directory
+            part = "sqlite" if os.path.samefile(root, VECTOR_DB_PATH) else "hnsw"
+            breakdown[part] += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+        return breakdown
+    
+    def get_storage_bytes(self) -> Optional[int]:
+        """On-disk size of the local store (None for Chroma Cloud)"""
+        breakdown = self.get_storage_breakdown()
+        return sum(breakdown.values()) if breakdown is not None else None
+    
+    def compact_storage(self) -> bool:
+        """Reclaim space left by deletions; returns True if compaction ran.
+        
+        Chroma Cloud compacts on its own. Locally, the handles and client are
+        closed and the `chroma vacuum` CLI purges the embeddings log and vacuums the
+        SQLite database; handles reopen on next use. Without the CLI on PATH
+        nothing is closed and compaction is skipped. HNSW segments only mark
+        deleted vectors and reuse their slots for later inserts, so their
+        files do not shrink here.
+        """
+        path = os.path.join(VECTOR_DB_PATH, "chroma.sqlite3")
+        if USE_CHROMA_CLOUD or not os.path.exists(path):
+            return False
+        chroma_cli = shutil.which("chroma")
+        if chroma_cli is None:
+            print("Warning: chroma CLI not found; skipping vector store compaction")
+            return False
+        # Held throughout so no handle is reopened while the vacuum runs
+        with self._lock:
+            self.invalidate_vector_store()
+            try:
+                result = subprocess.run(
+                    [chroma_cli, "vacuum", "--path", VECTOR_DB_PATH, "--force", "--timeout", "60"],
+                    capture_output=True, text=True, timeout=600
+                )
+            except Exception as e:
+                print(f"Error compacting local vector store: {e}")
+                return False
+            if result.returncode != 0:
+                print(f"Error compacting local vector store: {(result.stderr or result.stdout).strip()}")
+                return False
+            return True
+
 # Global instance
 db_manager = DatabaseManager()
@@ -0,0 +1,322 @@
+"""
+Persistent embedding cache shared by every vector database backend
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from src.utils.token_usage import get_token_usage, count_tokens
+from src.utils.config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_MODEL,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache keyed by model name plus content hash"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        # Upper bound on stored entries; only recounted once it passes max_entries
+        self._count: Optional[int] = None
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Content-addressed key for a piece of text under a given model"""
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the cache database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """Look up cached vectors, returning a mapping of text to vector for hits"""
+        keys = {self.make_key(model, text): text for text in texts}
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                key_list = list(keys)
+                # Stay well below SQLite's bound parameter limit
+                for start in range(0, len(key_list), 500):
+                    batch = key_list[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f")
+                        vector.frombytes(blob)
+                        found[keys[key]] = vector.tolist()
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, self.make_key(model, text)) for text in found]
+                    )
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Embedding cache lookup failed: {e}")
+
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """Store vectors and evict the least recently used entries over the size bound.
+
+        Entries are counted once, then every written row is assumed new; the
+        table is only recounted when that estimate passes max_entries, and
+        eviction then goes a tenth below the bound so a full cache is not
+        recounted on every write. Other processes' writes are picked up at
+        the next recount.
+        """
+        if not vectors:
+            return
+
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), model, array("f", vector).tobytes(), now)
+            for text, vector in vectors.items()
+        ]
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                if self._count is None:
+                    self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                else:
+                    self._count += len(rows)
+                if self._count > self.max_entries:
+                    count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                    overflow = count - self.max_entries
+                    if overflow > 0:
+                        overflow += self.max_entries // 10
+                        conn.execute(
+                            "DELETE FROM embeddings WHERE key IN "
+                            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                            (overflow,)
+                        )
+                        self._stats["evictions"] += overflow
+                        count -= overflow
+                    self._count = count
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Embedding cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cumulative hit/miss counters"""
+        with self._lock:
+            return dict(self._stats)
+
+
+class QueryEmbeddingCache:
+    """In-process LRU cache with a TTL for search query embeddings"""
+
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE,
+                 ttl_seconds: float = QUERY_EMBEDDING_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Fold case and collapse whitespace so trivially different queries share an entry"""
+        return " ".join(query.lower().split())
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        """Return the cached vector for a normalized query, or None"""
+        key = (model, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, vector = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return vector
+
+    def put(self, model: str, query: str, vector: List[float]):
+        """Cache a vector for a normalized query, evicting the least recently used"""
+        with self._lock:
+            self._entries[(model, query)] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end((model, query))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        """Drop every cached query"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get hit/miss counters and the hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _record_embedding_usage(model: str, texts: List[str]):
+    """Charge embedded texts to the current request; the embeddings API usage is not exposed"""
+    usage = get_token_usage()
+    if usage is not None:
+        usage.add(embedding_tokens=sum(count_tokens(text, model) for text in texts))
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves document vectors from the persistent cache
+    and query vectors from the in-process query cache"""
+
+    def __init__(self, embeddings: Optional[Embeddings], cache: EmbeddingCache, model: str,
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 embeddings_factory: Optional[Callable[[], Embeddings]] = None):
+        self._embeddings = embeddings
+        self._embeddings_factory = embeddings_factory
+        self._factory_lock = threading.Lock()
+        self.cache = cache
+        self.model = model
+        self.query_cache = query_cache
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """The underlying model, built by the factory on first use"""
+        if self._embeddings is None:
+            with self._factory_lock:
+                if self._embeddings is None:
+                    self._embeddings = self._embeddings_factory()
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, embeddings: Embeddings):
+        self._embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, only calling the underlying model for cache misses"""
+        cached = self.cache.get_many(self.model, texts)
+        # Embed each missing text once, even if it repeats within the batch
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing:
+            new_vectors = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            _record_embedding_usage(self.model, missing)
+            self.cache.put_many(self.model, new_vectors)
+            cached.update(new_vectors)
+        return [cached[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query, reusing recent embeddings of the same normalized query"""
+        if self.query_cache is None:
+            _record_embedding_usage(self.model, [text])
+            return self.embeddings.embed_query(text)
+
+        # Only the cache key is normalized; the model sees the query as written
+        key = self.query_cache.normalize(text)
+        vector = self.query_cache.get(self.model, key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            _record_embedding_usage(self.model, [text])
+            self.query_cache.put(self.model, key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_documents; cache I/O runs off the event loop"""
+        cached = await asyncio.to_thread(self.cache.get_many, self.model, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in cached))
+        if missing:
+            new_vectors = dict(zip(missing, await self.embeddings.aembed_documents(missing)))
+            _record_embedding_usage(self.model, missing)
+            await asyncio.to_thread(self.cache.put_many, self.model, new_vectors)
+            cached.update(new_vectors)
+        return [cached[text] for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query"""
+        if self.query_cache is None:
+            _record_embedding_usage(self.model, [text])
+            return await self.embeddings.aembed_query(text)
+
+        # Only the cache key is normalized; the model sees the query as written
+        key = self.query_cache.normalize(text)
+        vector = self.query_cache.get(self.model, key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            _record_embedding_usage(self.model, [text])
+            self.query_cache.put(self.model, key, vector)
+        return vector
+
+
+def _openai_embeddings() -> Embeddings:
+    """Build the OpenAI embedding client; imported and configured only when first needed"""
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(api_key=os.environ["OPENAI_API_KEY"], model=EMBEDDING_MODEL)
+
+def build_embedding_model() -> CachedEmbeddings:
+    """Create the OpenAI embedding model wrapped with the shared cache.
+
+    Cheap to call at import time: the OpenAI client (and the API key lookup)
+    is deferred until the first embedding request.
+    """
+    return CachedEmbeddings(
+        None,
+        embedding_cache,
+        EMBEDDING_MODEL,
+        query_embedding_cache,
+        embeddings_factory=_openai_embeddings
+    )
+
+# Global instances
+embedding_cache = EmbeddingCache()
+query_embedding_cache = QueryEmbeddingCache()
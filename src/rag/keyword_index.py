@@ -0,0 +1,263 @@
+"""
+Local BM25 keyword index over stored chunks.
+
+Vector similarity blurs exact terms such as product names and tickers. This
+index keeps every stored chunk in a SQLite FTS5 table (title and content,
+BM25-ranked, title weighted higher) so those terms can be matched exactly.
+Managers add chunks whenever they write and remove them when articles are
+deleted, so ingestion keeps it current incrementally; entries are scoped by
+backend and collection like the link index. The store remains the source of
+truth: once a scope was last synced more than KEYWORD_INDEX_TTL_SECONDS ago,
+hybrid search resyncs it in the background, adding chunks written elsewhere
+(e.g. by a separate ingestion container) and dropping chunks deleted
+elsewhere. Until the first sync completes, hybrid search falls back to the
+vector results alone.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.rag.chunk_index import chunk_hash, chunk_id
+from src.rag.link_index import batched
+from src.utils.config import KEYWORD_INDEX_PATH, KEYWORD_TITLE_WEIGHT, LINK_QUERY_BATCH_SIZE, RRF_K
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Too common to narrow a match; BM25 would rank them low anyway
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has",
+    "have", "how", "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to",
+    "was", "were", "what", "when", "where", "which", "who", "why", "will", "with", "about",
+    "any", "me", "tell", "there", "their", "news", "latest"
+}
+
+def match_query(text: str) -> Optional[str]:
+    """FTS5 query matching any significant term of free text, or None if it has none"""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    # Quoted terms cannot be read as FTS5 operators or column filters
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+def result_key(result: Dict) -> str:
+    """Chunk ID identifying a search result across the vector and keyword legs"""
+    metadata = result.get('metadata') or {}
+    return metadata.get('chunk_id') or chunk_id(
+        metadata.get('link'),
+        metadata.get('chunk_index'),
+        metadata.get('content_hash') or chunk_hash(result.get('content') or '')
+    )
+
+def reciprocal_rank_fusion(ranked_lists: Dict[str, List[Dict]], k: int, rrf_k: int = RRF_K) -> List[Dict]:
+    """Fuse ranked result lists by summing 1 / (rrf_k + rank) per chunk; top k first.
+
+    The first list's copy of a chunk is kept, with an rrf_score and its rank in each list.
+    """
+    fused: Dict[str, Dict] = {}
+    for name, results in ranked_lists.items():
+        for rank, result in enumerate(results, start=1):
+            key = result_key(result)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, 'rrf_score': 0.0, 'ranks': {}}
+            entry['rrf_score'] += 1.0 / (rrf_k + rank)
+            entry['ranks'][name] = rank
+    return sorted(fused.values(), key=lambda result: result['rrf_score'], reverse=True)[:k]
+
+class KeywordIndex:
+    """SQLite FTS5 (BM25) index of stored chunk text per scope"""
+
+    def __init__(self, path: str = KEYWORD_INDEX_PATH, title_weight: float = KEYWORD_TITLE_WEIGHT):
+        self.path = path
+        self.title_weight = title_weight
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "hits": 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the index database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Rows removed by INSERT OR REPLACE fire the delete trigger only with this on
+            conn.execute("PRAGMA recursive_triggers=ON")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    link TEXT,
+                    pub_ts REAL,
+                    title TEXT,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    UNIQUE (scope, chunk_id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_link_idx ON chunks (scope, link)")
+            conn.execute("CREATE TABLE IF NOT EXISTS synced (scope TEXT PRIMARY KEY, synced_at REAL NOT NULL)")
+            # External-content FTS table kept in sync with chunks by triggers
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                    title, content, content='chunks', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts (chunks_fts, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+                END
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _rows(scope: str, documents: List[str], metadatas: List[Dict]) -> List[Tuple]:
+        rows = []
+        for document, metadata in zip(documents, metadatas):
+            metadata = metadata or {}
+            rows.append((
+                scope,
+                result_key({'content': document, 'metadata': metadata}),
+                metadata.get('link'),
+                metadata.get('pub_ts'),
+                metadata.get('title'),
+                document,
+                json.dumps(metadata)
+            ))
+        return rows
+
+    def add_many(self, scope: str, documents: List[str], metadatas: List[Dict]):
+        """Index (or re-index) chunks that were written to a scope"""
+        rows = self._rows(scope, documents, metadatas)
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (scope, chunk_id, link, pub_ts, title, content, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+    @staticmethod
+    def _mark_synced(conn: sqlite3.Connection, scope: str):
+        conn.execute("INSERT OR REPLACE INTO synced (scope, synced_at) VALUES (?, ?)", (scope, time.time()))
+
+    def replace_scope(self, scope: str, documents: List[str], metadatas: List[Dict]) -> int:
+        """Rebuild a scope from the full contents of its store; returns the chunk count"""
+        rows = self._rows(scope, documents, metadatas)
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM chunks WHERE scope = ?", (scope,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (scope, chunk_id, link, pub_ts, title, content, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._mark_synced(conn, scope)
+            conn.commit()
+        return len(rows)
+
+    def sync_scope(self, scope: str, documents: List[str], metadatas: List[Dict]) -> Tuple[int, int]:
+        """Bring a scope in line with the full contents of its store, touching only
+        chunks added or removed since; returns (added, removed)"""
+        rows = {row[1]: row for row in self._rows(scope, documents, metadatas)}
+        with self._lock:
+            conn = self._get_conn()
+            indexed = {row[0] for row in conn.execute("SELECT chunk_id FROM chunks WHERE scope = ?", (scope,))}
+            gone = list(indexed - rows.keys())
+            new = [row for chunk_id, row in rows.items() if chunk_id not in indexed]
+            for batch in batched(gone, LINK_QUERY_BATCH_SIZE):
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(f"DELETE FROM chunks WHERE scope = ? AND chunk_id IN ({placeholders})", [scope, *batch])
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (scope, chunk_id, link, pub_ts, title, content, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                new
+            )
+            self._mark_synced(conn, scope)
+            conn.commit()
+        return len(new), len(gone)
+
+    def get_synced_at(self, scope: str) -> Optional[float]:
+        """Wall-clock time of the scope's last sync with its store, or None if never synced"""
+        with self._lock:
+            row = self._get_conn().execute("SELECT synced_at FROM synced WHERE scope = ?", (scope,)).fetchone()
+        return row[0] if row else None
+
+    def discard_links(self, scope: str, links: Iterable[str]) -> int:
+        """Remove every chunk of deleted articles"""
+        links = list(set(link for link in links if link))
+        removed = 0
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(links, LINK_QUERY_BATCH_SIZE):
+                placeholders = ",".join("?" * len(batch))
+                removed += conn.execute(
+                    f"DELETE FROM chunks WHERE scope = ? AND link IN ({placeholders})", [scope, *batch]
+                ).rowcount
+            conn.commit()
+        return removed
+
+    def search(self, scope: str, query: str, k: int, since_ts: Optional[float] = None,
+               until_ts: Optional[float] = None) -> List[Dict]:
+        """Top k chunks by BM25, optionally published in [since_ts, until_ts)"""
+        expression = match_query(query)
+        if expression is None:
+            return []
+        filters, params = ["chunks_fts MATCH ?", "c.scope = ?"], [expression, scope]
+        if since_ts is not None:
+            filters.append("c.pub_ts >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            filters.append("c.pub_ts < ?")
+            params.append(until_ts)
+        with self._lock:
+            rows = self._get_conn().execute(
+                f"SELECT c.content, c.metadata, bm25(chunks_fts, ?, 1.0) AS score "
+                f"FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid "
+                f"WHERE {' AND '.join(filters)} ORDER BY score LIMIT ?",
+                [self.title_weight, *params, k]
+            ).fetchall()
+            self._stats["searches"] += 1
+            self._stats["hits"] += len(rows)
+        # FTS5 bm25() is negative, lower being better
+        return [
+            {'content': content, 'metadata': json.loads(metadata), 'bm25': -score}
+            for content, metadata, score in rows
+        ]
+
+    def count(self, scope: Optional[str] = None) -> int:
+        """Number of indexed chunks (optionally for one scope)"""
+        with self._lock:
+            conn = self._get_conn()
+            if scope is None:
+                return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM chunks WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Search counters plus the number of indexed chunks"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["chunks"] = self.count()
+        return stats
+
+# Global instance
+keyword_index = KeywordIndex()
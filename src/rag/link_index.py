@@ -0,0 +1,217 @@
+"""
+Persistent index of article links already stored in each vector backend.
+
+Ingestion only needs to know which of the incoming links are already stored.
+Managers record links here whenever they write, and answer membership
+questions from it first; links the index does not know are checked against
+the backend with a batched query for just those links, and any found there
+are recorded too. The index only ever caches positive answers, so a missing
+or stale index costs extra backend queries but never hides a new article.
+Entries are scoped by backend and collection, so local Chroma, Chroma Cloud
+and Supabase each keep their own view.
+
+In front of the SQLite index sits a persisted scalable Bloom filter per
+scope. Links the filter reports as present are treated as already stored
+without any lookup (at the configured false positive rate); only probably
+new links go on to the exact checks. Bloom filters cannot forget, so links
+removed from a backend stay "seen" until the filter is rebuilt from the store.
+"""
+import os
+import re
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from src.utils.bloom_filter import ScalableBloomFilter
+from src.utils.config import (
+    LINK_INDEX_PATH,
+    LINK_QUERY_BATCH_SIZE,
+    LINK_FILTER_DIR,
+    LINK_FILTER_CAPACITY,
+    LINK_FILTER_ERROR_RATE,
+    LINK_FILTER_MAX_MB
+)
+
+def batched(items: List[str], size: int) -> Iterable[List[str]]:
+    """Split a list into consecutive batches of at most `size` items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class LinkIndex:
+    """SQLite set of (scope, link) pairs known to be stored, fronted by per-scope Bloom filters"""
+
+    def __init__(self, path: str = LINK_INDEX_PATH, batch_size: int = LINK_QUERY_BATCH_SIZE,
+                 filter_dir: str = LINK_FILTER_DIR):
+        self.path = path
+        self.batch_size = batch_size
+        self.filter_dir = filter_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._filters: Dict[str, ScalableBloomFilter] = {}
+        self._dirty_filters: Set[str] = set()
+        self._stats = {"filter_hits": 0, "index_hits": 0, "backend_hits": 0, "misses": 0,
+                       "backend_queries": 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the index database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS links (
+                    scope TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    PRIMARY KEY (scope, link)
+                ) WITHOUT ROWID
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _filter_path(self, scope: str) -> str:
+        return os.path.join(self.filter_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", scope) + ".bloom")
+
+    @staticmethod
+    def _new_filter() -> ScalableBloomFilter:
+        return ScalableBloomFilter(LINK_FILTER_CAPACITY, LINK_FILTER_ERROR_RATE,
+                                   int(LINK_FILTER_MAX_MB * 1024 * 1024))
+
+    def get_filter(self, scope: str) -> ScalableBloomFilter:
+        """The Bloom filter for a scope, loaded from disk on first use"""
+        bloom = self._filters.get(scope)
+        if bloom is None:
+            path = self._filter_path(scope)
+            try:
+                bloom = ScalableBloomFilter.load(path)
+            except FileNotFoundError:
+                # Starts empty and fills as links are confirmed; rebuild_filter fills it at once
+                bloom = self._new_filter()
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not load link filter {path}, starting empty: {e}")
+                bloom = self._new_filter()
+            self._filters[scope] = bloom
+        return bloom
+
+    def _remember(self, scope: str, links: Iterable[str]):
+        """Add links to the scope's Bloom filter"""
+        if self.get_filter(scope).update(links):
+            self._dirty_filters.add(scope)
+
+    def save_filters(self):
+        """Persist Bloom filters that changed since they were loaded"""
+        for scope in list(self._dirty_filters):
+            try:
+                self._filters[scope].save(self._filter_path(scope))
+                self._dirty_filters.discard(scope)
+            except OSError as e:
+                print(f"Warning: Could not save link filter for {scope}: {e}")
+
+    def rebuild_filter(self, scope: str, links: Iterable[str]) -> int:
+        """Replace a scope's Bloom filter and index with the given full set of stored links"""
+        links = {link for link in links if link}
+        bloom = self._new_filter()
+        bloom.update(links)
+        self._filters[scope] = bloom
+        self._dirty_filters.add(scope)
+        self.clear(scope)
+        self.add_many(scope, links)
+        self.save_filters()
+        return len(links)
+
+    def contains_many(self, scope: str, links: Iterable[str]) -> Set[str]:
+        """The subset of links recorded for a scope"""
+        links = list(set(links))
+        found: Set[str] = set()
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(links, self.batch_size):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT link FROM links WHERE scope = ? AND link IN ({placeholders})",
+                    [scope, *batch]
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def add_many(self, scope: str, links: Iterable[str]):
+        """Record links as stored for a scope"""
+        rows = [(scope, link) for link in set(links) if link]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("INSERT OR IGNORE INTO links (scope, link) VALUES (?, ?)", rows)
+            conn.commit()
+        self._remember(scope, (link for _, link in rows))
+
+    def discard_many(self, scope: str, links: Iterable[str]):
+        """Forget links, e.g. after documents were deleted; the backend stays authoritative"""
+        rows = [(scope, link) for link in set(links) if link]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM links WHERE scope = ? AND link = ?", rows)
+            conn.commit()
+
+    def clear(self, scope: Optional[str] = None):
+        """Forget every link for a scope, or for all scopes"""
+        with self._lock:
+            conn = self._get_conn()
+            if scope is None:
+                conn.execute("DELETE FROM links")
+            else:
+                conn.execute("DELETE FROM links WHERE scope = ?", (scope,))
+            conn.commit()
+
+    def filter_existing(self, scope: str, links: Iterable[str],
+                        query_backend: Callable[[List[str]], Set[str]]) -> Set[str]:
+        """Return which links are already stored.
+
+        The Bloom filter answers the common "already seen" case in memory;
+        the SQLite index then answers for probably new links, and whatever is
+        left is passed to query_backend in batches. Links found along the way
+        are recorded.
+        """
+        links = {link for link in links if link}
+        bloom = self.get_filter(scope)
+        seen = set()
+        if not bloom.saturated:
+            seen = {link for link in links if link in bloom}
+        probably_new = links - seen
+
+        known = self.contains_many(scope, probably_new)
+        self._remember(scope, known)
+        unknown = sorted(probably_new - known)
+
+        found: Set[str] = set()
+        for batch in batched(unknown, self.batch_size):
+            found.update(query_backend(batch))
+            self._stats["backend_queries"] += 1
+        self.add_many(scope, found)
+
+        self._stats["filter_hits"] += len(seen)
+        self._stats["index_hits"] += len(known)
+        self._stats["backend_hits"] += len(found)
+        self._stats["misses"] += len(unknown) - len(found)
+        return seen | known | found
+
+    def count(self, scope: Optional[str] = None) -> int:
+        with self._lock:
+            conn = self._get_conn()
+            if scope is None:
+                return conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) FROM links WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def get_stats(self) -> dict:
+        """Lookup counters since startup plus the number of indexed links"""
+        stats = dict(self._stats)
+        stats["indexed_links"] = self.count()
+        stats["filters"] = {scope: bloom.get_stats() for scope, bloom in self._filters.items()}
+        return stats
+
+# Global instance
+link_index = LinkIndex()
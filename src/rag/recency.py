@@ -0,0 +1,52 @@
+"""
+Time windows and recency decay for retrieval.
+
+Ingestion stores each chunk's publication time as a numeric pub_ts (Unix
+seconds) next to the raw pub_date string. A search may pass a window
+(since_ts / until_ts) that the backend pushes down as a metadata filter or
+SQL predicate, so only chunks published inside it are candidates. With
+recency decay, k * RECENCY_CANDIDATE_MULTIPLIER candidates are fetched and
+re-ranked by similarity * 0.5 ** (age / RECENCY_HALF_LIFE_HOURS).
+"""
+import time
+from typing import Any, Dict, List, Optional
+from src.utils.dates import parse_pub_date
+from src.utils.config import RECENCY_HALF_LIFE_HOURS, RECENCY_CANDIDATE_MULTIPLIER
+
+def chroma_time_filter(since_ts: Optional[float] = None,
+                       until_ts: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Chroma `where` clause selecting chunks published in [since_ts, until_ts)"""
+    conditions = []
+    if since_ts is not None:
+        conditions.append({"pub_ts": {"$gte": since_ts}})
+    if until_ts is not None:
+        conditions.append({"pub_ts": {"$lt": until_ts}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def candidate_count(k: int, recency_decay: bool) -> int:
+    """Number of candidates to fetch so re-ranking can promote newer chunks"""
+    return k * RECENCY_CANDIDATE_MULTIPLIER if recency_decay else k
+
+def result_pub_ts(metadata: Dict[str, Any]) -> Optional[float]:
+    """Publication time of a result, parsed from pub_date for chunks stored before pub_ts"""
+    pub_ts = metadata.get('pub_ts')
+    if pub_ts is not None:
+        return float(pub_ts)
+    return parse_pub_date(metadata.get('pub_date'))
+
+def rerank_by_recency(results: List[Dict], k: int, half_life_hours: float = RECENCY_HALF_LIFE_HOURS,
+                      now: Optional[float] = None, score_key: str = 'similarity') -> List[Dict]:
+    """Top k results by score (similarity by default) decayed with age.
+
+    Undated chunks count as one half-life old.
+    """
+    now = time.time() if now is None else now
+    for result in results:
+        pub_ts = result_pub_ts(result.get('metadata') or {})
+        age_hours = max(now - pub_ts, 0) / 3600 if pub_ts is not None else half_life_hours
+        # Decay only shrinks scores, so negative similarities would favour older chunks
+        score = max(result.get(score_key) or 0, 0)
+        result['recency_score'] = score * 0.5 ** (age_hours / half_life_hours)
+    return sorted(results, key=lambda result: result['recency_score'], reverse=True)[:k]
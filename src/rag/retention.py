@@ -0,0 +1,184 @@
+"""
+Retention policy and background compaction of old articles.
+
+Articles expire by publication age (RETENTION_MAX_AGE_DAYS, overridable per
+source) and, per source, once they fall outside its newest
+RETENTION_SOURCE_MAX_ARTICLES. Expired articles are selected from the
+article index, so the vector store is never scanned, and deleted from the
+active backend in batches of RETENTION_DELETE_BATCH_SIZE links. Afterwards
+the backend is compacted (vacuumed or reindexed) and the bytes and vectors
+reclaimed are reported; for local Chroma the SQLite and HNSW sizes are
+reported separately, as only the former shrinks.
+
+Articles whose only stored text was a chunk of an expired article expire
+with it, since that chunk is gone.
+
+Retention deletes data and is therefore opt-in: with the defaults no
+article expires and the background job is not started. Set a limit (e.g.
+RETENTION_MAX_AGE_DAYS=30) and RETENTION_INTERVAL_SECONDS (e.g. 21600) to
+enable it; POST /api/admin/compact?dry_run=true shows what would go.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.rag.article_index import ArticleIndex, article_index
+from src.rag.link_index import batched
+from src.utils.ingestion_version import bump_ingestion_version
+from src.utils.config import (
+    RETENTION_MAX_AGE_DAYS,
+    RETENTION_SOURCE_MAX_AGE_DAYS,
+    RETENTION_SOURCE_MAX_ARTICLES,
+    RETENTION_DELETE_BATCH_SIZE,
+    RETENTION_INTERVAL_SECONDS
+)
+
+class RetentionPolicy:
+    """Maximum publication age per source, plus optional per-source article limits"""
+
+    def __init__(self, max_age_days: float = RETENTION_MAX_AGE_DAYS,
+                 source_max_age_days: Optional[Dict[str, float]] = None,
+                 source_max_articles: Optional[Dict[str, float]] = None):
+        self.max_age_days = max_age_days
+        self.source_max_age_days = (
+            RETENTION_SOURCE_MAX_AGE_DAYS if source_max_age_days is None else source_max_age_days
+        )
+        self.source_max_articles = (
+            RETENTION_SOURCE_MAX_ARTICLES if source_max_articles is None else source_max_articles
+        )
+
+    def max_age_for(self, source: str) -> float:
+        """Maximum age in days for a source (0 keeps its articles regardless of age)"""
+        return self.source_max_age_days.get(source, self.max_age_days)
+
+    def expired_links(self, index: ArticleIndex, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """Links of expired articles per source"""
+        now = time.time() if now is None else now
+        expired = {}
+        for source in index.sources():
+            max_age = self.max_age_for(source)
+            cutoff = now - max_age * 86400 if max_age > 0 else None
+            keep = self.source_max_articles.get(source)
+            if cutoff is None and keep is None:
+                continue
+            links = index.expired_links(source, cutoff, int(keep) if keep is not None else None)
+            if links:
+                expired[source] = links
+        return expired
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "max_age_days": self.max_age_days,
+            "source_max_age_days": self.source_max_age_days,
+            "source_max_articles": self.source_max_articles
+        }
+
+class Compactor:
+    """Deletes expired articles in batches and compacts the vector store afterwards"""
+
+    def __init__(self, policy: Optional[RetentionPolicy] = None, index: ArticleIndex = article_index,
+                 batch_size: int = RETENTION_DELETE_BATCH_SIZE):
+        self.policy = policy or RetentionPolicy()
+        self.index = index
+        self.batch_size = batch_size
+        self._run_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"runs": 0, "articles_deleted": 0, "vectors_deleted": 0, "bytes_reclaimed": 0}
+        self._last_run: Optional[Dict[str, Any]] = None
+
+    def run(self, dry_run: bool = False, collection_name: str = "news_articles") -> Dict[str, Any]:
+        """Apply the retention policy once and report what was reclaimed"""
+        if not self._run_lock.acquire(blocking=False):
+            return {"status": "busy", "message": "A compaction run is already in progress"}
+        try:
+            return self._run(dry_run, collection_name)
+        finally:
+            self._run_lock.release()
+
+    def _run(self, dry_run: bool, collection_name: str) -> Dict[str, Any]:
+        # Imported on first run so starting the background job stays cheap
+        from src.rag.unified_database_manager import unified_db_manager
+        from src.rag.article_listing import article_listing
+
+        start = time.perf_counter()
+        # Builds the article index if it has never been synced with the store
+        article_listing.revalidate(unified_db_manager)
+        expired = self.policy.expired_links(self.index)
+        report: Dict[str, Any] = {
+            "status": "success",
+            "dry_run": dry_run,
+            "policy": self.policy.describe(),
+            "expired_by_source": {source: len(links) for source, links in expired.items()},
+            "articles_deleted": 0,
+            "vectors_deleted": 0,
+            "bytes_before": None,
+            "bytes_after": None,
+            "bytes_reclaimed": None,
+            # Local Chroma only: SQLite and HNSW sizes, which compaction affects differently
+            "storage_before": None,
+            "storage_after": None,
+            "compacted": False
+        }
+        if dry_run or not expired:
+            report["duration_s"] = round(time.perf_counter() - start, 3)
+            return report
+
+        report["bytes_before"] = unified_db_manager.get_storage_bytes(collection_name)
+        report["storage_before"] = unified_db_manager.get_storage_breakdown(collection_name)
+        links = [link for source_links in expired.values() for link in source_links]
+        try:
+            for batch in batched(links, self.batch_size):
+                report["vectors_deleted"] += unified_db_manager.delete_articles(batch, collection_name)
+                report["articles_deleted"] += self.index.delete_links(batch)
+        except Exception as e:
+            print(f"Error deleting expired articles: {e}")
+            report["status"] = "failed"
+            report["error"] = str(e)
+
+        if report["vectors_deleted"]:
+            # Cached answers may cite deleted articles
+            bump_ingestion_version()
+            report["compacted"] = unified_db_manager.compact_storage(collection_name)
+        report["bytes_after"] = unified_db_manager.get_storage_bytes(collection_name)
+        report["storage_after"] = unified_db_manager.get_storage_breakdown(collection_name)
+        if report["bytes_before"] is not None and report["bytes_after"] is not None:
+            report["bytes_reclaimed"] = max(report["bytes_before"] - report["bytes_after"], 0)
+        report["duration_s"] = round(time.perf_counter() - start, 3)
+        report["timestamp"] = datetime.now().isoformat()
+
+        self._stats["runs"] += 1
+        self._stats["articles_deleted"] += report["articles_deleted"]
+        self._stats["vectors_deleted"] += report["vectors_deleted"]
+        self._stats["bytes_reclaimed"] += report["bytes_reclaimed"] or 0
+        self._last_run = report
+        print(f"🧹 Retention: deleted {report['articles_deleted']} articles "
+              f"({report['vectors_deleted']} vectors), reclaimed {report['bytes_reclaimed'] or 0} bytes")
+        return report
+
+    def start(self, interval_seconds: float = RETENTION_INTERVAL_SECONDS) -> bool:
+        """Run compaction every interval_seconds in a daemon thread; returns False if disabled"""
+        if interval_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return False
+
+        def loop():
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    self.run()
+                except Exception as e:
+                    print(f"Warning: Background compaction failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="retention-compactor", daemon=True)
+        self._thread.start()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Totals over all runs, the last run's report and whether the job is scheduled"""
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["scheduled"] = self._thread is not None and self._thread.is_alive()
+        stats["running"] = self._run_lock.locked()
+        stats["last_run"] = self._last_run
+        return stats
+
+# Global instance
+compactor = Compactor()
@@ -0,0 +1,266 @@
+"""
+Near-duplicate story index for ingestion.
+
+The same story often arrives through several feed items with slightly
+different wording. Each article's normalized title and description is
+summarized as a MinHash signature; before an article is chunked and
+embedded, the LSH index is asked for a stored article whose text is at
+least STORY_SIMILARITY_THRESHOLD similar (estimated Jaccard over word
+unigrams and bigrams). A match is merged into that canonical article as an
+alias instead of being embedded again.
+
+Signatures are persisted in SQLite and loaded into an in-memory LSH index
+per scope on first use. Only articles from the last STORY_INDEX_MAX_AGE_DAYS
+are kept, since stories stop being re-reported after a while.
+
+The SQLite file is a cache of the vector store. A scope it has never loaded
+(e.g. a fresh ingestion container) is filled from the stored articles
+published within the age limit, their text taken from each article's first
+chunk, so descriptions longer than one chunk are compared on that prefix.
+Aliases reach other hosts as chunk references persisted in the store; the
+alias table only adds those of canonical articles without recorded chunks.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.rag.link_index import batched
+from src.utils.dates import parse_pub_date
+from src.utils.minhash import LSHIndex, MinHasher, features
+from src.utils.config import (
+    STORY_INDEX_PATH,
+    STORY_SIMILARITY_THRESHOLD,
+    STORY_INDEX_MAX_AGE_DAYS,
+    STORY_MIN_FEATURES,
+    LINK_QUERY_BATCH_SIZE,
+    ALSO_REPORTED_BY_LIMIT
+)
+
+def story_text(article: Dict) -> str:
+    """Title plus description, ignoring feed placeholders"""
+    description = article.get('description') or ''
+    if description == "No description":
+        description = ''
+    return f"{article.get('title') or ''} {description}"
+
+class StoryIndex:
+    """Persisted MinHash signatures of canonical articles, with their merged aliases"""
+
+    def __init__(self, path: str = STORY_INDEX_PATH, threshold: float = STORY_SIMILARITY_THRESHOLD,
+                 max_age_days: float = STORY_INDEX_MAX_AGE_DAYS, min_features: int = STORY_MIN_FEATURES):
+        self.path = path
+        self.threshold = threshold
+        self.max_age_days = max_age_days
+        self.min_features = min_features
+        self.hasher = MinHasher()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, LSHIndex] = {}
+        self._stats = {"checked": 0, "duplicates": 0, "aliases": 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the index database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stories (
+                    scope TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (scope, link)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS story_aliases (
+                    scope TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    canonical_link TEXT NOT NULL,
+                    title TEXT,
+                    source TEXT,
+                    pub_date TEXT,
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (scope, link)
+                ) WITHOUT ROWID
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS story_aliases_canonical_idx ON story_aliases (scope, canonical_link)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS loaded (scope TEXT PRIMARY KEY, loaded_at REAL NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def signature(self, article: Dict) -> Optional[np.ndarray]:
+        """MinHash signature of an article, or None if its text is too short to compare safely"""
+        feature_set = features(story_text(article))
+        if len(feature_set) < self.min_features:
+            return None
+        return self.hasher.signature(feature_set)
+
+    def new_index(self) -> LSHIndex:
+        """An empty LSH index with this index's threshold (e.g. for articles pending in a run)"""
+        return LSHIndex(self.threshold, self.hasher.num_perm)
+
+    def _get_index(self, scope: str) -> LSHIndex:
+        """In-memory LSH index for a scope, loaded from recent signatures (caller holds the lock)"""
+        index = self._indexes.get(scope)
+        if index is None:
+            conn = self._get_conn()
+            cutoff = time.time() - self.max_age_days * 86400
+            conn.execute("DELETE FROM stories WHERE scope = ? AND added_at < ?", (scope, cutoff))
+            conn.commit()
+            index = self.new_index()
+            for link, blob in conn.execute("SELECT link, signature FROM stories WHERE scope = ?", (scope,)):
+                index.add(link, np.frombuffer(blob, dtype=np.uint32))
+            self._indexes[scope] = index
+        return index
+
+    def is_loaded(self, scope: str) -> bool:
+        """Whether the scope was ever filled from its store"""
+        with self._lock:
+            row = self._get_conn().execute("SELECT 1 FROM loaded WHERE scope = ?", (scope,)).fetchone()
+        return row is not None
+
+    def load_scope(self, scope: str, articles: Iterable[Dict]) -> int:
+        """Add signatures of stored articles published within the age limit; returns stories added"""
+        cutoff = time.time() - self.max_age_days * 86400
+        rows = []
+        for article in articles:
+            pub_ts = parse_pub_date(article.get('pub_date'))
+            if not article.get('link') or pub_ts is None or pub_ts < cutoff:
+                continue
+            signature = self.signature(article)
+            if signature is not None:
+                rows.append((scope, article['link'], signature.astype(np.uint32).tobytes(), pub_ts))
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany(
+                "INSERT OR IGNORE INTO stories (scope, link, signature, added_at) VALUES (?, ?, ?, ?)", rows
+            )
+            conn.execute("INSERT OR REPLACE INTO loaded (scope, loaded_at) VALUES (?, ?)", (scope, time.time()))
+            conn.commit()
+            self._indexes.pop(scope, None)
+        return len(rows)
+
+    def find_duplicate(self, scope: str, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Link and similarity of the closest stored story above the threshold"""
+        with self._lock:
+            match = self._get_index(scope).query(signature)
+            self._stats["checked"] += 1
+            if match:
+                self._stats["duplicates"] += 1
+        return match
+
+    def add_many(self, scope: str, stories: Iterable[Tuple[str, np.ndarray]]):
+        """Record (link, signature) pairs of articles that were stored as canonical stories"""
+        stories = [(link, signature) for link, signature in stories if link and signature is not None]
+        if not stories:
+            return
+        now = time.time()
+        with self._lock:
+            index = self._get_index(scope)
+            conn = self._get_conn()
+            conn.executemany(
+                "INSERT OR IGNORE INTO stories (scope, link, signature, added_at) VALUES (?, ?, ?, ?)",
+                [(scope, link, signature.astype(np.uint32).tobytes(), now) for link, signature in stories]
+            )
+            conn.commit()
+            for link, signature in stories:
+                index.add(link, signature)
+
+    def add_aliases(self, scope: str, aliases: Iterable[Tuple[str, Dict]]):
+        """Record (canonical_link, article) pairs of articles merged into a canonical story"""
+        now = time.time()
+        rows = [
+            (scope, article.get('link'), canonical_link, article.get('title'),
+             article.get('source'), article.get('pub_date'), now)
+            for canonical_link, article in aliases if article.get('link')
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany(
+                "INSERT OR IGNORE INTO story_aliases "
+                "(scope, link, canonical_link, title, source, pub_date, added_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+            self._stats["aliases"] += len(rows)
+
+    def get_aliases(self, scope: str, canonical_links: Iterable[str],
+                    limit: int = ALSO_REPORTED_BY_LIMIT) -> Dict[str, List[Dict[str, str]]]:
+        """The limit most recently merged articles per canonical link, newest first"""
+        links = list(set(link for link in canonical_links if link))
+        aliases: Dict[str, List[Dict[str, str]]] = {}
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(links, LINK_QUERY_BATCH_SIZE):
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT canonical_link, link, title, source, pub_date FROM ("
+                    f"SELECT *, ROW_NUMBER() OVER (PARTITION BY canonical_link ORDER BY added_at DESC, link) AS rank "
+                    f"FROM story_aliases WHERE scope = ? AND canonical_link IN ({placeholders})"
+                    f") WHERE rank <= ? ORDER BY canonical_link, rank",
+                    [scope, *batch, limit]
+                ).fetchall()
+                for canonical_link, link, title, source, pub_date in rows:
+                    aliases.setdefault(canonical_link, []).append(
+                        {"link": link, "title": title, "source": source, "pub_date": pub_date}
+                    )
+        return aliases
+
+    def discard_links(self, scope: str, links: Iterable[str]):
+        """Forget deleted articles as canonical stories and as aliases"""
+        links = list(set(link for link in links if link))
+        if not links:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            for batch in batched(links, LINK_QUERY_BATCH_SIZE):
+                placeholders = ",".join("?" * len(batch))
+                conn.execute(f"DELETE FROM stories WHERE scope = ? AND link IN ({placeholders})", [scope, *batch])
+                conn.execute(
+                    f"DELETE FROM story_aliases WHERE scope = ? AND "
+                    f"(link IN ({placeholders}) OR canonical_link IN ({placeholders}))",
+                    [scope, *batch, *batch]
+                )
+            conn.commit()
+            # LSH buckets cannot drop keys; reload the scope on next use
+            self._indexes.pop(scope, None)
+
+    def clear(self, scope: Optional[str] = None):
+        """Forget stories and aliases, for one scope or all of them"""
+        with self._lock:
+            conn = self._get_conn()
+            if scope is None:
+                conn.execute("DELETE FROM stories")
+                conn.execute("DELETE FROM story_aliases")
+                conn.execute("DELETE FROM loaded")
+                self._indexes.clear()
+            else:
+                conn.execute("DELETE FROM stories WHERE scope = ?", (scope,))
+                conn.execute("DELETE FROM story_aliases WHERE scope = ?", (scope,))
+                conn.execute("DELETE FROM loaded WHERE scope = ?", (scope,))
+                self._indexes.pop(scope, None)
+            conn.commit()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Lookup counters plus the number of indexed stories and aliases"""
+        with self._lock:
+            stats = dict(self._stats)
+            conn = self._get_conn()
+            stats["stories"] = conn.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
+            stats["alias_rows"] = conn.execute("SELECT COUNT(*) FROM story_aliases").fetchone()[0]
+        return stats
+
+# Global instance
+story_index = StoryIndex()
@@ -3,25 +3,30 @@ Supabase vector database manager for handling vector operations with pgvector
 """
 import os
 import json
+import asyncio
 from typing import Optional, Dict, Any, List
 from supabase import create_client, Client
-from langchain_openai import OpenAIEmbeddings
+from src.rag.embedding_cache import build_embedding_model
+from src.rag.link_index import batched, link_index
+from src.rag.chunk_index import REFERENCES_KEY, chunk_index, merge_references, with_chunk_ids
+from src.rag.keyword_index import keyword_index
+from src.rag.batch_writer import embedding_writer
+from src.rag.recency import candidate_count, rerank_by_recency
+from src.utils.dates import parse_pub_date
 from langchain.schema import Document
 from src.utils.config import (
     SUPABASE_URL,
     SUPABASE_KEY,
     SUPABASE_SERVICE_KEY,
-    USE_SUPABASE_VECTOR
+    USE_SUPABASE_VECTOR,
+    LINK_QUERY_BATCH_SIZE
 )
 
 class SupabaseVectorManager:
     """Manages Supabase vector database operations using pgvector"""
     
     def __init__(self):
-        self.embedding_model = OpenAIEmbeddings(
-            api_key=os.environ["OPENAI_API_KEY"], 
-            model="text-embedding-3-small"
-        )
+        self.embedding_model = build_embedding_model()
         self._client: Optional[Client] = None
         self._service_client: Optional[Client] = None
     
@@ -46,7 +51,9 @@ class SupabaseVectorManager:
             create_table_sql = f"""
             CREATE TABLE IF NOT EXISTS {table_name} (
                 id BIGSERIAL PRIMARY KEY,
+                chunk_id TEXT,
                 content TEXT NOT NULL,
+                pub_ts DOUBLE PRECISION, -- Publication time (Unix seconds) for time-windowed search
                 embedding VECTOR(1536), -- OpenAI text-embedding-3-small dimension
                 metadata JSONB,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
@@ -60,6 +67,39 @@ class SupabaseVectorManager:
             -- Create index for metadata queries
             CREATE INDEX IF NOT EXISTS {table_name}_metadata_idx 
             ON {table_name} USING GIN (metadata);
+            
+            -- Deterministic chunk IDs make writes idempotent upserts
+            ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS chunk_id TEXT;
+            CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_chunk_id_idx 
+            ON {table_name} (chunk_id);
+            
+            -- Publication time, for time-windowed and recency-boosted search
+            ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS pub_ts DOUBLE PRECISION;
+            CREATE INDEX IF NOT EXISTS {table_name}_pub_ts_idx 
+            ON {table_name} (pub_ts);
+            
+            -- Similarity search restricted to a publication window
+            CREATE OR REPLACE FUNCTION search_articles_window(
+                query_embedding VECTOR(1536),
+                match_threshold FLOAT,
+                match_count INT,
+                min_pub_ts DOUBLE PRECISION DEFAULT NULL,
+                max_pub_ts DOUBLE PRECISION DEFAULT NULL
+            )
+            RETURNS TABLE (id BIGINT, content TEXT, metadata JSONB, similarity FLOAT)
+            LANGUAGE sql STABLE AS $$
+                SELECT id, content, metadata, 1 - (embedding <=> query_embedding) AS similarity
+                FROM {table_name}
+                WHERE (min_pub_ts IS NULL OR pub_ts >= min_pub_ts)
+                  AND (max_pub_ts IS NULL OR pub_ts < max_pub_ts)
+                  AND 1 - (embedding <=> query_embedding) > match_threshold
+                ORDER BY embedding <=> query_embedding
+                LIMIT match_count;
+            $$;
+            
+            -- Create index for link membership checks during ingestion
+            CREATE INDEX IF NOT EXISTS {table_name}_link_idx 
+            ON {table_name} ((metadata->>'link'));
             """
             
             service_client.rpc('exec_sql', {'sql': create_table_sql}).execute()
@@ -70,81 +110,184 @@ class SupabaseVectorManager:
     
     def add_documents(self, documents: List[str], metadatas: List[Dict], 
                      table_name: str = "news_articles") -> bool:
-        """Add documents with embeddings to Supabase"""
+        """Upsert documents with embeddings into Supabase in adaptive, concurrently written batches"""
+        documents, metadatas, _ = with_chunk_ids(documents, metadatas)
         try:
-            client = self.get_client()
-            
-            # Generate embeddings
-            embeddings = self.embedding_model.embed_documents(documents)
-            
-            # Prepare data for insertion
-            records = []
-            for i, (doc, metadata, embedding) in enumerate(zip(documents, metadatas, embeddings)):
-                records.append({
-                    'content': doc,
-                    'embedding': embedding,
-                    'metadata': metadata
-                })
-            
-            # Insert into Supabase
-            result = client.table(table_name).insert(records).execute()
-            return len(result.data) > 0
+            embedding_writer.write(
+                documents,
+                metadatas,
+                lambda texts, batch_metadatas: self._upsert_batch(texts, batch_metadatas, table_name)
+            )
             
         except Exception as e:
             print(f"Error adding documents to Supabase: {e}")
             return False
+        
+        try:
+            link_index.add_many(
+                self._link_scope(table_name),
+                (metadata.get('link') for metadata in metadatas if metadata)
+            )
+            chunk_index.add_many(
+                self._link_scope(table_name),
+                ((metadata.get('content_hash'), metadata.get('link')) for metadata in metadatas if metadata)
+            )
+            keyword_index.add_many(self._link_scope(table_name), documents, metadatas)
+        except Exception as e:
+            # The indexes are derived from the table, which stays authoritative
+            print(f"Warning: Could not update local indexes: {e}")
+        return True
+    
+    def _upsert_batch(self, documents: List[str], metadatas: List[Dict], table_name: str):
+        """Embed one batch and upsert it by chunk_id; raises so the writer can retry or back off"""
+        client = self.get_client()
+        
+        # Generate embeddings
+        embeddings = self.embedding_model.embed_documents(documents)
+        
+        # Prepare data for insertion
+        records = []
+        for doc, metadata, embedding in zip(documents, metadatas, embeddings):
+            records.append({
+                'chunk_id': metadata['chunk_id'],
+                'content': doc,
+                'pub_ts': metadata.get('pub_ts'),
+                'embedding': embedding,
+                'metadata': metadata
+            })
+        
+        # Rows already written by an earlier or overlapping run are replaced
+        result = client.table(table_name).upsert(records, on_conflict='chunk_id').execute()
+        if not result.data:
+            raise Exception(f"Upsert into {table_name} returned no rows")
     
     def search_documents(self, query: str, k: int = 3, 
-                        table_name: str = "news_articles") -> List[Dict]:
-        """Search for similar documents using vector similarity"""
+                        table_name: str = "news_articles",
+                        since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                        recency_decay: bool = False) -> List[Dict]:
+        """Search for similar documents using vector similarity, optionally published in [since_ts, until_ts)"""
         try:
-            client = self.get_client()
-            
             # Generate query embedding
             query_embedding = self.embedding_model.embed_query(query)
+            return self._search_by_vector(query_embedding, k, table_name, since_ts, until_ts, recency_decay)
             
-            # Perform vector similarity search
-            result = client.rpc(
-                'search_articles',
-                {
-                    'query_embedding': query_embedding,
-                    'match_threshold': 0.5,
-                    'match_count': k
-                }
-            ).execute()
-            
-            # Format results
-            results = []
-            for row in result.data:
-                results.append({
-                    'content': row['content'],
-                    'metadata': row['metadata'],
-                    'similarity': row.get('similarity', 0)
-                })
-            
-            return results
+        except Exception as e:
+            print(f"Error searching documents: {e}")
+            return []
+    
+    async def asearch_documents(self, query: str, k: int = 3, 
+                               table_name: str = "news_articles",
+                               since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                               recency_decay: bool = False) -> List[Dict]:
+        """Search for similar documents without blocking the event loop.
+        
+        The query is embedded asynchronously; the RPC goes through the
+        synchronous Supabase client in a worker thread.
+        """
+        try:
+            query_embedding = await self.embedding_model.aembed_query(query)
+            return await asyncio.to_thread(
+                self._search_by_vector, query_embedding, k, table_name, since_ts, until_ts, recency_decay
+            )
             
         except Exception as e:
             print(f"Error searching documents: {e}")
             return []
     
+    def _search_by_vector(self, query_embedding: List[float], k: int,
+                          table_name: str = "news_articles",
+                          since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                          recency_decay: bool = False) -> List[Dict]:
+        """Run the pgvector similarity search for an embedded query"""
+        client = self.get_client()
+        params = {
+            'query_embedding': query_embedding,
+            'match_threshold': 0.5,
+            'match_count': candidate_count(k, recency_decay)
+        }
+        
+        # A time window is applied as a SQL predicate on the indexed pub_ts column
+        if since_ts is not None or until_ts is not None:
+            params.update({'min_pub_ts': since_ts, 'max_pub_ts': until_ts})
+            result = client.rpc('search_articles_window', params).execute()
+        else:
+            result = client.rpc('search_articles', params).execute()
+        
+        # Format results
+        results = []
+        for row in result.data:
+            results.append({
+                'content': row['content'],
+                'metadata': row['metadata'],
+                'similarity': row.get('similarity', 0)
+            })
+        
+        if recency_decay:
+            results = rerank_by_recency(results, k)
+        return chunk_index.attach_references(self._link_scope(table_name), results)
+    
+    def _scan_links(self, table_name: str) -> set:
+        """Every stored article link, by reading all metadata"""
+        client = self.get_client()
+        result = client.table(table_name).select('metadata').execute()
+        return {
+            row['metadata']['link'] for row in result.data
+            if row['metadata'] and row['metadata'].get('link')
+        }
+    
     def get_existing_links(self, table_name: str = "news_articles") -> set:
-        """Get existing article links to avoid duplicates"""
+        """Get every stored article link (full scan; prefer filter_existing_links)"""
         try:
-            client = self.get_client()
-            result = client.table(table_name).select('metadata').execute()
-            
-            existing_links = set()
-            for row in result.data:
-                if row['metadata'] and 'link' in row['metadata']:
-                    existing_links.add(row['metadata']['link'])
-            
-            return existing_links
-            
+            return self._scan_links(table_name)
         except Exception as e:
             print(f"Warning: Could not retrieve existing links: {e}")
             return set()
     
+    def _link_scope(self, table_name: str) -> str:
+        """Link index scope for this backend and table"""
+        return f"supabase:{table_name}"
+    
+    def _query_links(self, links: List[str], table_name: str) -> set:
+        """Which of the given links have at least one stored row (served by the link expression index)"""
+        client = self.get_client()
+        result = client.table(table_name).select('link:metadata->>link').in_('metadata->>link', links).execute()
+        return {row['link'] for row in result.data if row.get('link')}
+    
+    def filter_existing_links(self, links, table_name: str = "news_articles") -> set:
+        """Return the subset of the given links that is already stored"""
+        try:
+            return link_index.filter_existing(
+                self._link_scope(table_name),
+                links,
+                lambda batch: self._query_links(batch, table_name)
+            )
+        except Exception as e:
+            print(f"Warning: Could not check existing links: {e}")
+            return set()
+    
+    def rebuild_link_filter(self, table_name: str = "news_articles") -> int:
+        """Rebuild the link filter and index from a full scan of the store; returns the link count"""
+        links = self._scan_links(table_name)
+        return link_index.rebuild_filter(self._link_scope(table_name), links)
+    
+    def store_references(self, references: Dict[str, List[Dict[str, str]]],
+                         table_name: str = "news_articles") -> int:
+        """Persist extra sources per content hash in the stored rows' metadata; returns rows updated"""
+        client = self.get_client()
+        updated = 0
+        for batch in batched(list(references), LINK_QUERY_BATCH_SIZE):
+            rows = client.table(table_name).select('id, metadata') \
+                .in_('metadata->>content_hash', batch).execute().data or []
+            for row in rows:
+                metadata = row['metadata'] or {}
+                client.table(table_name).update({
+                    'metadata': {**metadata, REFERENCES_KEY: merge_references(
+                        metadata, references[metadata['content_hash']]
+                    )}
+                }).eq('id', row['id']).execute()
+                updated += 1
+        return updated
+    
     def get_all_documents(self, table_name: str = "news_articles") -> Dict[str, Any]:
         """Get all documents from the table"""
         try:
@@ -172,19 +315,86 @@ class SupabaseVectorManager:
         try:
             client = self.get_client()
             result = client.table(table_name).delete().eq('id', document_id).execute()
+            # Other chunks may still reference the link; the next check asks the table
+            link_index.discard_many(
+                self._link_scope(table_name),
+                ((row.get('metadata') or {}).get('link') for row in result.data)
+            )
             return len(result.data) > 0
         except Exception as e:
             print(f"Error deleting document: {e}")
             return False
     
+    def backfill_pub_ts(self, table_name: str = "news_articles", batch_size: int = 500) -> int:
+        """Fill pub_ts for rows stored before it was recorded; returns rows updated"""
+        client = self.get_client()
+        updated, last_id = 0, 0
+        while True:
+            rows = client.table(table_name).select('id, metadata').is_('pub_ts', 'null') \
+                .gt('id', last_id).order('id').limit(batch_size).execute().data
+            if not rows:
+                return updated
+            last_id = rows[-1]['id']
+            for row in rows:
+                metadata = row['metadata'] or {}
+                pub_ts = parse_pub_date(metadata.get('pub_date'))
+                if pub_ts is None:
+                    continue
+                client.table(table_name).update({
+                    'pub_ts': pub_ts,
+                    'metadata': {**metadata, 'pub_ts': pub_ts}
+                }).eq('id', row['id']).execute()
+                updated += 1
+    
+    def delete_articles(self, links: List[str], table_name: str = "news_articles") -> int:
+        """Delete every chunk of the given article links; returns the number of rows removed.
+        
+        Raises on failure so the caller can stop or retry the batch.
+        """
+        client = self.get_client()
+        result = client.table(table_name).delete().in_('metadata->>link', links).execute()
+        chunk_index.discard_links(self._link_scope(table_name), links)
+        keyword_index.discard_links(self._link_scope(table_name), links)
+        return len(result.data or [])
+    
+    def get_storage_bytes(self, table_name: str = "news_articles") -> Optional[int]:
+        """Total size of the table and its indexes, if the exec_sql function returns rows"""
+        try:
+            service_client = self.get_service_client()
+            result = service_client.rpc(
+                'exec_sql', {'sql': f"SELECT pg_total_relation_size('{table_name}') AS bytes"}
+            ).execute()
+            rows = result.data if isinstance(result.data, list) else []
+            return int(rows[0]['bytes']) if rows and 'bytes' in rows[0] else None
+        except Exception as e:
+            print(f"Warning: Could not read table size: {e}")
+            return None
+    
+    def compact_storage(self, table_name: str = "news_articles") -> bool:
+        """Rebuild the vector index and refresh planner statistics after deletions.
+        
+        VACUUM cannot run inside the exec_sql function; autovacuum reclaims the
+        dead rows, and rebuilding the ivfflat index re-balances its lists.
+        """
+        try:
+            service_client = self.get_service_client()
+            service_client.rpc('exec_sql', {'sql': f"""
+            REINDEX INDEX {table_name}_embedding_idx;
+            ANALYZE {table_name};
+            """}).execute()
+            return True
+        except Exception as e:
+            print(f"Error compacting vector table: {e}")
+            return False
+    
     def update_document(self, document_id: int, content: str, metadata: Dict, 
                        table_name: str = "news_articles") -> bool:
         """Update a document and regenerate its embedding"""
         try:
             client = self.get_client()
             
-            # Generate new embedding
-            embedding = self.embedding_model.embed_query(content)
+            # Generate new embedding (served from the cache if the content is unchanged)
+            embedding = self.embedding_model.embed_documents([content])[0]
             
             # Update document
             result = client.table(table_name).update({
@@ -2,22 +2,47 @@
 Unified database manager that supports both ChromaDB and Supabase vector databases
 """
 import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Any, List
 from src.utils.config import (
     USE_CHROMA_CLOUD, 
     USE_SUPABASE_VECTOR,
-    VECTOR_DB_PATH
+    VECTOR_DB_PATH,
+    SEARCH_MODE,
+    HYBRID_CANDIDATES,
+    ALSO_REPORTED_BY_LIMIT,
+    KEYWORD_INDEX_TTL_SECONDS
 )
-from src.rag.database_manager import DatabaseManager
-from src.rag.supabase_manager import SupabaseVectorManager
+from src.rag.database_manager import db_manager
+from src.rag.supabase_manager import supabase_manager
+from src.rag.link_index import link_index
+from src.rag.chunk_index import chunk_index
+from src.rag.story_index import story_index
+from src.rag.article_index import chunk_content
+from src.rag.article_listing import collapse_articles
+from src.rag.keyword_index import keyword_index, reciprocal_rank_fusion
+from src.rag.recency import rerank_by_recency
 
 class UnifiedDatabaseManager:
     """Unified manager that handles both ChromaDB and Supabase vector databases"""
     
     def __init__(self):
-        self.chroma_manager = DatabaseManager()
-        self.supabase_manager = SupabaseVectorManager()
+        # Share the global managers so cached connections and handles are reused
+        self.chroma_manager = db_manager
+        self.supabase_manager = supabase_manager
         self._current_backend = None
+        # Runs the keyword leg of hybrid searches next to the vector leg
+        self._keyword_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="keyword-search")
+        self._search_lock = threading.Lock()
+        self._search_stats: Dict[str, Dict[str, float]] = {}
+        self._chunk_index_lock = threading.Lock()
+        self._story_index_lock = threading.Lock()
+        # Keyword index scopes being resynced from their store, and the last sync's outcome
+        self._keyword_refreshing: set = set()
+        self._keyword_sync: Dict[str, Any] = {"syncs": 0, "added": 0, "removed": 0, "last_error": None}
     
     def _get_backend(self):
         """Determine which backend to use based on configuration"""
@@ -49,6 +74,192 @@ class UnifiedDatabaseManager:
         else:
             return self.chroma_manager.get_existing_links(collection_name)
     
+    def filter_existing_links(self, links, collection_name: str = "news_articles") -> set:
+        """Return the subset of the given links that is already stored"""
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return self.supabase_manager.filter_existing_links(links, collection_name)
+        else:
+            return self.chroma_manager.filter_existing_links(links, collection_name)
+    
+    def rebuild_link_filter(self, collection_name: str = "news_articles") -> int:
+        """Rebuild the active backend's link filter and index from the store"""
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return self.supabase_manager.rebuild_link_filter(collection_name)
+        else:
+            return self.chroma_manager.rebuild_link_filter(collection_name)
+    
+    def _index_scope(self, collection_name: str) -> str:
+        """Link and chunk index scope of the active backend"""
+        if self._get_backend() == "supabase":
+            return self.supabase_manager._link_scope(collection_name)
+        return self.chroma_manager._link_scope(collection_name)
+    
+    def _ensure_chunk_index(self, collection_name: str):
+        """Fill the chunk index from the store the first time this host uses a scope"""
+        scope = self._index_scope(collection_name)
+        if chunk_index.is_loaded(scope):
+            return
+        with self._chunk_index_lock:
+            if not chunk_index.is_loaded(scope):
+                all_docs = self.get_all_documents(collection_name)
+                loaded = chunk_index.load_scope(scope, all_docs.get('metadatas') or [])
+                print(f"  ✓ Loaded {loaded} stored chunk hashes into the chunk index")
+    
+    def filter_existing_chunks(self, hashes, collection_name: str = "news_articles") -> set:
+        """Return the subset of the given chunk content hashes that is already stored"""
+        try:
+            self._ensure_chunk_index(collection_name)
+            return chunk_index.contains_many(self._index_scope(collection_name), hashes)
+        except Exception as e:
+            print(f"Warning: Could not check existing chunks: {e}")
+            return set()
+    
+    def add_chunk_references(self, references, collection_name: str = "news_articles") -> bool:
+        """Record (content_hash, metadata) pairs of chunks that reuse an already stored vector.
+        
+        The referencing articles' links count as stored, so later runs skip them.
+        """
+        references = list(references)
+        scope = self._index_scope(collection_name)
+        try:
+            chunk_index.add_references(scope, references)
+            link_index.add_many(scope, (metadata.get('link') for _, metadata in references))
+        except Exception as e:
+            print(f"Warning: Could not record chunk references: {e}")
+            return False
+        # Stored with the chunks too, so searches on other hosts credit them
+        by_hash: Dict[str, List[Dict]] = {}
+        for content_hash, metadata in references:
+            if metadata.get('link'):
+                by_hash.setdefault(content_hash, []).append({
+                    key: metadata.get(key) for key in ("link", "title", "source", "pub_date")
+                })
+        if not by_hash:
+            return True
+        try:
+            if self._get_backend() == "supabase":
+                self.supabase_manager.store_references(by_hash, collection_name)
+            else:
+                self.chroma_manager.store_references(by_hash, collection_name)
+            return True
+        except Exception as e:
+            print(f"Warning: Could not store chunk references: {e}")
+            return False
+    
+    def _ensure_story_index(self, collection_name: str):
+        """Fill the story index from the store the first time this host uses a scope"""
+        scope = self._index_scope(collection_name)
+        if story_index.is_loaded(scope):
+            return
+        with self._story_index_lock:
+            if not story_index.is_loaded(scope):
+                articles = [
+                    {**article, "description": chunk_content(article.get('content'))}
+                    for article in collapse_articles(self.get_all_documents(collection_name))
+                ]
+                loaded = story_index.load_scope(scope, articles)
+                print(f"  ✓ Loaded {loaded} stored stories into the story index")
+    
+    def find_duplicate_story(self, signature, collection_name: str = "news_articles"):
+        """(canonical link, similarity) of a stored story near-duplicating the signature, or None"""
+        try:
+            self._ensure_story_index(collection_name)
+            return story_index.find_duplicate(self._index_scope(collection_name), signature)
+        except Exception as e:
+            print(f"Warning: Could not check near-duplicate stories: {e}")
+            return None
+    
+    def add_stories(self, stories, collection_name: str = "news_articles") -> bool:
+        """Record (link, signature) pairs of articles stored as canonical stories"""
+        try:
+            story_index.add_many(self._index_scope(collection_name), stories)
+            return True
+        except Exception as e:
+            print(f"Warning: Could not record stories: {e}")
+            return False
+    
+    def merge_near_duplicates(self, duplicates, collection_name: str = "news_articles") -> int:
+        """Merge (canonical_link, article) pairs into their stored canonical story.
+        
+        Each duplicate becomes an alias of the canonical article and a source
+        reference on its stored chunks, so search results credit it without
+        it ever being embedded. Returns the number of chunk references added.
+        """
+        duplicates = list(duplicates)
+        if not duplicates:
+            return 0
+        scope = self._index_scope(collection_name)
+        try:
+            story_index.add_aliases(scope, duplicates)
+            self._ensure_chunk_index(collection_name)
+            hashes = chunk_index.hashes_for_links(scope, (canonical for canonical, _ in duplicates))
+        except Exception as e:
+            print(f"Warning: Could not record near-duplicate stories: {e}")
+            return 0
+        references = [
+            (content_hash, {
+                "link": article.get("link"),
+                "title": article.get("title"),
+                "source": article.get("source"),
+                "pub_date": article.get("pub_date")
+            })
+            for canonical, article in duplicates
+            for content_hash in hashes.get(canonical, [])
+        ]
+        self.add_chunk_references(references, collection_name)
+        # Aliases of stories stored before chunk hashes were recorded still count as stored
+        try:
+            link_index.add_many(scope, (article.get("link") for _, article in duplicates))
+        except Exception as e:
+            print(f"Warning: Could not update link index: {e}")
+        return len(references)
+    
+    def delete_articles(self, links: List[str], collection_name: str = "news_articles") -> int:
+        """Delete the given articles' chunks and forget them as stories; returns vectors removed.
+        
+        Links stay in the link index, so expired articles still listed in a
+        feed are not ingested again. Raises on failure.
+        """
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            deleted = self.supabase_manager.delete_articles(links, collection_name)
+        else:
+            deleted = self.chroma_manager.delete_articles(links, collection_name)
+        try:
+            story_index.discard_links(self._index_scope(collection_name), links)
+        except Exception as e:
+            print(f"Warning: Could not update story index: {e}")
+        return deleted
+    
+    def get_storage_breakdown(self, collection_name: str = "news_articles") -> Optional[Dict[str, int]]:
+        """Storage per part of the local Chroma store (SQLite vs HNSW); None for other backends"""
+        if self._get_backend() == "supabase":
+            return None
+        return self.chroma_manager.get_storage_breakdown()
+    
+    def get_storage_bytes(self, collection_name: str = "news_articles") -> Optional[int]:
+        """Storage used by the active backend, or None if it cannot be measured"""
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return self.supabase_manager.get_storage_bytes(collection_name)
+        else:
+            return self.chroma_manager.get_storage_bytes()
+    
+    def compact_storage(self, collection_name: str = "news_articles") -> bool:
+        """Reclaim space and rebuild indexes after deletions; returns True if anything ran"""
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return self.supabase_manager.compact_storage(collection_name)
+        else:
+            return self.chroma_manager.compact_storage()
+    
     def add_documents(self, documents: List[str], metadatas: List[Dict], 
                      collection_name: str = "news_articles") -> bool:
         """Add documents to the vector store"""
@@ -60,14 +271,253 @@ class UnifiedDatabaseManager:
             return self.chroma_manager.add_documents(documents, metadatas, collection_name)
     
     def search_documents(self, query: str, k: int = 3, 
-                        collection_name: str = "news_articles") -> List[Dict]:
-        """Search for similar documents"""
+                        collection_name: str = "news_articles",
+                        since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                        recency_decay: bool = False, mode: str = SEARCH_MODE) -> List[Dict]:
+        """Search for similar documents, optionally within a publication window.
+        
+        mode "hybrid" fuses vector and BM25 keyword results; "vector" uses
+        vector similarity alone. If nothing was published in the window, the
+        whole collection is searched with recency decay instead, so newer
+        articles still rank first.
+        """
+        search = self._hybrid_search if mode == "hybrid" else self._vector_search
+        results = search(query, k, collection_name, since_ts, until_ts, recency_decay)
+        if not results and (since_ts is not None or until_ts is not None):
+            results = search(query, k, collection_name, recency_decay=True)
+        return self._attach_aliases(results, collection_name)
+    
+    async def asearch_documents(self, query: str, k: int = 3, 
+                               collection_name: str = "news_articles",
+                               since_ts: Optional[float] = None, until_ts: Optional[float] = None,
+                               recency_decay: bool = False, mode: str = SEARCH_MODE) -> List[Dict]:
+        """Search for similar documents (async), optionally within a publication window"""
+        search = self._ahybrid_search if mode == "hybrid" else self._avector_search
+        results = await search(query, k, collection_name, since_ts, until_ts, recency_decay)
+        if not results and (since_ts is not None or until_ts is not None):
+            results = await search(query, k, collection_name, recency_decay=True)
+        return await asyncio.to_thread(self._attach_aliases, results, collection_name)
+    
+    def _attach_aliases(self, results: List[Dict], collection_name: str) -> List[Dict]:
+        """Credit near-duplicates merged into each result's article in its also_reported_by list.
+        
+        Chunk references usually list them already; aliases of articles whose
+        chunk hashes were never recorded are only known to the story index.
+        """
+        if not results:
+            return results
+        try:
+            aliases = story_index.get_aliases(
+                self._index_scope(collection_name),
+                ((result.get('metadata') or {}).get('link') for result in results)
+            )
+        except Exception as e:
+            print(f"Warning: Could not load story aliases: {e}")
+            return results
+        for result in results:
+            metadata = result.get('metadata') or {}
+            merged = aliases.get(metadata.get('link'))
+            if not merged:
+                continue
+            also = result.get('also_reported_by') or []
+            listed = {ref.get('link') for ref in also}
+            result['also_reported_by'] = (
+                also + [alias for alias in merged if alias['link'] not in listed]
+            )[:ALSO_REPORTED_BY_LIMIT]
+        return results
+    
+    def _vector_search(self, query: str, k: int, collection_name: str, since_ts: Optional[float] = None,
+                       until_ts: Optional[float] = None, recency_decay: bool = False) -> List[Dict]:
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return self.supabase_manager.search_documents(query, k, collection_name, since_ts, until_ts, recency_decay)
+        else:
+            return self.chroma_manager.search_documents(query, k, collection_name, since_ts, until_ts, recency_decay)
+    
+    async def _avector_search(self, query: str, k: int, collection_name: str, since_ts: Optional[float] = None,
+                              until_ts: Optional[float] = None, recency_decay: bool = False) -> List[Dict]:
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return await self.supabase_manager.asearch_documents(
+                query, k, collection_name, since_ts, until_ts, recency_decay
+            )
+        else:
+            return await self.chroma_manager.asearch_documents(
+                query, k, collection_name, since_ts, until_ts, recency_decay
+            )
+    
+    def _keyword_search(self, query: str, k: int, collection_name: str, since_ts: Optional[float] = None,
+                        until_ts: Optional[float] = None) -> List[Dict]:
+        """BM25 leg of a hybrid search; an unusable index only costs the keyword matches"""
+        try:
+            return keyword_index.search(self._index_scope(collection_name), query, k, since_ts, until_ts)
+        except Exception as e:
+            print(f"Warning: Keyword search failed: {e}")
+            return []
+    
+    @staticmethod
+    def _timed(func, *args):
+        """Run func and return (result, elapsed milliseconds)"""
+        start = time.perf_counter()
+        result = func(*args)
+        return result, (time.perf_counter() - start) * 1000
+    
+    def _hybrid_search(self, query: str, k: int, collection_name: str, since_ts: Optional[float] = None,
+                       until_ts: Optional[float] = None, recency_decay: bool = False) -> List[Dict]:
+        """Vector and keyword searches run in parallel, fused by reciprocal rank"""
+        self.revalidate_keyword_index(collection_name)
+        candidates = max(HYBRID_CANDIDATES, k)
+        keyword_future = self._keyword_pool.submit(
+            self._timed, self._keyword_search, query, candidates, collection_name, since_ts, until_ts
+        )
+        vector_results, vector_ms = self._timed(
+            self._vector_search, query, candidates, collection_name, since_ts, until_ts
+        )
+        keyword_results, keyword_ms = keyword_future.result()
+        return self._fuse(vector_results, keyword_results, k, collection_name, recency_decay,
+                          {"vector": vector_ms, "keyword": keyword_ms})
+    
+    async def _ahybrid_search(self, query: str, k: int, collection_name: str, since_ts: Optional[float] = None,
+                              until_ts: Optional[float] = None, recency_decay: bool = False) -> List[Dict]:
+        """Vector and keyword searches run concurrently, fused by reciprocal rank (async)"""
+        self.revalidate_keyword_index(collection_name)
+        candidates = max(HYBRID_CANDIDATES, k)
+        
+        async def vector_leg():
+            start = time.perf_counter()
+            results = await self._avector_search(query, candidates, collection_name, since_ts, until_ts)
+            return results, (time.perf_counter() - start) * 1000
+        
+        (vector_results, vector_ms), (keyword_results, keyword_ms) = await asyncio.gather(
+            vector_leg(),
+            asyncio.to_thread(
+                self._timed, self._keyword_search, query, candidates, collection_name, since_ts, until_ts
+            )
+        )
+        return self._fuse(vector_results, keyword_results, k, collection_name, recency_decay,
+                          {"vector": vector_ms, "keyword": keyword_ms})
+    
+    def _fuse(self, vector_results: List[Dict], keyword_results: List[Dict], k: int, collection_name: str,
+              recency_decay: bool, timings: Dict[str, float]) -> List[Dict]:
+        """Reciprocal rank fusion of both legs, crediting sources of keyword-only chunks"""
+        start = time.perf_counter()
+        results = reciprocal_rank_fusion({"vector": vector_results, "keyword": keyword_results},
+                                         len(vector_results) + len(keyword_results))
+        if recency_decay:
+            results = rerank_by_recency(results, k, score_key='rrf_score')
+        results = results[:k]
+        keyword_only = [result for result in results if 'vector' not in result['ranks']]
+        if keyword_only:
+            chunk_index.attach_references(self._index_scope(collection_name), keyword_only)
+        timings["fusion"] = (time.perf_counter() - start) * 1000
+        self._record_search(timings)
+        return results
+    
+    def _record_search(self, timings: Dict[str, float]):
+        """Accumulate per-leg latency of a hybrid search"""
+        with self._search_lock:
+            for leg, elapsed_ms in timings.items():
+                stats = self._search_stats.setdefault(leg, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                stats["count"] += 1
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+                stats["last_ms"] = elapsed_ms
+    
+    def get_search_stats(self) -> Dict[str, Any]:
+        """Per-leg latency of hybrid searches (vector, keyword, fusion), keyword index size and resync state"""
+        with self._search_lock:
+            legs = {
+                leg: {
+                    "count": stats["count"],
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 2),
+                    "max_ms": round(stats["max_ms"], 2),
+                    "last_ms": round(stats["last_ms"], 2)
+                }
+                for leg, stats in self._search_stats.items()
+            }
+            sync = dict(self._keyword_sync, refreshing=sorted(self._keyword_refreshing))
+        return {"mode": SEARCH_MODE, "legs": legs, "keyword_index": keyword_index.get_stats(), "keyword_sync": sync}
+    
+    def sync_keyword_index(self, collection_name: str = "news_articles") -> Dict[str, int]:
+        """Add chunks written and drop chunks deleted by other processes since the last sync"""
+        all_docs = self.get_all_documents(collection_name)
+        added, removed = keyword_index.sync_scope(
+            self._index_scope(collection_name),
+            all_docs.get('documents') or [],
+            all_docs.get('metadatas') or []
+        )
+        return {"added": added, "removed": removed}
+    
+    def revalidate_keyword_index(self, collection_name: str = "news_articles"):
+        """Resync the keyword index in the background once it is older than its TTL"""
+        scope = self._index_scope(collection_name)
+        try:
+            synced_at = keyword_index.get_synced_at(scope)
+        except Exception as e:
+            print(f"Warning: Could not read keyword index state: {e}")
+            return
+        if synced_at is not None and time.time() - synced_at < KEYWORD_INDEX_TTL_SECONDS:
+            return
+        with self._search_lock:
+            if scope in self._keyword_refreshing:
+                return
+            self._keyword_refreshing.add(scope)
+        
+        def run():
+            try:
+                result = self.sync_keyword_index(collection_name)
+                with self._search_lock:
+                    self._keyword_sync["syncs"] += 1
+                    self._keyword_sync["added"] += result["added"]
+                    self._keyword_sync["removed"] += result["removed"]
+                    self._keyword_sync["last_error"] = None
+            except Exception as e:
+                with self._search_lock:
+                    self._keyword_sync["last_error"] = str(e)
+                print(f"Warning: Keyword index refresh failed: {e}")
+            finally:
+                with self._search_lock:
+                    self._keyword_refreshing.discard(scope)
+        
+        threading.Thread(target=run, name="keyword-index-refresh", daemon=True).start()
+    
+    def rebuild_keyword_index(self, collection_name: str = "news_articles") -> int:
+        """Rebuild the active backend's keyword index from the store; returns the chunk count"""
+        all_docs = self.get_all_documents(collection_name)
+        return keyword_index.replace_scope(
+            self._index_scope(collection_name),
+            all_docs.get('documents') or [],
+            all_docs.get('metadatas') or []
+        )
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query with the active backend's (cached) embedding model"""
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return self.supabase_manager.embedding_model.embed_query(query)
+        else:
+            return self.chroma_manager.embedding_model.embed_query(query)
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """Embed a query with the active backend's (cached) embedding model (async)"""
+        backend = self._get_backend()
+        
+        if backend == "supabase":
+            return await self.supabase_manager.embedding_model.aembed_query(query)
+        else:
+            return await self.chroma_manager.embedding_model.aembed_query(query)
+    
+    def backfill_pub_ts(self, collection_name: str = "news_articles") -> int:
+        """Add numeric publication times to chunks stored before they were recorded"""
         backend = self._get_backend()
         
         if backend == "supabase":
-            return self.supabase_manager.search_documents(query, k, collection_name)
+            return self.supabase_manager.backfill_pub_ts(collection_name)
         else:
-            return self.chroma_manager.search_documents(query, k, collection_name)
+            return self.chroma_manager.backfill_pub_ts(collection_name)
     
     def get_all_documents(self, collection_name: str = "news_articles") -> Dict[str, Any]:
         """Get all documents from the collection"""
@@ -105,12 +555,14 @@ class UnifiedDatabaseManager:
         elif backend == "chroma_cloud":
             info.update({
                 "type": "ChromaDB Cloud",
-                "database": os.getenv("CHROMA_DATABASE", "Not configured")
+                "database": os.getenv("CHROMA_DATABASE", "Not configured"),
+                "handles": self.chroma_manager.get_handle_stats()
             })
         else:
             info.update({
                 "type": "ChromaDB Local",
-                "path": VECTOR_DB_PATH
+                "path": VECTOR_DB_PATH,
+                "handles": self.chroma_manager.get_handle_stats()
             })
         
         return info
@@ -1,12 +1,10 @@
 from src.data_sources.techmeme_rss_parser import get_text as get_techmeme_text
 from src.data_sources.mit import get_text as get_mit_text
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
+from src.rag.embedding_cache import build_embedding_model
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain.schema import Document
 import warnings
 import urllib3
 import os
@@ -17,13 +15,18 @@ warnings.filterwarnings('ignore', category=urllib3.exceptions.NotOpenSSLWarning)
 os.environ['PYTHONWARNINGS'] = 'ignore::urllib3.exceptions.NotOpenSSLWarning'
 
 load_dotenv()
-openai_api_key = os.environ["OPENAI_API_KEY"]
-embedding_model = OpenAIEmbeddings(api_key=openai_api_key, model="text-embedding-3-small")
+# Cheap: the OpenAI client is only built when the first embedding is requested
+embedding_model = build_embedding_model()
 
 def rag_news(user_prompt, persist_directory="./data/vector_db"):
     """
     Create or update vector store with articles from multiple sources (Techmeme and MIT).
     """
+    # Imported here so importing this module stays cheap
+    from langchain_chroma import Chroma
+    from langchain.schema import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     print("=== Searching Related news from multiple sources ===")
     
     # Get articles from both sources
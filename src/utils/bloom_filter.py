@@ -0,0 +1,169 @@
+"""
+Scalable Bloom filter for set membership at multi-million scale.
+
+A Bloom filter answers "definitely not present" or "probably present" using
+a few bits per item. The scalable variant grows by adding slices, each twice
+the capacity of the last with a tighter error rate, so the overall false
+positive rate stays under the configured target however many items are
+added. A memory ceiling stops growth; once it is hit the filter reports
+itself saturated and callers should stop trusting its positive answers.
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional
+
+_MAGIC = b"BLOOM1\n"
+
+class BloomFilter:
+    """Fixed-capacity Bloom filter backed by a bytearray"""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytearray] = None,
+                 count: int = 0):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optimal size and hash count for the target error rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, item: str) -> List[int]:
+        """Bit positions for an item, by double hashing one 128-bit digest"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns False if it was (probably) present already"""
+        present = True
+        for position in self._positions(item):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        if not present:
+            self.count += 1
+        return not present
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+class ScalableBloomFilter:
+    """Bloom filter that grows in slices to keep its false positive rate bounded"""
+
+    GROWTH_FACTOR = 2
+    TIGHTENING_RATIO = 0.5
+
+    def __init__(self, initial_capacity: int = 100000, error_rate: float = 0.001,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.saturated = False
+        self._slices: List[BloomFilter] = []
+        self._lock = threading.Lock()
+
+    def _add_slice(self) -> Optional[BloomFilter]:
+        """Append a larger, stricter slice unless it would exceed the memory ceiling"""
+        n = len(self._slices)
+        capacity = self.initial_capacity * (self.GROWTH_FACTOR ** n)
+        # Slice error rates form a geometric series summing to at most error_rate
+        error_rate = self.error_rate * (1 - self.TIGHTENING_RATIO) * (self.TIGHTENING_RATIO ** n)
+        candidate = BloomFilter(capacity, error_rate)
+        if self._slices and self.memory_bytes + len(candidate.bits) > self.max_bytes:
+            self.saturated = True
+            return None
+        self._slices.append(candidate)
+        return candidate
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns False if it was (probably) present already"""
+        with self._lock:
+            if any(item in s for s in self._slices):
+                return False
+            target = self._slices[-1] if self._slices else None
+            if target is None or target.is_full:
+                # When saturated, keep filling the last slice; its error rate rises
+                target = self._add_slice() or target
+            return target.add(item)
+
+    def update(self, items: Iterable[str]) -> int:
+        """Add many items; returns how many were new"""
+        return sum(1 for item in items if item and self.add(item))
+
+    def __contains__(self, item: str) -> bool:
+        with self._lock:
+            return any(item in s for s in self._slices)
+
+    def __len__(self) -> int:
+        return sum(s.count for s in self._slices)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(s.bits) for s in self._slices)
+
+    def get_stats(self) -> Dict:
+        """Size, memory footprint and configuration"""
+        return {
+            "items": len(self),
+            "slices": len(self._slices),
+            "memory_bytes": self.memory_bytes,
+            "error_rate": self.error_rate,
+            "saturated": self.saturated
+        }
+
+    def save(self, path: str):
+        """Persist the filter; written to a temp file and renamed so readers never see a partial file"""
+        header = {
+            "initial_capacity": self.initial_capacity,
+            "error_rate": self.error_rate,
+            "max_bytes": self.max_bytes,
+            "saturated": self.saturated,
+            "slices": [
+                {"capacity": s.capacity, "error_rate": s.error_rate, "count": s.count}
+                for s in self._slices
+            ]
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock, open(tmp_path, "wb") as f:
+            header_bytes = json.dumps(header).encode("utf-8")
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for s in self._slices:
+                f.write(s.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ScalableBloomFilter":
+        """Load a filter saved with save(); raises ValueError if the file is not one"""
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"Not a Bloom filter file: {path}")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length))
+
+            bloom = cls(header["initial_capacity"], header["error_rate"], header["max_bytes"])
+            bloom.saturated = header["saturated"]
+            for spec in header["slices"]:
+                s = BloomFilter(spec["capacity"], spec["error_rate"], count=spec["count"])
+                bits = f.read(len(s.bits))
+                if len(bits) != len(s.bits):
+                    raise ValueError(f"Truncated Bloom filter file: {path}")
+                s.bits = bytearray(bits)
+                bloom._slices.append(s)
+        return bloom
@@ -8,6 +8,15 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+def _source_limits(name: str) -> dict:
+    """Parse a "Source=value,Other Source=value" environment variable into {source: float}"""
+    limits = {}
+    for item in os.getenv(name, "").split(","):
+        source, _, value = item.partition("=")
+        if source.strip() and value.strip():
+            limits[source.strip()] = float(value)
+    return limits
+
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
@@ -33,6 +42,96 @@ USE_SUPABASE_VECTOR = os.getenv("USE_SUPABASE_VECTOR", "false").lower() == "true
 CHUNK_SIZE = 100
 CHUNK_OVERLAP = 10
 RETRIEVAL_K = 3
+RECENCY_HALF_LIFE_HOURS = float(os.getenv("RECENCY_HALF_LIFE_HOURS", "72"))  # Age at which recency decay halves a score
+RECENCY_CANDIDATE_MULTIPLIER = int(os.getenv("RECENCY_CANDIDATE_MULTIPLIER", "4"))  # Over-fetch before re-ranking
 
 # Embedding Model
 EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Embedding Cache
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./storage/cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+
+# Answer Cache
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "21600"))
+
+# Marker file bumped whenever ingestion adds articles
+INGESTION_VERSION_PATH = os.getenv("INGESTION_VERSION_PATH", "./storage/cache/ingestion_version")
+
+# Token Budget
+DAILY_TOKEN_LIMIT = int(os.getenv("DAILY_TOKEN_LIMIT", "5000"))
+TOKEN_LEDGER_PATH = os.getenv("TOKEN_LEDGER_PATH", "./storage/token_ledger.sqlite")
+TOKEN_LEDGER_RETENTION_DAYS = int(os.getenv("TOKEN_LEDGER_RETENTION_DAYS", "30"))
+TOKEN_RESERVATION_TIMEOUT_SECONDS = float(os.getenv("TOKEN_RESERVATION_TIMEOUT_SECONDS", "600"))
+LEGACY_TOKEN_USAGE_FILE = "storage/daily_token_usage.json"
+
+# News Listing
+# Seconds before the article index is resynced from the vector store in the background
+NEWS_LISTING_TTL_SECONDS = float(os.getenv("NEWS_LISTING_TTL_SECONDS", "300"))
+NEWS_PAGE_SIZE = int(os.getenv("NEWS_PAGE_SIZE", "50"))
+NEWS_MAX_PAGE_SIZE = 200
+ARTICLE_INDEX_PATH = os.getenv("ARTICLE_INDEX_PATH", "./storage/cache/articles.sqlite")
+ARTICLE_SNIPPET_CHARS = int(os.getenv("ARTICLE_SNIPPET_CHARS", "300"))
+
+# Link Dedup Index
+LINK_INDEX_PATH = os.getenv("LINK_INDEX_PATH", "./storage/cache/links.sqlite")
+LINK_QUERY_BATCH_SIZE = int(os.getenv("LINK_QUERY_BATCH_SIZE", "100"))
+LINK_FILTER_DIR = os.getenv("LINK_FILTER_DIR", "./storage/cache/link_filters")
+LINK_FILTER_CAPACITY = int(os.getenv("LINK_FILTER_CAPACITY", "100000"))  # Links in the first slice
+LINK_FILTER_ERROR_RATE = float(os.getenv("LINK_FILTER_ERROR_RATE", "0.001"))
+LINK_FILTER_MAX_MB = float(os.getenv("LINK_FILTER_MAX_MB", "64"))
+
+# Chunk Dedup Index
+CHUNK_INDEX_PATH = os.getenv("CHUNK_INDEX_PATH", "./storage/cache/chunks.sqlite")
+ALSO_REPORTED_BY_LIMIT = int(os.getenv("ALSO_REPORTED_BY_LIMIT", "5"))  # Most recent extra sources shown per chunk
+
+# Keyword Index and Hybrid Search
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", "./storage/cache/keywords.sqlite")
+KEYWORD_TITLE_WEIGHT = float(os.getenv("KEYWORD_TITLE_WEIGHT", "2"))  # BM25 weight of title vs. content matches
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")  # "hybrid" (vector + keyword) or "vector"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # Results fetched per leg before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))  # Reciprocal rank fusion damping constant
+KEYWORD_INDEX_TTL_SECONDS = float(os.getenv("KEYWORD_INDEX_TTL_SECONDS", "600"))  # Resync from the store after this
+
+# Near-Duplicate Story Detection
+STORY_INDEX_PATH = os.getenv("STORY_INDEX_PATH", "./storage/cache/stories.sqlite")
+STORY_SIMILARITY_THRESHOLD = float(os.getenv("STORY_SIMILARITY_THRESHOLD", "0.7"))  # Estimated Jaccard
+STORY_INDEX_MAX_AGE_DAYS = float(os.getenv("STORY_INDEX_MAX_AGE_DAYS", "14"))
+STORY_MIN_FEATURES = int(os.getenv("STORY_MIN_FEATURES", "12"))  # Shorter texts are never merged
+
+# Feed Fetching
+FETCH_MAX_CONNECTIONS_PER_HOST = int(os.getenv("FETCH_MAX_CONNECTIONS_PER_HOST", "4"))
+FETCH_CONNECT_TIMEOUT_SECONDS = float(os.getenv("FETCH_CONNECT_TIMEOUT_SECONDS", "5"))
+FETCH_READ_TIMEOUT_SECONDS = float(os.getenv("FETCH_READ_TIMEOUT_SECONDS", "15"))
+FETCH_DEADLINE_SECONDS = float(os.getenv("FETCH_DEADLINE_SECONDS", "45"))  # Per source, including retries
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+FETCH_BACKOFF_SECONDS = float(os.getenv("FETCH_BACKOFF_SECONDS", "0.5"))
+FEED_STATE_PATH = os.getenv("FEED_STATE_PATH", "./storage/cache/feed_state.sqlite")
+FETCH_SPOOL_MAX_BYTES = int(os.getenv("FETCH_SPOOL_MAX_BYTES", str(4 * 1024 * 1024)))  # Larger feed bodies spill to disk
+
+# Embedding Writes
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))  # Starting size; adapts to latency and 429s
+EMBED_BATCH_MIN_SIZE = int(os.getenv("EMBED_BATCH_MIN_SIZE", "8"))
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "512"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "100000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_TARGET_LATENCY_SECONDS = float(os.getenv("EMBED_TARGET_LATENCY_SECONDS", "10"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "1"))
+
+# Ingestion Pipeline
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))  # Batches buffered between stages
+INGEST_ARTICLE_BATCH_SIZE = int(os.getenv("INGEST_ARTICLE_BATCH_SIZE", "50"))
+INGEST_STORE_WORKERS = int(os.getenv("INGEST_STORE_WORKERS", "2"))
+
+# Retention (deletes articles; off unless RETENTION_INTERVAL_SECONDS and a limit are set)
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))  # By publication date; 0 keeps everything
+RETENTION_SOURCE_MAX_AGE_DAYS = _source_limits("RETENTION_SOURCE_MAX_AGE_DAYS")  # By source name, e.g. "techmeme=14,mit=90"
+RETENTION_SOURCE_MAX_ARTICLES = _source_limits("RETENTION_SOURCE_MAX_ARTICLES")  # Newest N kept, e.g. "techmeme=5000"
+RETENTION_DELETE_BATCH_SIZE = int(os.getenv("RETENTION_DELETE_BATCH_SIZE", "200"))  # Articles per delete
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "0"))  # e.g. 21600; 0 disables the background job
@@ -0,0 +1,32 @@
+"""
+Helpers for the publication dates found in RSS and Atom feeds
+"""
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+def parse_pub_date(value: Optional[str]) -> Optional[float]:
+    """Parse an RFC-822 (RSS) or ISO-8601 (Atom) date into a Unix timestamp.
+
+    Returns None for missing or unparseable dates such as the "No date" placeholder.
+    """
+    if not value:
+        return None
+    value = value.strip()
+
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        parsed = None
+
+    if parsed is None:
+        try:
+            # Python < 3.11 does not accept a trailing "Z"
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    # Naive dates are assumed to be UTC
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
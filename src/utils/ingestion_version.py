@@ -0,0 +1,37 @@
+"""
+Ingestion version marker shared between the extraction job and the web server.
+
+The extraction job bumps the marker whenever it stores new articles; readers
+compare it against the version they last saw to know when derived data
+(cached answers, article listings) is stale. A file is used so the marker
+works across processes and uvicorn workers.
+"""
+import os
+import time
+import uuid
+from src.utils.config import INGESTION_VERSION_PATH
+
+def get_ingestion_version(path: str = INGESTION_VERSION_PATH) -> str:
+    """Get the current ingestion version, or an empty string if nothing was ingested yet"""
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+    except OSError as e:
+        print(f"Warning: Could not read ingestion version: {e}")
+        return ""
+
+def bump_ingestion_version(path: str = INGESTION_VERSION_PATH) -> str:
+    """Record that new articles were ingested and return the new version"""
+    version = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Write then rename so readers never see a partially written marker
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    return version
@@ -0,0 +1,49 @@
+"""
+Canonical form of article links.
+
+Feeds hand out the same article under slightly different URLs: tracking
+parameters (utm_*, fbclid, ...), fragments, default ports, upper-case hosts
+or a trailing slash. Normalizing links before they are compared or stored
+lets the link and story dedup treat those as one article.
+"""
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "cmpid", "cmp", "smid", "smtyp", "ocid", "guccounter",
+    "_hsenc", "_hsmi", "mkt_tok", "trk", "s_cid", "spm"
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "at_", "__")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def _is_tracking(param: str) -> bool:
+    name = param.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def normalize_link(link: Optional[str]) -> Optional[str]:
+    """Canonical form of an http(s) link; other values are returned stripped but unchanged"""
+    if not link:
+        return link
+    link = link.strip()
+    try:
+        parts = urlsplit(link)
+        port = parts.port
+    except ValueError:
+        return link
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return link
+
+    host = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+    # Keep meaningful parameters in a stable order; blank values are kept too
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking(key)
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
@@ -0,0 +1,93 @@
+"""
+MinHash signatures and an LSH index for near-duplicate text lookup.
+
+A MinHash signature summarizes a set of features (here word unigrams and
+bigrams) so that the fraction of equal signature slots estimates the
+Jaccard similarity of two sets. The LSH index splits signatures into bands;
+texts sharing any whole band become candidates, which are then verified
+against the similarity threshold, so lookups never scan the whole index.
+With 32 bands of 4 rows, pairs above about 0.65 similarity are found with
+better than 99% probability.
+"""
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+NUM_PERM = 128
+LSH_BANDS = 32
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def features(text: str) -> Set[str]:
+    """Word unigrams and bigrams of lower-cased text"""
+    words = _WORD.findall(text.lower())
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+class MinHasher:
+    """Fixed family of NUM_PERM hash permutations (deterministic across runs)"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, feature_set: Iterable[str]) -> np.ndarray:
+        """uint32 signature of a feature set (all slots max for an empty set)"""
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=4).digest(), "little")
+             for f in feature_set),
+            dtype=np.uint64
+        )
+        if not len(hashes):
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        # (a * h + b) mod p for every permutation and feature; a * h stays below 2**64
+        permuted = (np.outer(self._a, hashes) % _PRIME + self._b[:, None]) % _PRIME
+        return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures, keyed by string"""
+
+    def __init__(self, threshold: float, num_perm: int = NUM_PERM, bands: int = LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._tables: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: str, signature: np.ndarray):
+        """Index a signature (re-adding a key keeps its first signature)"""
+        if key in self._signatures:
+            return
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._tables[band].setdefault(band_key, []).append(key)
+
+    def query(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Most similar indexed key at or above the threshold, with its similarity"""
+        best: Optional[Tuple[str, float]] = None
+        seen: Set[str] = set()
+        for band, band_key in self._band_keys(signature):
+            for key in self._tables[band].get(band_key, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                score = similarity(signature, self._signatures[key])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (key, score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
@@ -0,0 +1,233 @@
+"""
+Daily token ledger with atomic reserve/commit/refund semantics.
+
+Usage lives in a SQLite database in WAL mode, so every uvicorn worker sees
+the same totals and concurrent requests cannot lose updates: each write is a
+single IMMEDIATE transaction. Requests reserve their estimated cost up front
+and later commit the actual cost (or refund it), so two requests cannot both
+squeeze under the limit. Reads are served from a short-lived in-memory
+counter to keep /api/status cheap.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+from src.utils.config import (
+    DAILY_TOKEN_LIMIT,
+    TOKEN_LEDGER_PATH,
+    TOKEN_LEDGER_RETENTION_DAYS,
+    TOKEN_RESERVATION_TIMEOUT_SECONDS,
+    LEGACY_TOKEN_USAGE_FILE
+)
+
+class TokenLedger:
+    """Tracks tokens spent per day against a daily limit"""
+
+    def __init__(self, path: str = TOKEN_LEDGER_PATH,
+                 daily_limit: int = DAILY_TOKEN_LIMIT,
+                 retention_days: int = TOKEN_LEDGER_RETENTION_DAYS,
+                 reservation_timeout: float = TOKEN_RESERVATION_TIMEOUT_SECONDS,
+                 legacy_json_path: Optional[str] = LEGACY_TOKEN_USAGE_FILE,
+                 read_cache_seconds: float = 1.0):
+        self.path = path
+        self.daily_limit = daily_limit
+        self.retention_days = retention_days
+        self.reservation_timeout = reservation_timeout
+        self.legacy_json_path = legacy_json_path
+        self.read_cache_seconds = read_cache_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # In-memory counter: day -> (committed tokens, monotonic time it was read)
+        self._usage_cache: Dict[str, Tuple[int, float]] = {}
+        self._last_pruned: Optional[str] = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the ledger database on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_usage (
+                    day TEXT PRIMARY KEY,
+                    tokens INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reservations (
+                    id TEXT PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ledger_meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+            self._conn = conn
+            self._import_legacy_usage()
+        return self._conn
+
+    def _import_legacy_usage(self):
+        """Carry over totals from the old JSON usage file the first time the ledger is created.
+
+        A ledger_meta flag records the import, so days pruned later are not
+        brought back each time a worker opens the ledger.
+        """
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return
+        row = self._conn.execute("SELECT 1 FROM ledger_meta WHERE name = 'legacy_imported'").fetchone()
+        if row is not None:
+            return
+        try:
+            with open(self.legacy_json_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read legacy token usage file: {e}")
+            return
+
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another worker may have imported it since the check above
+            if self._conn.execute("SELECT 1 FROM ledger_meta WHERE name = 'legacy_imported'").fetchone():
+                self._conn.execute("COMMIT")
+                return
+            for day, tokens in data.items():
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO daily_usage (day, tokens) VALUES (?, ?)",
+                    (day, int(tokens))
+                )
+            self._conn.execute(
+                "INSERT INTO ledger_meta (name, value) VALUES ('legacy_imported', ?)", (str(time.time()),)
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _transaction(self, operation):
+        """Run an operation inside one IMMEDIATE (write-locked) transaction"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._prune(conn)
+            return result
+
+    def _committed(self, conn: sqlite3.Connection, day: str) -> int:
+        """Committed tokens for a day"""
+        row = conn.execute("SELECT tokens FROM daily_usage WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def _add(self, conn: sqlite3.Connection, day: str, tokens: int):
+        """Add committed tokens to a day and refresh the in-memory counter"""
+        conn.execute(
+            "INSERT INTO daily_usage (day, tokens) VALUES (?, ?) "
+            "ON CONFLICT(day) DO UPDATE SET tokens = tokens + excluded.tokens",
+            (day, tokens)
+        )
+        self._usage_cache[day] = (self._committed(conn, day), time.monotonic())
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop days past the retention window, at most once per day"""
+        today = date.today().isoformat()
+        if self._last_pruned == today:
+            return
+        cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+        conn.execute("DELETE FROM daily_usage WHERE day < ?", (cutoff,))
+        conn.execute("DELETE FROM reservations WHERE day < ?", (today,))
+        self._last_pruned = today
+
+    def reserve(self, tokens: int) -> Tuple[Optional[str], int]:
+        """Atomically reserve tokens for today.
+
+        Returns (reservation_id, usage) where usage counts committed tokens plus
+        outstanding reservations; reservation_id is None if the reservation
+        would exceed the daily limit.
+        """
+        day = date.today().isoformat()
+
+        def operation(conn):
+            # Reservations from requests that died without committing expire
+            conn.execute(
+                "DELETE FROM reservations WHERE created_at < ?",
+                (time.time() - self.reservation_timeout,)
+            )
+            reserved = conn.execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM reservations WHERE day = ?", (day,)
+            ).fetchone()[0]
+            usage = self._committed(conn, day) + reserved
+            if usage + tokens > self.daily_limit:
+                return None, usage
+
+            reservation_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO reservations (id, day, tokens, created_at) VALUES (?, ?, ?, ?)",
+                (reservation_id, day, tokens, time.time())
+            )
+            return reservation_id, usage
+
+        return self._transaction(operation)
+
+    def commit(self, reservation_id: str, actual_tokens: int) -> int:
+        """Replace a reservation with the tokens actually spent; returns today's usage"""
+        day = date.today().isoformat()
+
+        def operation(conn):
+            row = conn.execute(
+                "SELECT day FROM reservations WHERE id = ?", (reservation_id,)
+            ).fetchone()
+            # Charge the day the request started on, even if it finished after midnight
+            charge_day = row[0] if row else day
+            conn.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+            if actual_tokens:
+                self._add(conn, charge_day, actual_tokens)
+            return self._committed(conn, day)
+
+        return self._transaction(operation)
+
+    def refund(self, reservation_id: str) -> int:
+        """Release a reservation without charging anything; returns today's usage"""
+        return self.commit(reservation_id, 0)
+
+    def record(self, tokens: int) -> int:
+        """Charge tokens to today without a reservation; returns today's usage"""
+        day = date.today().isoformat()
+
+        def operation(conn):
+            self._add(conn, day, tokens)
+            return self._committed(conn, day)
+
+        return self._transaction(operation)
+
+    def get_usage(self, day: Optional[str] = None) -> int:
+        """Committed tokens for a day (today by default)"""
+        day = day or date.today().isoformat()
+        cached = self._usage_cache.get(day)
+        if cached and time.monotonic() - cached[1] < self.read_cache_seconds:
+            return cached[0]
+
+        with self._lock:
+            usage = self._committed(self._get_conn(), day)
+            self._usage_cache[day] = (usage, time.monotonic())
+        return usage
+
+# Global instance
+token_ledger = TokenLedger()
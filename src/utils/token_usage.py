@@ -0,0 +1,101 @@
+"""
+Per-request token usage tracking.
+
+A TokenUsage tracker is bound to the current context while a request runs;
+the chat and embedding wrappers record what they actually spend into it.
+Context variables are copied into LangGraph's node tasks and executor
+threads, so nodes record into the tracker of the request that started them.
+"""
+import threading
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+class TokenUsage:
+    """Accumulates prompt, completion and embedding tokens for one request"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.embedding_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens: int = 0, completion_tokens: int = 0, embedding_tokens: int = 0):
+        """Add spent tokens"""
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.embedding_tokens += embedding_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens + self.embedding_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        """Usage in the shape returned by the API"""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "embedding_tokens": self.embedding_tokens,
+            "total_tokens": self.total_tokens
+        }
+
+_current_usage: ContextVar[Optional[TokenUsage]] = ContextVar("token_usage", default=None)
+
+def start_token_usage(usage: Optional[TokenUsage] = None) -> TokenUsage:
+    """Bind a tracker (a fresh one by default) to the current context and return it"""
+    usage = usage or TokenUsage()
+    _current_usage.set(usage)
+    return usage
+
+def get_token_usage() -> Optional[TokenUsage]:
+    """The tracker bound to the current context, if any"""
+    return _current_usage.get()
+
+def record_token_usage(prompt_tokens: int = 0, completion_tokens: int = 0,
+                       embedding_tokens: int = 0):
+    """Record spent tokens into the current request's tracker, if there is one"""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add(prompt_tokens, completion_tokens, embedding_tokens)
+
+def record_llm_usage(message, prompt_text: Callable[[], str] = lambda: "") -> bool:
+    """Record a chat completion's usage from the model's own usage metadata.
+
+    Falls back to tokenizing the prompt (built lazily by prompt_text) and the
+    output when the provider did not report usage; returns True if real usage
+    metadata was found.
+    """
+    usage_metadata = getattr(message, "usage_metadata", None)
+    if usage_metadata:
+        record_token_usage(
+            prompt_tokens=usage_metadata.get("input_tokens", 0),
+            completion_tokens=usage_metadata.get("output_tokens", 0)
+        )
+        return True
+
+    record_token_usage(
+        prompt_tokens=count_tokens(prompt_text()),
+        completion_tokens=count_tokens(getattr(message, "content", "") or "")
+    )
+    return False
+
+@lru_cache(maxsize=8)
+def get_encoding(model: str = "gpt-4o-mini"):
+    """Load the tokenizer for a model once per process"""
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count tokens with the cached tokenizer; only used where the API reports no usage"""
+    if not text:
+        return 0
+    try:
+        return len(get_encoding(model).encode(text))
+    except Exception:
+        # Fallback: rough estimate (1 token ≈ 4 characters)
+        return len(text) // 4
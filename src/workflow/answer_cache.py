@@ -0,0 +1,118 @@
+"""
+Semantic answer cache for the news analysis workflow.
+
+Answers are keyed on the route choice and the retrieval scope (the time
+window or recency preference derived from the query) plus the query
+embedding; a new query reuses a cached answer when its cosine similarity to
+a cached query in the same scope is above the configured threshold. The
+whole cache is dropped when the ingestion version changes, so answers never
+outlive the articles they were built from.
+
+The ingestion version is a local file. When ingestion runs on another host
+without a shared storage volume (e.g. a separate cron container), the web
+server never sees it change and only ANSWER_CACHE_TTL_SECONDS bounds how
+stale an answer can be.
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from src.utils.config import (
+    ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS
+)
+from src.utils.ingestion_version import get_ingestion_version
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    """Scale a vector to unit length so a dot product gives cosine similarity"""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+class AnswerCache:
+    """Similarity-keyed cache of generated answers"""
+
+    def __init__(self, threshold: float = ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: List[Dict] = []
+        self._version = get_ingestion_version()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _check_version(self):
+        """Drop every entry if ingestion added articles since they were cached"""
+        version = get_ingestion_version()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self._stats["invalidations"] += 1
+
+    def lookup(self, route_choice: str, embedding: List[float], scope: str = "") -> Optional[Dict]:
+        """Return the closest cached entry for this route and scope above the threshold"""
+        query = _normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version()
+            self._entries = [e for e in self._entries if e["expires_at"] > now]
+
+            candidates = [e for e in self._entries if e["route_choice"] == route_choice and e["scope"] == scope]
+            best, best_score = None, self.threshold
+            if candidates:
+                scores = np.stack([e["embedding"] for e in candidates]) @ query
+                index = int(np.argmax(scores))
+                if scores[index] >= self.threshold:
+                    best, best_score = candidates[index], float(scores[index])
+
+            if best is None:
+                self._stats["misses"] += 1
+                return None
+            best["last_used"] = now
+            self._stats["hits"] += 1
+            return {
+                "response": best["response"],
+                "route_choice": best["route_choice"],
+                "citations": best["citations"],
+                "similarity": round(best_score, 4)
+            }
+
+    def store(self, route_choice: str, embedding: List[float], response: str,
+              citations: Optional[List[Dict]] = None, scope: str = ""):
+        """Cache an answer, evicting the least recently used entry when full"""
+        now = time.monotonic()
+        with self._lock:
+            self._check_version()
+            if len(self._entries) >= self.max_entries:
+                self._entries.remove(min(self._entries, key=lambda e: e["last_used"]))
+            self._entries.append({
+                "route_choice": route_choice,
+                "scope": scope,
+                "embedding": _normalize(embedding),
+                "response": response,
+                "citations": citations or [],
+                "expires_at": now + self.ttl_seconds,
+                "last_used": now
+            })
+
+    def invalidate(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._version = get_ingestion_version()
+            self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get hit/miss counters and the hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+# Global instance
+answer_cache = AnswerCache()
@@ -1,22 +1,63 @@
 import os
-from typing import TypedDict
+import time
+import asyncio
+from typing import TYPE_CHECKING, TypedDict, Dict, Any, List, Optional, AsyncIterator
 from langgraph.graph import StateGraph, START, END
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 from src.rag.unified_database_manager import unified_db_manager
 from src.data_sources.wikipedia_search import wiki_search
+from src.workflow.answer_cache import answer_cache
+from src.utils.config import ANSWER_CACHE_ENABLED, ALSO_REPORTED_BY_LIMIT
+from src.utils.token_usage import TokenUsage, start_token_usage, record_llm_usage
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 load_dotenv()
-openai_api_key = os.environ["OPENAI_API_KEY"]
 
 class State(TypedDict):
     prompt: str
     route_choice: str
     retrieved_docs: str
+    citations: List[Dict[str, str]]
     response: str
 
+# Words that mark a question as being about news rather than general knowledge
+NEWS_KEYWORDS = [
+    "news", "recent", "latest", "current", "today", "yesterday", 
+    "this week", "this month", "breaking", "update", "announcement"
+]
+
+# Time-bound words restrict retrieval to articles published in the last N days
+RECENCY_WINDOW_DAYS = {
+    "today": 1,
+    "yesterday": 2,
+    "this week": 7,
+    "this month": 31
+}
+
+# Other recency words only favour newer articles
+RECENCY_BOOST_KEYWORDS = ["recent", "latest", "current", "breaking"]
+
+def search_options(prompt: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """Time window and recency decay for retrieving articles about the prompt"""
+    prompt = prompt.lower()
+    now = time.time() if now is None else now
+    days = [days for keyword, days in RECENCY_WINDOW_DAYS.items() if keyword in prompt]
+    if days:
+        return {"since_ts": now - max(days) * 86400, "recency_decay": True}
+    return {"recency_decay": any(keyword in prompt for keyword in RECENCY_BOOST_KEYWORDS)}
+
+def cache_scope(prompt: str, now: Optional[float] = None) -> str:
+    """Answer cache partition for the prompt's search options; windows are bucketed by hour"""
+    options = search_options(prompt, now)
+    if options.get("since_ts") is not None:
+        return f"since:{int(options['since_ts'] // 3600)}"
+    return "recent" if options["recency_decay"] else ""
+
 def route_decision(prompt: str) -> str:
     """
     Function to determine whether to use RAG or Wikipedia based on the user prompt.
@@ -34,13 +75,8 @@ def route_decision(prompt: str) -> str:
     # If it's a very general knowledge question, use Wikipedia
     if any(keyword in prompt.lower() for keyword in general_knowledge_keywords):
         # But still check if it's news-related
-        news_keywords = [
-            "news", "recent", "latest", "current", "today", "yesterday", 
-            "this week", "this month", "breaking", "update", "announcement"
-        ]
-        
         # If it contains news keywords, use RAG
-        if any(keyword in prompt.lower() for keyword in news_keywords):
+        if any(keyword in prompt.lower() for keyword in NEWS_KEYWORDS):
             return "rag"
         
         # Otherwise, use Wikipedia for general knowledge
@@ -49,15 +85,8 @@ def route_decision(prompt: str) -> str:
     # For all other queries, use RAG (news analysis site)
     return "rag"
 
-def query_vector_db(prompt: str, persist_directory="./data/vector_db") -> str:
-    """
-    Query the pre-populated vector DB - NO extraction/fetching here.
-    This assumes the DB has been populated by the background extraction job.
-    """
-    # Use the unified database manager to search for relevant documents
-    results = unified_db_manager.search_documents(prompt, k=3)
-    
-    # Format with metadata for better attribution
+def format_results(results: List[Dict]) -> str:
+    """Format search results with metadata for better attribution"""
     formatted_docs = []
     for result in results:
         metadata = result['metadata']
@@ -68,12 +97,34 @@ def query_vector_db(prompt: str, persist_directory="./data/vector_db") -> str:
         pub_date = metadata.get('pub_date', '')
         
         # Format with clear source attribution
-        formatted_docs.append(
-            f"SOURCE: {source}\nTITLE: {title}\nDATE: {pub_date}\nLINK: {link}\nCONTENT: {content}"
-        )
+        formatted_doc = f"SOURCE: {source}\nTITLE: {title}\nDATE: {pub_date}\nLINK: {link}\nCONTENT: {content}"
+        # Identical text carried by other articles was stored once and referenced
+        also = (result.get('also_reported_by') or [])[:ALSO_REPORTED_BY_LIMIT]
+        if also:
+            formatted_doc += "\nALSO REPORTED BY: " + "; ".join(
+                f"{ref.get('source', 'unknown')}: {ref.get('title', '')} ({ref.get('link', '')})" for ref in also
+            )
+        formatted_docs.append(formatted_doc)
     
     return "\n\n---\n\n".join(formatted_docs)
 
+def extract_citations(results: List[Dict]) -> List[Dict[str, str]]:
+    """Unique title/link/source triples for the retrieved articles, in rank order"""
+    citations = []
+    seen_links = set()
+    for result in results:
+        for metadata in [result['metadata'], *(result.get('also_reported_by') or [])]:
+            link = metadata.get('link', '')
+            if link in seen_links:
+                continue
+            seen_links.add(link)
+            citations.append({
+                "title": metadata.get('title', ''),
+                "link": link,
+                "source": metadata.get('source', 'unknown')
+            })
+    return citations
+
 def wiki_node(prompt: str) -> str:
     """Function for Wikipedia search"""
     return wiki_search(prompt)
@@ -85,34 +136,44 @@ def router_node(state: State):
 
 def rag_query_node(state: State):
     """Query pre-populated vector DB - NO extraction"""
-    docs = query_vector_db(state['prompt'])
-    return {"retrieved_docs": docs}
+    results = unified_db_manager.search_documents(
+        state['prompt'], k=3, **search_options(state['prompt'])
+    )
+    return {"retrieved_docs": format_results(results), "citations": extract_citations(results)}
+
+async def arag_query_node(state: State):
+    """Query pre-populated vector DB - NO extraction (async)"""
+    results = await unified_db_manager.asearch_documents(
+        state['prompt'], k=3, **search_options(state['prompt'])
+    )
+    return {"retrieved_docs": format_results(results), "citations": extract_citations(results)}
 
 def wiki_query_node(state: State):
     """Query Wikipedia"""
     docs = wiki_node(state['prompt'])
-    return {"retrieved_docs": docs}
+    return {"retrieved_docs": docs, "citations": []}
 
-def response_generation_node(state: State):
-    """Generate response from retrieved documents"""
-    llm = ChatOpenAI(model='gpt-4o-mini', api_key=openai_api_key, temperature=0)
-    
-    # Get the context and question from state
-    context = state.get('retrieved_docs', '')
-    question = state.get('prompt', '')
-    
-    # Debug logging (controlled by environment variable)
-    debug_mode = os.getenv('RAG_DEBUG', 'false').lower() == 'true'
-    if debug_mode:
-        print(f"\n[DEBUG] Question: {question[:100]}...")
-        print(f"[DEBUG] Context length: {len(context)} characters")
-        print(f"[DEBUG] Context preview: {context[:300]}...")
-    
-    # Check if context is empty
-    if not context or len(context.strip()) < 10:
-        return {"response": "I apologize, but I couldn't retrieve any relevant information from the database. Please try rephrasing your question or contact support if this issue persists."}
-    
-    prompt_template = ChatPromptTemplate.from_template("""
+async def awiki_query_node(state: State):
+    """Query Wikipedia (async); the Wikipedia client is sync, so run it in a thread"""
+    docs = await asyncio.to_thread(wiki_node, state['prompt'])
+    return {"retrieved_docs": docs, "citations": []}
+
+_llm: Optional["ChatOpenAI"] = None
+
+def get_llm() -> "ChatOpenAI":
+    """Get the shared chat model so its HTTP connection pool is reused; built on first use"""
+    global _llm
+    if _llm is None:
+        from langchain_openai import ChatOpenAI
+
+        # stream_usage makes streamed completions report token usage as well
+        _llm = ChatOpenAI(model='gpt-4o-mini', api_key=os.environ["OPENAI_API_KEY"], temperature=0,
+                          stream_usage=True)
+    return _llm
+
+NO_CONTEXT_RESPONSE = "I apologize, but I couldn't retrieve any relevant information from the database. Please try rephrasing your question or contact support if this issue persists."
+
+RESPONSE_PROMPT = ChatPromptTemplate.from_template("""
     You are an AI News Analyst. Use the following context to provide a comprehensive response.
     
     Context:
@@ -133,10 +194,51 @@ def response_generation_node(state: State):
     
     Provide a detailed, well-structured response that incorporates the news information from the context.
     """)
+
+def _prepare_generation(state: State):
+    """Extract context and question from state, logging them in debug mode"""
+    context = state.get('retrieved_docs', '')
+    question = state.get('prompt', '')
+    
+    # Debug logging (controlled by environment variable)
+    debug_mode = os.getenv('RAG_DEBUG', 'false').lower() == 'true'
+    if debug_mode:
+        print(f"\n[DEBUG] Question: {question[:100]}...")
+        print(f"[DEBUG] Context length: {len(context)} characters")
+        print(f"[DEBUG] Context preview: {context[:300]}...")
+    
+    return context, question, debug_mode
+
+def response_generation_node(state: State):
+    """Generate response from retrieved documents"""
+    context, question, debug_mode = _prepare_generation(state)
+    
+    # Check if context is empty
+    if not context or len(context.strip()) < 10:
+        return {"response": NO_CONTEXT_RESPONSE}
     
     # Direct invocation with explicit parameters
-    chain = prompt_template | llm | StrOutputParser()
-    final_response = chain.invoke({"context": context, "question": question})
+    inputs = {"context": context, "question": question}
+    message = (RESPONSE_PROMPT | get_llm()).invoke(inputs)
+    record_llm_usage(message, lambda: RESPONSE_PROMPT.format(**inputs))
+    final_response = StrOutputParser().invoke(message)
+    
+    if debug_mode:
+        print(f"[DEBUG] Response length: {len(final_response)} characters")
+    
+    return {"response": final_response}
+
+async def aresponse_generation_node(state: State):
+    """Generate response from retrieved documents (async)"""
+    context, question, debug_mode = _prepare_generation(state)
+    
+    if not context or len(context.strip()) < 10:
+        return {"response": NO_CONTEXT_RESPONSE}
+    
+    inputs = {"context": context, "question": question}
+    message = await (RESPONSE_PROMPT | get_llm()).ainvoke(inputs)
+    record_llm_usage(message, lambda: RESPONSE_PROMPT.format(**inputs))
+    final_response = StrOutputParser().invoke(message)
     
     if debug_mode:
         print(f"[DEBUG] Response length: {len(final_response)} characters")
@@ -150,11 +252,14 @@ def should_continue(state: State):
 # Create the graph
 workflow = StateGraph(State)
 
-# Add nodes
+# Add nodes; I/O-bound nodes get native async implementations for app.ainvoke
 workflow.add_node("router", router_node)
-workflow.add_node("rag_query", rag_query_node)
-workflow.add_node("wiki_query", wiki_query_node)
-workflow.add_node("generate_response", response_generation_node)
+workflow.add_node("rag_query", RunnableLambda(rag_query_node, afunc=arag_query_node))
+workflow.add_node("wiki_query", RunnableLambda(wiki_query_node, afunc=awiki_query_node))
+workflow.add_node(
+    "generate_response",
+    RunnableLambda(response_generation_node, afunc=aresponse_generation_node)
+)
 
 # Add edges
 workflow.add_edge(START, "router")
@@ -173,13 +278,132 @@ workflow.add_edge("generate_response", END)
 # Compile the graph
 app = workflow.compile()
 
+def _cached_analysis(route_choice: str, query_embedding: List[float], scope: str,
+                     usage: TokenUsage) -> Optional[Dict[str, Any]]:
+    """Build an analysis result from the answer cache, if there is a close enough entry"""
+    cached = answer_cache.lookup(route_choice, query_embedding, scope)
+    if not cached:
+        return None
+    return {
+        "response": cached["response"],
+        "route_choice": route_choice,
+        "citations": cached["citations"],
+        "cached": True,
+        "token_usage": usage.as_dict()
+    }
+
+def _finish_analysis(result: Dict[str, Any], query_embedding: Optional[List[float]], scope: str,
+                     usage: TokenUsage) -> Dict[str, Any]:
+    """Remember a freshly generated answer and build the analysis result"""
+    # Only cache answers that were grounded in retrieved context
+    if query_embedding is not None and result.get('retrieved_docs', '').strip():
+        answer_cache.store(
+            result['route_choice'], query_embedding, result['response'],
+            result.get('citations', []), scope
+        )
+    
+    return {
+        "response": result['response'],
+        "route_choice": result['route_choice'],
+        "citations": result.get('citations', []),
+        "cached": False,
+        "token_usage": usage.as_dict()
+    }
+
+def analyze_news(prompt: str, usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+    """
+    Run the news analysis workflow and return the answer with its metadata.
+    Near-identical questions on the same route are answered from the answer
+    cache without retrieval or generation. Tokens actually spent are recorded
+    into `usage` (a fresh tracker by default) and returned as token_usage.
+    """
+    usage = start_token_usage(usage)
+    route_choice = route_decision(prompt)
+    scope = cache_scope(prompt)
+    
+    query_embedding = None
+    if ANSWER_CACHE_ENABLED:
+        try:
+            query_embedding = unified_db_manager.embed_query(prompt)
+            cached = _cached_analysis(route_choice, query_embedding, scope, usage)
+            if cached:
+                return cached
+        except Exception as e:
+            print(f"Warning: Answer cache lookup failed: {e}")
+    
+    result = app.invoke({"prompt": prompt})
+    return _finish_analysis(result, query_embedding, scope, usage)
+
+async def aanalyze_news(prompt: str, usage: Optional[TokenUsage] = None) -> Dict[str, Any]:
+    """Async variant of analyze_news, built on app.ainvoke"""
+    usage = start_token_usage(usage)
+    route_choice = route_decision(prompt)
+    scope = cache_scope(prompt)
+    
+    query_embedding = None
+    if ANSWER_CACHE_ENABLED:
+        try:
+            query_embedding = await unified_db_manager.aembed_query(prompt)
+            cached = await asyncio.to_thread(_cached_analysis, route_choice, query_embedding, scope, usage)
+            if cached:
+                return cached
+        except Exception as e:
+            print(f"Warning: Answer cache lookup failed: {e}")
+    
+    result = await app.ainvoke({"prompt": prompt})
+    return _finish_analysis(result, query_embedding, scope, usage)
+
+async def astream_news_analysis(prompt: str,
+                                usage: Optional[TokenUsage] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream the analysis as events: the route decision, the retrieved
+    citations, LLM tokens as they arrive, and a final "done" event that
+    carries the complete analysis result.
+    """
+    usage = start_token_usage(usage)
+    route_choice = route_decision(prompt)
+    scope = cache_scope(prompt)
+    yield {"event": "route", "data": {"route_choice": route_choice}}
+    
+    query_embedding = None
+    if ANSWER_CACHE_ENABLED:
+        try:
+            query_embedding = await unified_db_manager.aembed_query(prompt)
+            cached = await asyncio.to_thread(_cached_analysis, route_choice, query_embedding, scope, usage)
+            if cached:
+                yield {"event": "citations", "data": {"citations": cached["citations"]}}
+                yield {"event": "token", "data": {"text": cached["response"]}}
+                yield {"event": "done", "data": cached}
+                return
+        except Exception as e:
+            print(f"Warning: Answer cache lookup failed: {e}")
+    
+    result: Dict[str, Any] = {"prompt": prompt}
+    streamed_tokens = False
+    async for mode, chunk in app.astream({"prompt": prompt}, stream_mode=["updates", "messages"]):
+        if mode == "updates":
+            for node_name, update in chunk.items():
+                result.update(update or {})
+                if node_name in ("rag_query", "wiki_query"):
+                    yield {"event": "citations", "data": {"citations": result.get('citations', [])}}
+        elif mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") == "generate_response" and message.content:
+                streamed_tokens = True
+                yield {"event": "token", "data": {"text": message.content}}
+    
+    # Responses that skip the LLM (e.g. no context) still reach the client
+    if not streamed_tokens and result.get('response'):
+        yield {"event": "token", "data": {"text": result['response']}}
+    
+    yield {"event": "done", "data": _finish_analysis(result, query_embedding, scope, usage)}
+
 def run_news_analysis(prompt: str):
     """
     Run query-only news analysis workflow.
     Note: This assumes the vector DB has been pre-populated by the extraction job.
     """
-    result = app.invoke({"prompt": prompt})
-    return result['response']
+    return analyze_news(prompt)['response']
 
 if __name__ == "__main__":
     try: